@@ -0,0 +1 @@
+"""Analytics over the `report.*.json` game logs (catalog, metrics, figures)."""
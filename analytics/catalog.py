@@ -0,0 +1,273 @@
+"""
+Incremental SQLite catalog of a logs directory.
+
+Every `report*.json` under the directory is parsed once into the `games`,
+`setups` and `steps` tables. Files are keyed by path, mtime and size, so
+`Catalog.update` only ingests new or changed files and drops deleted ones.
+
+`experiment` is the report's directory relative to the logs root, e.g.
+"ex_rule/no_E2" or "ex_backbone/gemini-2.0-flash"; queries filter on it by path
+prefix ("ex_rule" matches every rule set).
+"""
+import glob
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.gamelog import iter_step_states
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE REFERENCES files(path) ON DELETE CASCADE,
+    experiment TEXT NOT NULL,
+    rules TEXT NOT NULL,
+    winner TEXT,
+    score_winner INTEGER,
+    score_loser INTEGER,
+    final_round INTEGER,
+    n_steps INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_experiment ON games(experiment);
+CREATE TABLE IF NOT EXISTS setups (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    side TEXT NOT NULL,
+    endpoint TEXT,
+    model TEXT,
+    persona TEXT,
+    mem_size INTEGER,
+    temp REAL,
+    top_p REAL,
+    top_k REAL,
+    max_token INTEGER,
+    PRIMARY KEY (game_id, side)
+);
+CREATE TABLE IF NOT EXISTS steps (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    ply INTEGER NOT NULL,
+    side TEXT NOT NULL,
+    round INTEGER,
+    pos TEXT,
+    way TEXT,
+    reasoning_secs REAL,
+    my_score INTEGER,
+    score_a INTEGER,
+    score_b INTEGER,
+    captured_peasant INTEGER,
+    captured_mandarin INTEGER,
+    scattering_step INTEGER,
+    PRIMARY KEY (game_id, ply)
+);
+"""
+
+# Display names used in the paper figures.
+MODEL_NAMES = {
+    "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8": "Llama-4-Maverick-17B-128E",
+    "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free": "DeepSeek-R1-Distill-Llama-70B",
+    "gemini-2.0-flash": "Gemini-2.0-flash",
+    "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free": "Llama-3.3-70B-Instruct",
+    "exaone-3-5-32b-instruct": "ExaOne-3.5-32B-Instruct",
+    "lgai/exaone-3-5-32b-instruct": "ExaOne-3.5-32B-Instruct",
+    "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo": "Llama-3.1-8B-Instruct",
+    "gemini-2.0-flash-lite": "Gemini-2.0-flash-lite",
+}
+
+# Columns of `setups` that `win_rate` can group by.
+GROUP_COLUMNS = ("endpoint", "model", "persona", "mem_size")
+
+
+def get_model_name(endpoint: Optional[str]) -> Optional[str]:
+    return MODEL_NAMES.get(endpoint, endpoint)
+
+
+def find_reports(logs_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(logs_dir, "**", "report*.json"), recursive=True))
+
+
+def _step_side(step: Dict[str, Any], ply: int) -> str:
+    pos = (step.get("action") or [None])[0]
+    if pos:
+        return "player_a" if pos.startswith("A") else "player_b"
+    # No action: turns alternate, A first.
+    return "player_a" if ply % 2 == 0 else "player_b"
+
+
+def _game_rows(report: Dict[str, Any]) -> Tuple[tuple, List[tuple], List[tuple]]:
+    """(games row without id/path/experiment, setups rows, steps rows) of one report."""
+    rules = "+".join(sorted(report.get("enviroment", {}).get("special_rules") or []))
+    result = report.get("result") or {}
+    score = result.get("score") or [None, None]
+    steps = report.get("step_by_step") or []
+    game = (rules, result.get("winner"), score[0], score[1], result.get("final_round"), len(steps))
+
+    setups = []
+    for side in ("player_a", "player_b"):
+        s = report.get("setup", {}).get(side) or {}
+        setups.append((side, s.get("endpoint"), get_model_name(s.get("endpoint")), s.get("persona"),
+                       s.get("mem_size"), s.get("temp"), s.get("top_p"), s.get("top_k"), s.get("max_token")))
+
+    step_rows = []
+    for ply, (step, _, after) in enumerate(iter_step_states(report)):
+        action = step.get("action") or [None, None]
+        score_after = (after or {}).get("score", {})
+        step_rows.append((
+            ply, _step_side(step, ply), step.get("round"), action[0], action[1], step.get("reasoning_times"),
+            step.get("my_score"), score_after.get("A"), score_after.get("B"),
+            step.get("captured_peasant", 0), step.get("captured_mandarin", 0), step.get("scattering_step", 0),
+        ))
+    return game, setups, step_rows
+
+
+class Catalog:
+    """
+    SQLite catalog of `report*.json` files; open it, `update` it, then query.
+
+    Paths are stored relative to the logs root passed to `update`, so a catalog
+    stays valid when the repository is moved.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"{db_path} has catalog schema {version}, expected {SCHEMA_VERSION}.")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # --- Ingestion ---
+
+    def update(self, logs_dir: str) -> Dict[str, Any]:
+        """
+        Brings the catalog in line with `logs_dir`: ingests new and modified reports and
+        removes the ones that disappeared. Unreadable reports are recorded in `files.error`
+        and retried when they change.
+        """
+        start_t = time.perf_counter()
+        known = {path: (mtime_ns, size) for path, mtime_ns, size in
+                 self.conn.execute("SELECT path, mtime_ns, size FROM files")}
+        seen = set()
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+
+        with self.conn:
+            for full_path in find_reports(logs_dir):
+                path = os.path.relpath(full_path, logs_dir).replace(os.sep, "/")
+                seen.add(path)
+                st = os.stat(full_path)
+                if known.get(path) == (st.st_mtime_ns, st.st_size):
+                    stats["unchanged"] += 1
+                    continue
+                if path in known:
+                    self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                error = self._ingest(full_path, path, st)
+                if error:
+                    stats["failed"] += 1
+                    print(f"[catalog] skip {path}: {error}")
+                else:
+                    stats["updated" if path in known else "added"] += 1
+
+            gone = [(path,) for path in known if path not in seen]
+            self.conn.executemany("DELETE FROM files WHERE path = ?", gone)
+            stats["removed"] = len(gone)
+
+        stats["elapsed_secs"] = round(time.perf_counter() - start_t, 3)
+        return stats
+
+    def _ingest(self, full_path: str, path: str, st: os.stat_result) -> Optional[str]:
+        try:
+            with open(full_path, "r", encoding="utf-8") as f:
+                game, setups, steps = _game_rows(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, IndexError) as e:
+            self.conn.execute("INSERT INTO files VALUES (?, ?, ?, ?)",
+                              (path, st.st_mtime_ns, st.st_size, f"{type(e).__name__}: {e}"))
+            return f"{type(e).__name__}: {e}"
+
+        self.conn.execute("INSERT INTO files VALUES (?, ?, ?, NULL)", (path, st.st_mtime_ns, st.st_size))
+        experiment = os.path.dirname(path)
+        game_id = self.conn.execute(
+            "INSERT INTO games (path, experiment, rules, winner, score_winner, score_loser, final_round, n_steps)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, experiment, *game),
+        ).lastrowid
+        self.conn.executemany("INSERT INTO setups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              [(game_id, *row) for row in setups])
+        self.conn.executemany("INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              [(game_id, *row) for row in steps])
+        return None
+
+    # --- Queries ---
+
+    def query(self, sql: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        """Runs read-only SQL against the catalog; rows support access by column name."""
+        cur = self.conn.cursor()
+        cur.row_factory = sqlite3.Row
+        return cur.execute(sql, tuple(params)).fetchall()
+
+    @staticmethod
+    def _filters(experiment: Optional[str], rules: Optional[List[str]]) -> Tuple[str, list]:
+        clauses, params = [], []
+        if experiment:
+            experiment = experiment.strip("/")
+            clauses.append("(g.experiment = ? OR substr(g.experiment, 1, ?) = ?)")
+            params += [experiment, len(experiment) + 1, experiment + "/"]
+        if rules is not None:
+            clauses.append("g.rules = ?")
+            params.append("+".join(sorted(rules)))
+        return "".join(f" AND {c}" for c in clauses), params
+
+    def games(self, experiment: Optional[str] = None, rules: Optional[List[str]] = None) -> List[sqlite3.Row]:
+        where, params = self._filters(experiment, rules)
+        return self.query(f"SELECT g.* FROM games g WHERE 1 = 1{where} ORDER BY g.path", params)
+
+    def win_rate(self, by: str = "model", experiment: Optional[str] = None, rules: Optional[List[str]] = None,
+                 include_random: bool = False) -> Dict[Any, Dict[str, Any]]:
+        """
+        Wins, draws and games per `by` value (a `GROUP_COLUMNS` entry) over finished
+        games, each side counted on its own. Rates are percentages.
+        """
+        if by not in GROUP_COLUMNS:
+            raise ValueError(f"by must be one of {GROUP_COLUMNS}.")
+        where, params = self._filters(experiment, rules)
+        if not include_random:
+            where += " AND coalesce(s.endpoint, '') != 'random_agent'"
+        rows = self.query(
+            f"SELECT s.{by} AS name, COUNT(*) AS games,"
+            " SUM(g.winner = s.side) AS wins, SUM(g.winner = 'draw') AS draws"
+            f" FROM setups s JOIN games g ON g.id = s.game_id WHERE g.winner IS NOT NULL{where}"
+            " GROUP BY name ORDER BY name", params)
+        return {
+            row["name"]: {
+                "wins": row["wins"],
+                "draws": row["draws"],
+                "games": row["games"],
+                "win_rate": round(row["wins"] * 100 / row["games"], 2),
+                "draw_rate": round(row["draws"] * 100 / row["games"], 2),
+            }
+            for row in rows
+        }
+
+    def errors(self) -> List[Tuple[str, str]]:
+        return [(row["path"], row["error"]) for row in
+                self.query("SELECT path, error FROM files WHERE error IS NOT NULL ORDER BY path")]
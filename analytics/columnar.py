@@ -0,0 +1,254 @@
+"""
+Columnar loading of the `report*.json` logs and the paper metrics on top of it.
+
+`load_logs` parses every report once (in a process pool) into two pandas frames:
+
+  games   one row per report: path, experiment, rules, winner, scores, final round,
+          number of steps and both setups as `a_*` / `b_*` columns
+  steps   one row per move: `game` (row of `games`), ply, side, round, action,
+          reasoning time and capture/drop counts
+
+The metrics are group-bys over these frames instead of per-file loops. "Agent"
+means the non-random side of a game; `by` picks the setup field that names it
+("model", "endpoint", "persona" or "mem_size").
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .catalog import find_reports, get_model_name
+
+RANDOM_AGENT = "random_agent"
+SETUP_FIELDS = ("endpoint", "model", "persona", "mem_size")
+_STEP_INT_COLUMNS = ("game", "ply", "side", "round", "way", "captured_peasant", "captured_mandarin", "scattering_step")
+
+
+# --- Parsing (worker side) ---
+
+def _parse_chunk(task: Tuple[str, List[str]]) -> Tuple[Dict[str, list], Dict[str, list], List[Tuple[str, str]]]:
+    """Game columns, step columns (with chunk-local `game`) and errors for some reports."""
+    root, paths = task
+    games: Dict[str, list] = {k: [] for k in (
+        "path", "experiment", "rules", "winner", "score_winner", "score_loser", "final_round", "n_steps",
+        *(f"{p}_{f}" for p in "ab" for f in SETUP_FIELDS))}
+    steps: Dict[str, list] = {k: [] for k in (*_STEP_INT_COLUMNS, "pos", "reasoning_secs")}
+    errors = []
+
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                report = json.load(f)
+            result = report.get("result") or {}
+            score = result.get("score") or [None, None]
+            setup = report["setup"]
+            step_list = report.get("step_by_step") or []
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            errors.append((path, f"{type(e).__name__}: {e}"))
+            continue
+
+        game = len(games["path"])
+        rel = os.path.relpath(path, root).replace(os.sep, "/")
+        games["path"].append(rel)
+        games["experiment"].append(os.path.dirname(rel))
+        games["rules"].append("+".join(sorted(report.get("enviroment", {}).get("special_rules") or [])))
+        games["winner"].append(result.get("winner"))
+        games["score_winner"].append(score[0])
+        games["score_loser"].append(score[1])
+        games["final_round"].append(result.get("final_round"))
+        games["n_steps"].append(len(step_list))
+        for p, side in (("a", "player_a"), ("b", "player_b")):
+            s = setup.get(side) or {}
+            games[f"{p}_endpoint"].append(s.get("endpoint"))
+            games[f"{p}_model"].append(get_model_name(s.get("endpoint")))
+            games[f"{p}_persona"].append(s.get("persona"))
+            games[f"{p}_mem_size"].append(s.get("mem_size"))
+
+        for ply, step in enumerate(step_list):
+            action = step.get("action") or [None, None]
+            pos, way = action[0], action[1]
+            steps["game"].append(game)
+            steps["ply"].append(ply)
+            # No action: turns alternate, A first.
+            steps["side"].append((0 if pos.startswith("A") else 1) if pos else ply % 2)
+            steps["round"].append(step.get("round") or 0)
+            steps["pos"].append(pos)
+            steps["way"].append(1 if way == "clockwise" else -1 if way == "counter_clockwise" else 0)
+            steps["reasoning_secs"].append(step.get("reasoning_times") or 0.0)
+            steps["captured_peasant"].append(step.get("captured_peasant", 0))
+            steps["captured_mandarin"].append(step.get("captured_mandarin", 0))
+            steps["scattering_step"].append(step.get("scattering_step", 0))
+    return games, steps, errors
+
+
+def load_logs(logs_dir: str, workers: Optional[int] = None,
+              chunk_size: int = 64) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Parses every report under `logs_dir` into the (games, steps) frames. `workers=1`
+    parses in-process; unreadable reports are reported and left out.
+    """
+    paths = find_reports(logs_dir)
+    tasks = [(logs_dir, paths[i:i + chunk_size]) for i in range(0, len(paths), chunk_size)]
+    if workers == 1 or len(tasks) <= 1:
+        parts = [_parse_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_parse_chunk, tasks))
+
+    game_cols: Dict[str, list] = {}
+    step_cols: Dict[str, list] = {}
+    offset = 0
+    for games, steps, errors in parts:
+        for path, error in errors:
+            print(f"[analytics] skip {path}: {error}")
+        for k, v in games.items():
+            game_cols.setdefault(k, []).extend(v)
+        steps["game"] = [g + offset for g in steps["game"]]
+        for k, v in steps.items():
+            step_cols.setdefault(k, []).extend(v)
+        offset += len(games["path"])
+
+    games_df = pd.DataFrame(game_cols)
+    steps_df = pd.DataFrame({k: np.asarray(step_cols.get(k, []), dtype=np.int32) for k in _STEP_INT_COLUMNS})
+    steps_df["side"] = steps_df["side"].astype(np.int8)
+    steps_df["pos"] = pd.Categorical(step_cols.get("pos", []))
+    steps_df["reasoning_secs"] = np.asarray(step_cols.get("reasoning_secs", []), dtype=np.float64)
+    return games_df, steps_df
+
+
+# --- Selection helpers ---
+
+def select(games: pd.DataFrame, steps: pd.DataFrame, experiment: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Games (and their steps) under the `experiment` sub-directory, e.g. "ex_backbone"."""
+    experiment = experiment.strip("/")
+    mask = (games["experiment"] == experiment) | games["experiment"].str.startswith(experiment + "/")
+    return games[mask], steps[steps["game"].isin(games.index[mask])]
+
+
+def agent_side(games: pd.DataFrame) -> pd.Series:
+    """0 if player A is the agent (the non-random side), else 1."""
+    return (games["a_endpoint"] == RANDOM_AGENT).astype(np.int8)
+
+
+def agent_name(games: pd.DataFrame, by: str = "model") -> pd.Series:
+    if by not in SETUP_FIELDS:
+        raise ValueError(f"by must be one of {SETUP_FIELDS}.")
+    return games[f"a_{by}"].where(agent_side(games) == 0, games[f"b_{by}"])
+
+
+def _side_frame(games: pd.DataFrame, by: str) -> pd.DataFrame:
+    """One row per (game, side): name, endpoint and outcome for that side."""
+    frames = []
+    for p, side in (("a", "player_a"), ("b", "player_b")):
+        frames.append(pd.DataFrame({
+            "game": games.index,
+            "name": games[f"{p}_{by}"].to_numpy(),
+            "endpoint": games[f"{p}_endpoint"].to_numpy(),
+            "win": (games["winner"] == side).to_numpy(),
+            "draw": (games["winner"] == "draw").to_numpy(),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+# --- Metrics ---
+
+def win_rate(games: pd.DataFrame, by: str = "model", include_random: bool = False) -> pd.DataFrame:
+    """wins, draws, games, win_rate and draw_rate (percent) per `by` value; finished games only."""
+    if by not in SETUP_FIELDS:
+        raise ValueError(f"by must be one of {SETUP_FIELDS}.")
+    sides = _side_frame(games[games["winner"].notna()], by)
+    if not include_random:
+        sides = sides[sides["endpoint"] != RANDOM_AGENT]
+    out = sides.groupby("name", dropna=False).agg(wins=("win", "sum"), draws=("draw", "sum"), games=("win", "size"))
+    out["win_rate"] = (out["wins"] * 100 / out["games"]).round(2)
+    out["draw_rate"] = (out["draws"] * 100 / out["games"]).round(2)
+    return out
+
+
+def agent_steps(games: pd.DataFrame, steps: pd.DataFrame) -> pd.DataFrame:
+    """Steps played by the agent side of their game."""
+    side = agent_side(games).reindex(steps["game"]).to_numpy()
+    return steps[steps["side"].to_numpy() == side]
+
+
+def reasoning_curves(games: pd.DataFrame, steps: pd.DataFrame, by: str = "model",
+                     max_turns: int = 12) -> Dict[Any, np.ndarray]:
+    """
+    Agent reasoning time per own turn: {name: games x max_turns array}, NaN-padded for
+    shorter games. Turns without a recorded time are skipped.
+    """
+    own = agent_steps(games, steps)
+    own = own[own["reasoning_secs"] > 0]
+    turn = own.groupby("game").cumcount().to_numpy()
+    own, turn = own[turn < max_turns], turn[turn < max_turns]
+
+    names = agent_name(games, by)
+    curves = {}
+    for name, idx in own.groupby(names.reindex(own["game"]).to_numpy(), sort=True).indices.items():
+        game_ids, rows = np.unique(own["game"].to_numpy()[idx], return_inverse=True)
+        arr = np.full((len(game_ids), max_turns), np.nan)
+        arr[rows, turn[idx]] = own["reasoning_secs"].to_numpy()[idx]
+        curves[name] = arr
+    return curves
+
+
+def win_steps(games: pd.DataFrame, by: str = "model") -> Dict[Any, np.ndarray]:
+    """Number of steps of every game won by a non-random side, per winner `by` value."""
+    won = games[games["winner"].isin(["player_a", "player_b"])]
+    is_a = (won["winner"] == "player_a").to_numpy()
+    endpoint = np.where(is_a, won["a_endpoint"], won["b_endpoint"])
+    name = np.where(is_a, won[f"a_{by}"], won[f"b_{by}"])
+    keep = endpoint != RANDOM_AGENT
+    frame = pd.DataFrame({"name": name[keep], "n_steps": won["n_steps"].to_numpy()[keep]})
+    return {name: group.to_numpy() for name, group in frame.groupby("name", sort=False)["n_steps"]}
+
+
+def capture_stats(games: pd.DataFrame, steps: pd.DataFrame, by: str = "model",
+                  include_random: bool = True) -> pd.DataFrame:
+    """Captured mandarins/peasants and their per-step ratios for every mover."""
+    mover_side = steps["side"].to_numpy()
+    g = steps["game"].to_numpy()
+    endpoint = np.where(mover_side == 0, games["a_endpoint"].reindex(g), games["b_endpoint"].reindex(g))
+    name = np.where(mover_side == 0, games[f"a_{by}"].reindex(g), games[f"b_{by}"].reindex(g))
+    name = np.where(endpoint == RANDOM_AGENT, "Random Agent", name)
+    frame = steps[["captured_mandarin", "captured_peasant"]].assign(name=name)
+    if not include_random:
+        frame = frame[frame["name"] != "Random Agent"]
+    out = frame.groupby("name", dropna=False).agg(
+        captured_mandarin=("captured_mandarin", "sum"),
+        captured_peasant=("captured_peasant", "sum"),
+        total_steps=("captured_peasant", "size"),
+    )
+    out["ratio_mandarin_per_step"] = (out["captured_mandarin"] / out["total_steps"]).round(3)
+    out["ratio_peasant_per_step"] = (out["captured_peasant"] / out["total_steps"]).round(3)
+    return out
+
+
+def rule_effect(games: pd.DataFrame, steps: pd.DataFrame, by: str = "experiment") -> pd.DataFrame:
+    """Per rule set (`rules`) or experiment directory: games, average length and capture rates."""
+    totals = steps.groupby("game")[["captured_mandarin", "captured_peasant"]].sum()
+    frame = games[[by, "n_steps"]].join(totals).fillna(0)
+    out = frame.groupby(by).agg(
+        games=("n_steps", "size"),
+        avg_steps=("n_steps", "mean"),
+        captured_mandarin=("captured_mandarin", "sum"),
+        captured_peasant=("captured_peasant", "sum"),
+        total_steps=("n_steps", "sum"),
+    )
+    out["avg_steps"] = out["avg_steps"].round(2)
+    out["ratio_mandarin_per_turn"] = (out["captured_mandarin"] / out["total_steps"]).round(3)
+    out["ratio_peasant_per_turn"] = (out["captured_peasant"] / out["total_steps"]).round(3)
+    return out
+
+
+def move_directions(games: pd.DataFrame, steps: pd.DataFrame) -> pd.DataFrame:
+    """Clockwise/counter-clockwise counts per A1..A5 for non-random player A moves."""
+    agent_a = (games["a_endpoint"] != RANDOM_AGENT).reindex(steps["game"]).to_numpy()
+    own = steps[agent_a & (steps["side"].to_numpy() == 0) & (steps["way"].to_numpy() != 0)]
+    counts = pd.crosstab(own["pos"].astype(str), own["way"]).reindex(
+        index=["A1", "A2", "A3", "A4", "A5"], columns=[1, -1], fill_value=0)
+    counts.columns = ["cw", "ccw"]
+    return counts
@@ -0,0 +1,151 @@
+"""
+Paper figures and tables from the logs, computed with `analytics.columnar`.
+
+`regenerate` loads the logs once and writes every figure (PNG) and table (CSV)
+to one directory; see `cli/make_figures.py`.
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import columnar
+
+PERSONAS = ("ATTACK", "DEFENSE", "BALANCE", "STRATEGIC")
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_win_rate(table: pd.DataFrame, path: str, xlabel: Optional[str] = None) -> None:
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(10, 4))
+    labels = [str(name) for name in table.index]
+    ax.bar(range(len(table)), table["win_rate"], color="skyblue", edgecolor="black")
+    for i, v in enumerate(table["win_rate"]):
+        ax.text(i, v + 0.5, f"{v:.2f}", ha="center", va="bottom", fontsize=10)
+    ax.set_xticks(range(len(table)), labels, rotation=30, ha="right")
+    if xlabel:
+        ax.set_xlabel(xlabel)
+    ax.set_ylabel("Win Rate (%)")
+    ax.set_ylim(0, 100)
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_reasoning_curves(curves: Dict[Any, np.ndarray], path: str) -> None:
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(8, 4))
+    for name, arr in curves.items():
+        x = np.arange(1, arr.shape[1] + 1)
+        mean, std = np.nanmean(arr, axis=0), np.nanstd(arr, axis=0)
+        ax.plot(x, mean, label=str(name))
+        ax.fill_between(x, mean - std, mean + std, alpha=0.2)
+    ax.set_ylim(0, 20)
+    ax.set_xlim(1, max((arr.shape[1] for arr in curves.values()), default=12))
+    ax.set_xlabel("Round")
+    ax.set_ylabel("Reasoning Time (s)")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_win_steps(steps_by_name: Dict[Any, np.ndarray], path: str) -> None:
+    plt = _pyplot()
+    names = list(steps_by_name)
+    data = [steps_by_name[name] for name in names]
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.boxplot(
+        data,
+        tick_labels=[str(name) for name in names],
+        patch_artist=True,
+        boxprops=dict(facecolor="lightblue", color="blue"),
+        medianprops=dict(color="red", linewidth=2),
+        whiskerprops=dict(color="blue"),
+        capprops=dict(color="blue"),
+    )
+    for i, values in enumerate(data, start=1):
+        ax.scatter(np.full(len(values), i), values, alpha=0.6, color="black", s=30)
+    ax.set_ylabel("Number of Steps")
+    ax.tick_params(axis="x", labelrotation=20)
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_move_directions(counts_by_persona: Dict[str, pd.DataFrame], path: str) -> None:
+    plt = _pyplot()
+    fig, axes = plt.subplots(1, len(counts_by_persona), figsize=(4 * len(counts_by_persona), 5), squeeze=False)
+    for ax, (persona, counts) in zip(axes[0], counts_by_persona.items()):
+        x = np.arange(len(counts))
+        cw, ccw = counts["cw"].to_numpy(), counts["ccw"].to_numpy()
+        total = cw + ccw
+        ax.bar(x, cw, 0.4, label="Clockwise", color="#4CAF50")
+        ax.bar(x, -ccw, 0.4, label="Counter-clockwise", color="#F44336")
+        for i in range(len(counts)):
+            if cw[i]:
+                ax.text(i, cw[i] + 0.1, f"{cw[i]} ({cw[i] * 100 / total[i]:.1f}%)", ha="center", va="bottom", fontsize=8)
+            if ccw[i]:
+                ax.text(i, -ccw[i] - 0.1, f"{ccw[i]} ({ccw[i] * 100 / total[i]:.1f}%)", ha="center", va="top", fontsize=8)
+        ax.axhline(0, color="black", linewidth=0.8)
+        ax.set_xticks(x, counts.index)
+        ax.set_yticks([])
+        ax.set_ylim(-100, 100)
+        ax.set_title(f"{persona} PERSONA")
+    axes[0][0].legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def regenerate(logs_dir: str, out_dir: str, workers: Optional[int] = None) -> List[str]:
+    """Writes every figure and table to `out_dir`; returns the written paths."""
+    start_t = time.perf_counter()
+    games, steps = columnar.load_logs(logs_dir, workers=workers)
+    print(f"[figures] loaded {len(games)} games / {len(steps)} steps in {time.perf_counter() - start_t:.2f}s")
+    os.makedirs(out_dir, exist_ok=True)
+    written: List[str] = []
+
+    def out(name: str) -> str:
+        written.append(os.path.join(out_dir, name))
+        return written[-1]
+
+    g, s = columnar.select(games, steps, "ex_backbone")
+    if len(g):
+        plot_win_rate(columnar.win_rate(g, by="model"), out("win_rate_backbone.png"))
+        plot_reasoning_curves(columnar.reasoning_curves(g, s, by="model"), out("reasoning_time_backbone.png"))
+        plot_win_steps(columnar.win_steps(g, by="model"), out("win_steps_backbone.png"))
+        columnar.capture_stats(g, s, by="model").to_csv(out("capture_stats_backbone.csv"))
+
+    g, s = columnar.select(games, steps, "persona_instruct_deepseek/ex_persona")
+    if len(g):
+        plot_win_steps(columnar.win_steps(g, by="persona"), out("win_steps_persona.png"))
+        columnar.capture_stats(g, s, by="persona").to_csv(out("capture_stats_persona.csv"))
+        directions = {}
+        for persona in PERSONAS:
+            pg, ps = columnar.select(g, s, f"persona_instruct_deepseek/ex_persona/{persona}")
+            directions[persona] = columnar.move_directions(pg, ps)
+        plot_move_directions(directions, out("move_directions_persona.png"))
+
+    for experiment, name in (("persona_instruct_deepseek/ex_memory", "deepseek"), ("ex_memory", "llama")):
+        g, _ = columnar.select(games, steps, experiment)
+        if len(g):
+            table = columnar.win_rate(g, by="mem_size").sort_index()
+            table.index = table.index.astype(int)
+            plot_win_rate(table, out(f"win_rate_memory_{name}.png"), xlabel="mem_size")
+            table.to_csv(out(f"win_rate_memory_{name}.csv"))
+
+    g, s = columnar.select(games, steps, "ex_rule")
+    if len(g):
+        columnar.rule_effect(g, s, by="experiment").to_csv(out("rule_effect.csv"))
+
+    print(f"[figures] wrote {len(written)} file(s) to {out_dir} in {time.perf_counter() - start_t:.2f}s")
+    return written
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Builds the retrograde endgame tablebase (`core.tablebase`) for one extended-rule set.
+
+Usage examples:
+  - Every position with up to 4 peasants, all rules on:
+      python -m cli.build_tablebase --max-pieces 4
+
+  - Rules E1 E2 only, custom output path:
+      python -m cli.build_tablebase --max-pieces 5 --extended-rules E1 E2 --out data/tablebase/k5.E1E2.bin
+
+The file is then passed to search agents (e.g. `--p1-tablebase` of cli.run_selfplay)
+or opened with `core.tablebase.Tablebase` for analysis.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from typing import List, Optional
+
+from cli.run_basic import _print
+
+
+def default_path(max_pieces: int, extended_rules: Optional[List[str]]) -> str:
+    rules = "".join(sorted(set(extended_rules))) if extended_rules else "all"
+    return os.path.join("data", "tablebase", f"k{max_pieces}.{rules}.bin")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Build an O An Quan endgame tablebase by retrograde analysis")
+    p.add_argument("--max-pieces", type=int, default=4, help="Largest number of peasants on the board (K)")
+    p.add_argument("--extended-rules", nargs="*", default=None, help="Optional extended rules list, e.g. E1 E2 E3")
+    p.add_argument("--out", default=None, help="Output file (default: data/tablebase/k{K}.{rules}.bin)")
+    p.add_argument("--quiet", action="store_true", help="Do not print per-layer progress")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from core.tablebase import build
+
+    args = parse_args(argv)
+    path = args.out or default_path(args.max_pieces, args.extended_rules)
+
+    def progress(n, masks, size, secs):
+        if not args.quiet:
+            _print(f"  peasants={n} mandarin masks={masks}: {size} positions in {secs:.2f}s")
+
+    _print(f"Solving positions with up to {args.max_pieces} peasants -> {path}")
+    info = build(path, args.max_pieces, args.extended_rules, progress)
+    _print(f"Done: {info['positions']} positions, {info['bytes']} bytes in {info['elapsed_secs']}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the server and the CLI entry points.
+
+Each module is imported in fresh interpreters (`python -X importtime`); the best of
+`--repeat` runs is compared with its budget. It also fails when importing one pulls
+in a provider SDK or reads `.env`: those load on the first LLM move (core/providers.py).
+
+Usage examples:
+  - Check every budget (exit code 1 on a regression):
+      python -m cli.check_import_time
+
+  - Show where the server's import time goes:
+      python -m cli.check_import_time --modules main --top 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds, best of --repeat runs. `main` is mostly FastAPI itself (~0.6 s).
+BUDGETS_MS: Dict[str, int] = {
+    "main": 1500,
+    "core.game": 500,
+    "cli.run_selfplay": 500,
+    "cli.run_basic": 400,
+}
+
+# Modules that must not be loaded by importing any of the above.
+LAZY_MODULES = ("together", "google.genai", "dotenv")
+
+
+def _print(msg: str) -> None:
+    # Not cli.run_basic's: importing it would load `requests` into a budget checker.
+    print(msg, flush=True)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Check import times of the O An Quan server and CLI against their budgets")
+    p.add_argument("--modules", nargs="+", choices=sorted(BUDGETS_MS), default=list(BUDGETS_MS),
+                   help="Modules to check (default: all)")
+    p.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module; the fastest counts")
+    p.add_argument("--scale", type=float, default=1.0, help="Multiply every budget, e.g. 2 on a slow CI machine")
+    p.add_argument("--top", type=int, default=0, help="Also print the N slowest imports of each module")
+    return p.parse_args(argv)
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[int, str]], List[str]]:
+    """(ms, [(cumulative us, name)], loaded lazy modules) of one import in a fresh interpreter."""
+    code = (f"import sys; import {module}; "
+            f"print(__import__('json').dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total_us, imports = None, []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative, name = int(parts[1]), parts[2].rstrip()
+        if not name.startswith("  ") and name != f" {module}":
+            # A top-level import done before ours (site, encodings, ...)
+            imports = []
+            continue
+        imports.append((cumulative, name.strip()))
+        if name == f" {module}":
+            total_us = cumulative
+            break
+    if total_us is None:
+        raise RuntimeError(f"No import time reported for {module}.")
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    return total_us / 1000, imports, loaded
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    failed = 0
+    for module in args.modules:
+        try:
+            runs = [measure(module) for _ in range(max(1, args.repeat))]
+        except RuntimeError as e:
+            failed += 1
+            _print(f"[FAIL] {module}: {e}")
+            continue
+        best_ms, imports, loaded = min(runs, key=lambda run: run[0])
+        budget_ms = BUDGETS_MS[module] * args.scale
+        ok = best_ms <= budget_ms and not loaded
+        failed += not ok
+        line = f"[{'ok' if ok else 'FAIL'}] {module}: {best_ms:.0f} ms (budget {budget_ms:.0f} ms)"
+        if loaded:
+            line += f", loaded eagerly: {', '.join(loaded)}"
+        _print(line)
+        for cumulative, name in sorted(imports, reverse=True)[1:args.top + 1]:
+            _print(f"    {cumulative / 1000:8.1f} ms  {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Converts `report.*.json` game logs into one binary record corpus (`core.records`).
+
+Usage examples:
+  - Everything under logs/:
+      python -m cli.convert_logs --logs-dir logs --out logs/corpus.oaqrec
+
+  - Convert and replay every game through the engine to check the records:
+      python -m cli.convert_logs --logs-dir logs/ex_rule --out /tmp/ex_rule.oaqrec --verify
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import time
+from typing import List, Optional
+
+from cli.run_basic import _print
+
+
+def find_reports(logs_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(logs_dir, "**", "report*.json"), recursive=True))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Convert O An Quan JSON reports to a binary record corpus")
+    p.add_argument("--logs-dir", default="logs", help="Directory searched recursively for report*.json")
+    p.add_argument("--out", default="logs/corpus.oaqrec", help="Corpus file to write")
+    p.add_argument("--verify", action="store_true", help="Replay every converted game and compare scores")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from core.records import GameCorpus, convert_reports
+
+    args = parse_args(argv)
+    paths = find_reports(args.logs_dir)
+    start_t = time.perf_counter()
+    n_games = convert_reports(paths, args.out, root=args.logs_dir)
+    json_bytes = sum(os.path.getsize(p) for p in paths)
+    _print(f"Converted {n_games} report(s) in {time.perf_counter() - start_t:.2f}s: "
+           f"{json_bytes} JSON bytes -> {os.path.getsize(args.out)} bytes ({args.out})")
+
+    if args.verify:
+        failures = 0
+        with GameCorpus(args.out) as corpus:
+            for record in corpus:
+                try:
+                    for _ in record.replay():
+                        pass
+                except ValueError as e:
+                    failures += 1
+                    _print(f"[verify] {e}")
+        _print(f"Verified {n_games - failures}/{n_games} game(s) by replay.")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Indexes `report.*.json` game logs into an SQLite catalog (`analytics.catalog`).
+Re-runs only ingest new or modified reports.
+
+Usage examples:
+  - Index everything under logs/:
+      python -m cli.index_logs --logs-dir logs --db logs/catalog.sqlite
+
+  - Index, then print win rates by model for one rule set:
+      python -m cli.index_logs --win-rate-by model --experiment ex_rule/no_E2
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List, Optional
+
+from cli.run_basic import _print
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Index O An Quan JSON reports into an SQLite catalog")
+    p.add_argument("--logs-dir", default="logs", help="Directory searched recursively for report*.json")
+    p.add_argument("--db", default="logs/catalog.sqlite", help="Catalog database file")
+    p.add_argument("--win-rate-by", choices=["endpoint", "model", "persona", "mem_size"],
+                   help="After indexing, print win rates grouped by this setup field")
+    p.add_argument("--experiment", help="Restrict the win-rate query to a log sub-directory, e.g. ex_rule/no_E2")
+    p.add_argument("--include-random", action="store_true", help="Keep random_agent in the win-rate query")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from analytics.catalog import Catalog
+
+    args = parse_args(argv)
+    with Catalog(args.db) as catalog:
+        stats = catalog.update(args.logs_dir)
+        _print(f"[catalog] {args.db}: {stats}")
+        if args.win_rate_by:
+            start_t = time.perf_counter()
+            report = catalog.win_rate(args.win_rate_by, experiment=args.experiment,
+                                      include_random=args.include_random)
+            elapsed_ms = (time.perf_counter() - start_t) * 1000
+            for name, row in report.items():
+                _print(f"{name}: {row}")
+            _print(f"[catalog] query took {elapsed_ms:.1f} ms")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Regenerates the paper figures and tables from the game logs (`analytics.figures`).
+
+Usage examples:
+  - Everything, parsing with all cores:
+      python -m cli.make_figures --logs-dir logs --out figures
+
+  - Parse in-process (no worker pool):
+      python -m cli.make_figures --workers 1
+"""
+
+from __future__ import annotations
+
+import argparse
+from typing import List, Optional
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Regenerate O An Quan paper figures from the logs")
+    p.add_argument("--logs-dir", default="logs", help="Directory searched recursively for report*.json")
+    p.add_argument("--out", default="figures", help="Output directory for PNG figures and CSV tables")
+    p.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from analytics.figures import regenerate
+
+    args = parse_args(argv)
+    regenerate(args.logs_dir, args.out, workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
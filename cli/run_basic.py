@@ -15,15 +15,27 @@ Usage examples:
   - Download the final JSON log for each game to local folder:
       python -m cli.run_basic --download-logs --out-dir logs/exported
 
+  - Let the server play each game and stream the moves back (no request per ply):
+      python -m cli.run_basic --autoplay --p1-type random_agent --p2-type random_agent
+
+  - 500 games, 16 in flight at once, spread over two servers:
+      python -m cli.run_basic --games 500 --concurrency 16 --quiet \
+          --server http://127.0.0.1:8000 http://127.0.0.1:8001 \
+          --p1-type random_agent --p2-type random_agent
+
 Server defaults to http://127.0.0.1:8000 (must be running).
 """
 
 from __future__ import annotations
 
 import argparse
+import json
+import math
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any, Dict, List, Optional
 
 import requests
@@ -33,9 +45,20 @@ def _print(msg: str) -> None:
     print(msg, flush=True)
 
 
+_local = threading.local()
+
+
+def http() -> requests.Session:
+    """Keep-alive session of the calling thread, so a game reuses its connection every ply."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
 def check_server(base_url: str, timeout: float = 3.0) -> bool:
     try:
-        r = requests.get(f"{base_url}/api/state", timeout=timeout)
+        r = http().get(f"{base_url}/api/state", timeout=timeout)
         return r.status_code == 200
     except Exception:
         return False
@@ -43,26 +66,26 @@ def check_server(base_url: str, timeout: float = 3.0) -> bool:
 
 def post_json(base_url: str, path: str, payload: dict | None = None, timeout: float = 30.0) -> dict:
     url = f"{base_url}{path}"
-    r = requests.post(url, json=payload or {}, timeout=timeout)
+    r = http().post(url, json=payload or {}, timeout=timeout)
     r.raise_for_status()
     return r.json()
 
 
 def get_json(base_url: str, path: str, timeout: float = 30.0) -> dict:
     url = f"{base_url}{path}"
-    r = requests.get(url, timeout=timeout)
+    r = http().get(url, timeout=timeout)
     r.raise_for_status()
     return r.json()
 
 
-def fetch_and_save_log(base_url: str, out_dir: str) -> Optional[str]:
-    """Downloads the current JSON log via /api/export_json.
+def fetch_and_save_log(base_url: str, out_dir: str, game_id: str) -> Optional[str]:
+    """Downloads the JSON log of `game_id` via /api/export_json.
 
     Returns the saved file path (or None if failed).
     """
-    url = f"{base_url}/api/export_json"
+    url = f"{base_url}/api/export_json?game_id={game_id}"
     try:
-        with requests.get(url, stream=True, timeout=60.0) as r:
+        with http().get(url, stream=True, timeout=60.0) as r:
             if r.status_code != 200:
                 return None
             filename = None
@@ -93,11 +116,17 @@ def build_player_settings(
     top_k: Optional[int],
     persona: Optional[str],
     mem_size: Optional[int],
+    max_depth: Optional[int] = None,
+    time_limit: Optional[float] = None,
+    workers: Optional[int] = None,
+    rollout: Optional[str] = None,
+    tablebase: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Build settings payload for the server.
 
-    For 'agent' include model and sampling params. For 'random_agent' or 'human',
-    only send the type to avoid polluting logs with unused fields.
+    For 'agent' include model and sampling params, for 'alphabeta_agent' and
+    'mcts_agent' the search budget. For 'random_agent' or 'human', only send the type to avoid polluting logs
+    with unused fields.
     """
     data: Dict[str, Any] = {"type": p_type}
     if p_type == "agent":
@@ -115,6 +144,20 @@ def build_player_settings(
             data["persona"] = persona
         if mem_size is not None:
             data["memSize"] = mem_size
+    elif p_type == "alphabeta_agent":
+        if max_depth is not None:
+            data["maxDepth"] = max_depth
+        if time_limit is not None:
+            data["timeLimit"] = time_limit
+        if tablebase is not None:
+            data["tablebase"] = tablebase
+    elif p_type == "mcts_agent":
+        if time_limit is not None:
+            data["timeLimit"] = time_limit
+        if workers is not None:
+            data["workers"] = workers
+        if rollout is not None:
+            data["rollout"] = rollout
     return data
 
 
@@ -125,10 +168,15 @@ def run_single_game(
     extended_rules: Optional[List[str]] = None,
     print_steps: bool = True,
 ) -> Dict[str, Any]:
-    """Runs a single game until completion via the HTTP API."""
+    """Runs a single game until completion via the HTTP API.
+
+    Every call starts its own game on the server; the result carries its `game_id`
+    and the round-trip time of every /api/move request.
+    """
 
-    # Apply settings (server already performs a reset inside /api/settings)
+    # Apply settings (server starts a new game inside /api/settings)
     state = post_json(base_url, "/api/settings", {"player1": p1_settings, "player2": p2_settings})
+    game_id = state["game_id"]
     game_over = state.get("game_over", False)
 
     # Safety in case server returns immediate game over
@@ -136,11 +184,14 @@ def run_single_game(
         return state
 
     move_idx = 0
+    move_latencies: List[float] = []
     start_ts = time.time()
     while True:
         move_idx += 1
         payload = {"extended_rule": extended_rules} if extended_rules else {}
-        resp = post_json(base_url, "/api/move", payload)
+        t0 = time.perf_counter()
+        resp = post_json(base_url, f"/api/move?game_id={game_id}", payload)
+        move_latencies.append(time.perf_counter() - t0)
 
         if print_steps:
             team = resp.get("next_turn", "?")
@@ -151,93 +202,200 @@ def run_single_game(
         if resp.get("game_over", False):
             end_ts = time.time()
             result = {
+                "game_id": game_id,
                 "winner": resp.get("winner"),
                 "elapsed_secs": round(end_ts - start_ts, 3),
                 "final_state": resp.get("game_state", {}),
+                "moves": move_idx,
+                "move_latencies": move_latencies,
             }
             return result
 
 
+def run_single_game_streamed(
+    base_url: str,
+    p1_settings: Dict[str, Any],
+    p2_settings: Dict[str, Any],
+    extended_rules: Optional[List[str]] = None,
+    print_steps: bool = True,
+) -> Dict[str, Any]:
+    """Like `run_single_game`, but the server plays the game (/api/autoplay) and
+    streams every move back over Server-Sent Events (/api/events)."""
+
+    state = post_json(base_url, "/api/settings", {"player1": p1_settings, "player2": p2_settings})
+    game_id = state["game_id"]
+    if state.get("game_over", False):
+        return state
+
+    start_ts = time.time()
+    post_json(base_url, f"/api/autoplay?game_id={game_id}", {"extended_rule": extended_rules} if extended_rules else {})
+    final: Dict[str, Any] = {}
+    moves = 0
+    with http().get(f"{base_url}/api/events?game_id={game_id}", stream=True, timeout=(5.0, None)) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event["type"] == "move":
+                moves += 1
+                if print_steps:
+                    a = event["data"].get("action_details", {}).get("steps", [])
+                    if a:
+                        _print(f"[step {event['ply'] + 1:02d}] {a[-1]}")
+                continue
+            final = event
+            break
+
+    if final.get("type") == "error":
+        _print(f"Autoplay failed: {final.get('message')}")
+    return {
+        "game_id": game_id,
+        "winner": final.get("winner"),
+        "elapsed_secs": round(time.time() - start_ts, 3),
+        "final_state": final.get("game_state", {}),
+        "moves": moves,
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of a non-empty list."""
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def print_run_summary(results: List[Dict[str, Any]], failed: int, elapsed: float, servers: int, concurrency: int) -> None:
+    """Throughput, latency percentiles and wins over all finished games."""
+    moves = sum(r.get("moves", 0) for r in results)
+    _print(f"\n{len(results)} game(s) finished, {failed} failed, in {elapsed:.2f}s on {servers} server(s), "
+           f"concurrency {concurrency}: {len(results) / max(elapsed, 1e-9):.2f} games/s, "
+           f"{moves / max(elapsed, 1e-9):.1f} moves/s")
+    latencies = [t for r in results for t in r.get("move_latencies", [])]
+    if latencies:
+        _print("Move latency (ms): " + ", ".join(
+            f"p{q}={percentile(latencies, q) * 1000:.1f}" for q in (50, 90, 99)) + f", max={max(latencies) * 1000:.1f}")
+    game_secs = [r["elapsed_secs"] for r in results if r.get("elapsed_secs") is not None]
+    if game_secs:
+        _print("Game duration (s): " + ", ".join(f"p{q}={percentile(game_secs, q):.2f}" for q in (50, 90, 99)))
+    wins: Dict[str, int] = {}
+    for r in results:
+        wins[str(r.get("winner"))] = wins.get(str(r.get("winner")), 0) + 1
+    _print(f"Wins: {wins}")
+
+
+PLAYER_TYPES = ["agent", "random_agent", "alphabeta_agent", "mcts_agent", "human"]
+
+
+def add_player_arguments(p: argparse.ArgumentParser, n: int, types: Optional[List[str]] = None) -> None:
+    """Adds the --p{n}-* player options shared by the CLI runners."""
+    p.add_argument(f"--p{n}-type", default="agent", choices=types or PLAYER_TYPES, help=f"Player {n} type")
+    p.add_argument(f"--p{n}-model", default="gemini-2.0-flash", help=f"Player {n} model/endpoint")
+    p.add_argument(f"--p{n}-temp", type=float, default=0.7, help=f"Player {n} temperature")
+    p.add_argument(f"--p{n}-top-p", type=float, default=1.0, help=f"Player {n} top_p")
+    p.add_argument(f"--p{n}-top-k", type=int, default=40, help=f"Player {n} top_k")
+    p.add_argument(f"--p{n}-persona", default=None, help=f"Player {n} persona (ATTACK|DEFENSE|BALANCE|STRATEGIC)")
+    p.add_argument(f"--p{n}-mem", type=int, default=3, help=f"Player {n} memory size")
+    p.add_argument(f"--p{n}-max-tokens", type=int, default=256, help=f"Player {n} max tokens")
+    p.add_argument(f"--p{n}-max-depth", type=int, default=None, help=f"Player {n} search depth (alphabeta_agent)")
+    p.add_argument(f"--p{n}-time-limit", type=float, default=None, help=f"Player {n} seconds per move (alphabeta_agent, mcts_agent)")
+    p.add_argument(f"--p{n}-workers", type=int, default=None, help=f"Player {n} rollout processes (mcts_agent, default 1)")
+    p.add_argument(f"--p{n}-tablebase", default=None, help=f"Player {n} endgame tablebase file (alphabeta_agent)")
+    p.add_argument(f"--p{n}-rollout", default=None, choices=["random", "heuristic"], help=f"Player {n} rollout policy (mcts_agent)")
+
+
+def player_settings_from_args(args: argparse.Namespace, n: int) -> Dict[str, Any]:
+    return build_player_settings(
+        p_type=getattr(args, f"p{n}_type"),
+        model=getattr(args, f"p{n}_model"),
+        temperature=getattr(args, f"p{n}_temp"),
+        max_tokens=getattr(args, f"p{n}_max_tokens"),
+        top_p=getattr(args, f"p{n}_top_p"),
+        top_k=getattr(args, f"p{n}_top_k"),
+        persona=getattr(args, f"p{n}_persona"),
+        mem_size=getattr(args, f"p{n}_mem"),
+        max_depth=getattr(args, f"p{n}_max_depth"),
+        time_limit=getattr(args, f"p{n}_time_limit"),
+        workers=getattr(args, f"p{n}_workers"),
+        rollout=getattr(args, f"p{n}_rollout"),
+        tablebase=getattr(args, f"p{n}_tablebase"),
+    )
+
+
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Auto-play O An Quan games via API")
-    p.add_argument("--server", default="http://127.0.0.1:8000", help="Base URL of FastAPI server")
+    p.add_argument("--server", nargs="+", default=["http://127.0.0.1:8000"],
+                   help="Base URL(s) of FastAPI servers; games are spread over them round-robin")
     p.add_argument("--games", type=int, default=1, help="Number of games to run")
+    p.add_argument("--concurrency", type=int, default=1, help="Games in flight at once")
     p.add_argument("--extended-rules", nargs="*", default=None, help="Optional extended rules list, e.g. E1 E2 E3")
     p.add_argument("--quiet", action="store_true", help="Reduce console output")
     p.add_argument("--download-logs", action="store_true", help="Download final JSON log after each game")
     p.add_argument("--out-dir", default="logs/exported", help="Where to save downloaded logs")
+    p.add_argument("--autoplay", action="store_true", help="Let the server play each game and stream the moves back")
 
-    # Player 1 settings
-    p.add_argument("--p1-type", default="agent", choices=["agent", "random_agent", "human"], help="Player 1 type")
-    p.add_argument("--p1-model", default="gemini-2.0-flash", help="Player 1 model/endpoint")
-    p.add_argument("--p1-temp", type=float, default=0.7, help="Player 1 temperature")
-    p.add_argument("--p1-top-p", type=float, default=1.0, help="Player 1 top_p")
-    p.add_argument("--p1-top-k", type=int, default=40, help="Player 1 top_k")
-    p.add_argument("--p1-persona", default=None, help="Player 1 persona (ATTACK|DEFENSE|BALANCE|STRATEGIC)")
-    p.add_argument("--p1-mem", type=int, default=3, help="Player 1 memory size")
-    p.add_argument("--p1-max-tokens", type=int, default=256, help="Player 1 max tokens")
-
-    # Player 2 settings
-    p.add_argument("--p2-type", default="agent", choices=["agent", "random_agent", "human"], help="Player 2 type")
-    p.add_argument("--p2-model", default="gemini-2.0-flash", help="Player 2 model/endpoint")
-    p.add_argument("--p2-temp", type=float, default=0.7, help="Player 2 temperature")
-    p.add_argument("--p2-top-p", type=float, default=1.0, help="Player 2 top_p")
-    p.add_argument("--p2-top-k", type=int, default=40, help="Player 2 top_k")
-    p.add_argument("--p2-persona", default=None, help="Player 2 persona (ATTACK|DEFENSE|BALANCE|STRATEGIC)")
-    p.add_argument("--p2-mem", type=int, default=3, help="Player 2 memory size")
-    p.add_argument("--p2-max-tokens", type=int, default=256, help="Player 2 max tokens")
+    add_player_arguments(p, 1)
+    add_player_arguments(p, 2)
 
     return p.parse_args(argv)
 
 
 def main(argv: Optional[List[str]] = None) -> int:
     args = parse_args(argv)
-    base_url = args.server.rstrip("/")
-
-    if not check_server(base_url):
-        _print(f"Server not reachable at {base_url}. Please start FastAPI (e.g., `uvicorn main:app --reload`).")
-        return 2
-
-    p1 = build_player_settings(
-        p_type=args.p1_type,
-        model=args.p1_model,
-        temperature=args.p1_temp,
-        max_tokens=args.p1_max_tokens,
-        top_p=args.p1_top_p,
-        top_k=args.p1_top_k,
-        persona=args.p1_persona,
-        mem_size=args.p1_mem,
-    )
-    p2 = build_player_settings(
-        p_type=args.p2_type,
-        model=args.p2_model,
-        temperature=args.p2_temp,
-        max_tokens=args.p2_max_tokens,
-        top_p=args.p2_top_p,
-        top_k=args.p2_top_k,
-        persona=args.p2_persona,
-        mem_size=args.p2_mem,
-    )
+    servers = [url.rstrip("/") for url in args.server]
+
+    for base_url in servers:
+        if not check_server(base_url):
+            _print(f"Server not reachable at {base_url}. Please start FastAPI (e.g., `uvicorn main:app --reload`).")
+            return 2
+
+    p1 = player_settings_from_args(args, 1)
+    p2 = player_settings_from_args(args, 2)
 
     if p1.get("type") == "human" or p2.get("type") == "human":
-        _print("Human player type is not supported by this CLI. Use agent or random_agent.")
+        _print("Human player type is not supported by this CLI. Use agent, random_agent, alphabeta_agent or mcts_agent.")
         return 3
 
-    _print(f"Running {args.games} game(s) against {base_url}...")
-    for gi in range(1, args.games + 1):
-        _print(f"\n=== Game {gi}/{args.games} ===")
-        res = run_single_game(base_url, p1, p2, extended_rules=args.extended_rules, print_steps=(not args.quiet))
-        _print(f"Result: winner={res.get('winner')}, elapsed={res.get('elapsed_secs')}s")
+    concurrency = max(1, args.concurrency)
+    # Step-by-step output of parallel games would interleave; print one line per game instead.
+    print_steps = not args.quiet and concurrency == 1
+    run = run_single_game_streamed if args.autoplay else run_single_game
 
+    def play(gi: int) -> Dict[str, Any]:
+        base_url = servers[(gi - 1) % len(servers)]
+        if concurrency == 1:
+            _print(f"\n=== Game {gi}/{args.games} ===")
+        res = run(base_url, p1, p2, extended_rules=args.extended_rules, print_steps=print_steps)
         if args.download_logs:
-            saved = fetch_and_save_log(base_url, args.out_dir)
-            if saved:
-                _print(f"Saved JSON log: {saved}")
-            else:
-                _print("Could not download JSON log (server may not expose a file).")
-
+            res["saved"] = fetch_and_save_log(base_url, args.out_dir, res.get("game_id"))
+        return res
+
+    _print(f"Running {args.games} game(s) against {', '.join(servers)} (concurrency {concurrency})...")
+    results: List[Dict[str, Any]] = []
+    failed = 0
+    start_t = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(play, gi): gi for gi in range(1, args.games + 1)}
+        for fut in as_completed(futures):
+            gi = futures[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                failed += 1
+                _print(f"[game {gi}/{args.games}] failed: {type(e).__name__}: {e}")
+                continue
+            results.append(res)
+            if not args.quiet or concurrency == 1:
+                _print(f"[game {gi}/{args.games}] Result: winner={res.get('winner')}, elapsed={res.get('elapsed_secs')}s")
+            if args.download_logs:
+                if res.get("saved"):
+                    _print(f"Saved JSON log: {res['saved']}")
+                else:
+                    _print("Could not download JSON log (server may not expose a file).")
+
+    print_run_summary(results, failed, time.perf_counter() - start_t, len(servers), concurrency)
     _print("\nDone.")
-    return 0
+    return 0 if not failed else 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Headless self-play runner: plays games in-process, without the FastAPI server,
+spread over a process pool, and writes one `report.*.json` per game.
+
+Usage examples:
+  - 1000 random-vs-random games on all cores:
+      python -m cli.run_selfplay --games 1000 --p1-type random_agent --p2-type random_agent
+
+  - Alpha-beta search (50 ms per move) against the random baseline:
+      python -m cli.run_selfplay --games 200 --p1-type alphabeta_agent --p1-time-limit 0.05 \
+          --p2-type random_agent
+
+  - 20 Gemini games against the random baseline with rules E1 E2:
+      python -m cli.run_selfplay --games 20 --workers 4 --extended-rules E1 E2 \
+          --p1-type agent --p1-model gemini-2.0-flash --p2-type random_agent \
+          --out-dir logs/selfplay/gemini-2.0-flash
+
+  - The same games again, answered from an LLM response cache filled by a first run:
+      python -m cli.run_selfplay --games 20 --workers 4 --seed 7 --extended-rules E1 E2 \
+          --p1-type agent --p1-model gemini-2.0-flash --p2-type random_agent \
+          --llm-cache logs/llm_cache.sqlite
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from cli.run_basic import _print, add_player_arguments, player_settings_from_args
+from core.tournament import run_game_task, summarize
+
+
+def make_tasks(args: argparse.Namespace, p1: Dict[str, Any], p2: Dict[str, Any]) -> List[Dict[str, Any]]:
+    ts = datetime.now().strftime("%Y.%m.%d.%H%M%S")
+    tasks = []
+    for gi in range(args.games):
+        tasks.append({
+            "player1": p1,
+            "player2": p2,
+            "extended_rules": args.extended_rules,
+            "seed": None if args.seed is None else args.seed + gi,
+            "quiet": args.quiet,
+            "llm_cache": llm_cache_from_args(args),
+            # One batch shares a timestamp; the game index keeps file names unique.
+            "path": os.path.join(args.out_dir, f"report.{ts}.{gi:04d}.json"),
+        })
+    return tasks
+
+
+def llm_cache_from_args(args: argparse.Namespace) -> Optional[Dict[str, Any]]:
+    """`core.llm_cache.configure_cache` arguments for the workers, or None without --llm-cache."""
+    if not args.llm_cache:
+        return None
+    return {
+        "path": args.llm_cache,
+        "mode": args.llm_cache_mode,
+        "max_entries": args.llm_cache_max_entries,
+        "max_bytes": int(args.llm_cache_max_mb * 1024 * 1024) if args.llm_cache_max_mb else None,
+        "max_age_secs": args.llm_cache_max_age_days * 86400 if args.llm_cache_max_age_days else None,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Headless O An Quan self-play over a process pool")
+    p.add_argument("--games", type=int, default=1, help="Number of games to run")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    p.add_argument("--extended-rules", nargs="*", default=None, help="Optional extended rules list, e.g. E1 E2 E3")
+    p.add_argument("--seed", type=int, default=None, help="Base seed; game i uses seed + i")
+    p.add_argument("--out-dir", default="logs/selfplay", help="Where to write report.*.json files")
+    p.add_argument("--quiet", action="store_true", help="Silence per-game prints from agents and environment")
+    p.add_argument("--llm-cache", default=None, help="SQLite file caching LLM answers, e.g. logs/llm_cache.sqlite")
+    p.add_argument("--llm-cache-mode", default="read_through", choices=["read_through", "record"],
+                   help="read_through: answer from the cache, call on a miss; record: always call and store")
+    p.add_argument("--llm-cache-max-entries", type=int, default=None, help="Keep at most this many answers (LRU)")
+    p.add_argument("--llm-cache-max-mb", type=float, default=None, help="Keep at most this many MB of answers (LRU)")
+    p.add_argument("--llm-cache-max-age-days", type=float, default=None, help="Drop answers older than this")
+
+    add_player_arguments(p, 1, ["agent", "random_agent", "alphabeta_agent", "mcts_agent"])
+    add_player_arguments(p, 2, ["agent", "random_agent", "alphabeta_agent", "mcts_agent"])
+
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    p1 = player_settings_from_args(args, 1)
+    p2 = player_settings_from_args(args, 2)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    tasks = make_tasks(args, p1, p2)
+    _print(f"Running {len(tasks)} game(s) on {args.workers} worker(s) -> {args.out_dir}")
+
+    results: List[Dict[str, Any]] = []
+    start_t = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_game_task, task) for task in tasks]
+        for done, fut in enumerate(as_completed(futures), 1):
+            res = fut.result()
+            results.append(res)
+            if not args.quiet:
+                _print(f"[{done}/{len(tasks)}] winner={res['result']['winner']} steps={res['steps']} elapsed={res['elapsed_secs']}s")
+
+    elapsed = time.perf_counter() - start_t
+    _print(f"\nDone: {len(tasks)} game(s) in {elapsed:.2f}s ({len(tasks) / max(elapsed, 1e-9):.1f} games/s).")
+    _print(json.dumps(summarize(results), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,308 @@
+"""
+Vectorized engine that plays N games of O An Quan in lockstep.
+
+The boards live in (N, 12) NumPy arrays indexed like `core.board.ORDER`: peasant
+counts, owner bit strings (uint64, bit k = team of the k-th peasant in drop order)
+and mandarin flags. A turn follows `GameSession.request_move`/`run_move_logic`: round
+increment on A's turn, `restore_peasants`, one move per game, then the end checks.
+Finished games are masked out; every game moves on the same team's turn.
+"""
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .board import SIDE_PITS, MANDARIN_PITS, MANDARIN_VALUE, NO_MANDARIN, DEFAULT_RULES, CompactState, rule_flags
+
+# Owner bits are kept in one uint64 word per square.
+MAX_PIT_PEASANTS = 64
+
+END_NONE = 0
+END_CAPTURE = 1       # both mandarins captured
+END_EARLY_WIN = 2     # a team reached `early_win_score`
+END_MAX_ROUND = 3     # `max_round` reached
+END_NO_RESTORE = 4    # the team to move could not restore peasants
+
+WINNER_A, WINNER_B, WINNER_DRAW = 0, 1, 2
+
+Policy = Callable[["BatchEnviroment", np.ndarray], tuple[np.ndarray, np.ndarray]]
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    x = x.astype(np.uint64)
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def batch_sow(counts: np.ndarray, owners: np.ndarray, mandarins: np.ndarray, score: np.ndarray,
+              rounds: np.ndarray, rows: np.ndarray, start: np.ndarray, direction: np.ndarray,
+              apply_e1: bool, apply_e2: bool) -> None:
+    """
+    Apply one move per row in place: `core.board.sow` over a set of rows.
+
+    `rows` selects the games to move, `start` holds the square index (into ORDER) and
+    `direction` is +1 for clockwise, -1 for counter-clockwise, both aligned with `rows`.
+    """
+    if not (counts.flags.c_contiguous and owners.flags.c_contiguous and mandarins.flags.c_contiguous):
+        raise ValueError("batch_sow() needs C-contiguous board arrays.")
+    # Flat views: square j of game g lives at g * 12 + j.
+    counts_f, owners_f, mandarins_f = counts.reshape(-1), owners.reshape(-1), mandarins.reshape(-1)
+    rows = np.asarray(rows, dtype=np.int64)
+    idx = np.asarray(start, dtype=np.int64).copy()
+    step = np.asarray(direction, dtype=np.int64)
+    loop_count = np.zeros(len(rows), dtype=np.int64)
+    last_scatter = np.zeros(len(rows), dtype=bool)
+    live = np.ones(len(rows), dtype=bool)
+    q_mask = np.zeros(12, dtype=bool)
+    q_mask[list(MANDARIN_PITS)] = True
+    one = np.uint64(1)
+
+    while live.any():
+        sel = np.nonzero(live)[0]
+        r, d = rows[sel], step[sel]
+        base = r * 12
+        src = base + idx[sel]
+        n = counts_f[src].astype(np.int64)
+        bits = owners_f[src]
+        counts_f[src] = 0
+        owners_f[src] = 0
+
+        current = idx[sel]
+        for k in range(int(n.max(initial=0))):
+            m = np.nonzero(n > k)[0]
+            current[m] = (current[m] + d[m]) % 12
+            flat = base[m] + current[m]
+            owner = (bits[m] >> np.uint64(k)) & one
+            owners_f[flat] |= owner << counts_f[flat].astype(np.uint64)
+            counts_f[flat] += 1
+        if (counts_f[(base[:, None] + np.arange(12)).reshape(-1)] > MAX_PIT_PEASANTS).any():
+            raise OverflowError(f"A square exceeded {MAX_PIT_PEASANTS} peasants; owner bits no longer fit.")
+
+        live[sel[last_scatter[sel]]] = False
+        capturing = ~last_scatter[sel] & (loop_count[sel] < 100)
+        redistribute = np.zeros(len(sel), dtype=bool)
+        next_idx = np.zeros(len(sel), dtype=np.int64)
+
+        while capturing.any():
+            c = np.nonzero(capturing)[0]
+            loop_count[sel[c]] += 1
+            dc, bc = d[c], base[c]
+            nxt = (current[c] + dc) % 12
+            next_idx[c] = nxt
+            next_count = counts_f[bc + nxt]
+            occupied = (next_count > 0) | (mandarins_f[bc + nxt] != NO_MANDARIN)
+            redistribute[c] = next_count > 0
+
+            target = (nxt + dc) % 12
+            t_flat = bc + target
+            t_mand = mandarins_f[t_flat]
+            t_count = counts_f[t_flat].astype(np.int64)
+            t_size = t_count + (t_mand != NO_MANDARIN)
+            blocked = occupied | (t_size == 0)
+            if apply_e1:
+                blocked |= q_mask[target] & ((t_size < 5) | (rounds[rows[sel[c]]] < 3))
+
+            take = np.nonzero(~blocked)[0]
+            tf, mt = t_flat[take], t_mand[take]
+            gain_b = _popcount(owners_f[tf])
+            gain_a = t_count[take] - gain_b + np.where(mt == 0, MANDARIN_VALUE, 0)
+            gain_b += np.where(mt == 1, MANDARIN_VALUE, 0)
+            rt = r[c[take]]
+            score[rt, 0] += gain_a
+            score[rt, 1] += gain_b
+            counts_f[tf] = 0
+            owners_f[tf] = 0
+            mandarins_f[tf] = NO_MANDARIN
+            current[c[take]] = target[take]
+
+            capturing[c[blocked]] = False
+            capturing[c[take][loop_count[sel[c[take]]] >= 100]] = False
+
+        # Squares after the last drop that still hold peasants are picked up next;
+        # without E2 that second scatter is the last one.
+        live[sel[~redistribute]] = False
+        cont = sel[redistribute]
+        idx[cont] = next_idx[redistribute]
+        last_scatter[cont] = not apply_e2
+
+
+class BatchEnviroment:
+    def __init__(self, n_games: int, extended_rules: List[str] | None = None,
+                 max_round: int = 12, early_win_score: int = 25):
+        self.n_games = n_games
+        self.extended_rules = list(extended_rules or DEFAULT_RULES)
+        self.apply_e1, self.apply_e2 = rule_flags(extended_rules)
+        self.max_round = max_round
+        self.early_win_score = early_win_score
+        self.reset()
+
+    def reset(self):
+        initial = CompactState.initial()
+        n = self.n_games
+        self.counts = np.tile(np.array(initial.counts, dtype=np.int16), (n, 1))
+        self.owners = np.tile(np.array(initial.owners, dtype=np.uint64), (n, 1))
+        self.mandarins = np.tile(np.array(initial.mandarins, dtype=np.int8), (n, 1))
+        self.score = np.zeros((n, 2), dtype=np.int32)
+        self.round = np.zeros(n, dtype=np.int32)
+        self.plies = np.zeros(n, dtype=np.int32)
+        self.done = np.zeros(n, dtype=bool)
+        self.end_reason = np.full(n, END_NONE, dtype=np.int8)
+        self.winner = np.full(n, -1, dtype=np.int8)
+        self.turn = 0
+
+    @property
+    def team(self) -> str:
+        return "AB"[self.turn]
+
+    def side_pits(self, team: Optional[str] = None) -> np.ndarray:
+        return np.array(SIDE_PITS[team or self.team], dtype=np.int64)
+
+    def available_mask(self, team: Optional[str] = None) -> np.ndarray:
+        """(N, 5) mask of playable squares, in `players_map` order (A1..A5 / B1..B5)."""
+        pits = self.side_pits(team)
+        return (self.counts[:, pits] > 0) | (self.mandarins[:, pits] != NO_MANDARIN)
+
+    def restore_peasants(self) -> None:
+        team_idx = self.turn
+        pits = self.side_pits()
+        empty = ~self.done & ~self.available_mask().any(axis=1)
+        can_restore = empty & (self.score[:, team_idx] >= 5)
+        rows = np.nonzero(can_restore)[0]
+        self.score[rows, team_idx] -= 5
+        for p in pits:
+            self.owners[rows, p] |= np.uint64(team_idx) << self.counts[rows, p].astype(np.uint64)
+            self.counts[rows, p] += 1
+        self._finish(empty & ~can_restore, END_NO_RESTORE)
+
+    def commit(self, choice: np.ndarray, direction: np.ndarray) -> None:
+        """
+        Play one move in every unfinished game.
+
+        `choice` indexes the team's squares (0..4 for A1..A5 / B1..B5) and `direction`
+        is +1 (clockwise) or -1 (counter-clockwise); entries of finished games are ignored.
+        """
+        rows = np.nonzero(~self.done)[0]
+        pits = self.side_pits()[np.asarray(choice, dtype=np.int64)[rows]]
+        if (self.counts[rows, pits] == 0).any():
+            raise ValueError("commit() got a square without peasants for an unfinished game.")
+        batch_sow(self.counts, self.owners, self.mandarins, self.score, self.round,
+                  rows, pits, np.asarray(direction, dtype=np.int64)[rows], self.apply_e1, self.apply_e2)
+        self.plies[rows] += 1
+
+        live = ~self.done
+        both_captured = (self.mandarins[:, MANDARIN_PITS[0]] == NO_MANDARIN) & (self.mandarins[:, MANDARIN_PITS[1]] == NO_MANDARIN)
+        self._finish(live & both_captured, END_CAPTURE)
+        self._finish(~self.done & (self.score >= self.early_win_score).any(axis=1), END_EARLY_WIN)
+        self._finish(~self.done & (self.round >= self.max_round), END_MAX_ROUND)
+
+    def step(self, policy: Policy) -> None:
+        """One full turn for the team to move: round, restore, policy move, end checks."""
+        if self.turn == 0:
+            self.round[~self.done] += 1
+        self.restore_peasants()
+        if not self.done.all():
+            choice, direction = policy(self, ~self.done)
+            self.commit(choice, direction)
+        self.turn ^= 1
+
+    def run(self, policy_a: Policy, policy_b: Policy, max_plies: int = 1000) -> Dict[str, np.ndarray]:
+        for _ in range(max_plies):
+            if self.done.all():
+                break
+            self.step(policy_a if self.turn == 0 else policy_b)
+        return self.results()
+
+    def results(self) -> Dict[str, np.ndarray]:
+        return {
+            "winner": self.winner.copy(),
+            "score": self.score.copy(),
+            "final_round": self.round.copy(),
+            "plies": self.plies.copy(),
+            "end_reason": self.end_reason.copy(),
+        }
+
+    def to_compact(self, game: int) -> CompactState:
+        return CompactState(
+            [int(v) for v in self.counts[game]],
+            [int(v) for v in self.owners[game]],
+            [int(v) for v in self.mandarins[game]],
+            [int(v) for v in self.score[game]],
+            int(self.round[game]),
+        )
+
+    def get_game_state(self, game: int) -> dict:
+        return self.to_compact(game).to_game_state()
+
+    def _finish(self, mask: np.ndarray, reason: int) -> None:
+        mask = mask & ~self.done
+        if not mask.any():
+            return
+        a, b = self.score[:, 0], self.score[:, 1]
+        winner = np.where(a > b, WINNER_A, np.where(b > a, WINNER_B, WINNER_DRAW))
+        self.winner[mask] = winner[mask]
+        self.end_reason[mask] = reason
+        self.done |= mask
+
+
+def random_policy(rng: Optional[np.random.Generator] = None) -> Policy:
+    """Uniform choice among playable squares and directions, like `MockPlayerAgent`."""
+    rng = rng or np.random.default_rng()
+
+    def policy(env: BatchEnviroment, active: np.ndarray):
+        mask = env.available_mask()
+        noise = rng.random(mask.shape)
+        noise[~mask] = -1.0
+        return noise.argmax(axis=1), rng.choice(np.array([1, -1]), size=env.n_games)
+
+    return policy
+
+
+def greedy_policy(rng: Optional[np.random.Generator] = None) -> Policy:
+    """
+    One-ply heuristic: play the move with the best immediate score swing for the mover.
+
+    All ten candidate moves of every game are simulated as one (10 * N)-row batch; ties
+    are broken randomly.
+    """
+    rng = rng or np.random.default_rng()
+    directions = np.array([1, -1], dtype=np.int64)
+
+    def policy(env: BatchEnviroment, active: np.ndarray):
+        n, team_idx = env.n_games, env.turn
+        pits = env.side_pits()
+        mask = env.available_mask()
+        reps = 2 * len(pits)
+        counts = np.repeat(env.counts, reps, axis=0)
+        owners = np.repeat(env.owners, reps, axis=0)
+        mandarins = np.repeat(env.mandarins, reps, axis=0)
+        score = np.repeat(env.score, reps, axis=0).astype(np.int64)
+        rounds = np.repeat(env.round, reps)
+        cand_pit = np.tile(np.repeat(pits, 2), n)
+        cand_dir = np.tile(directions, n * len(pits))
+        legal = np.repeat(mask, 2, axis=1).reshape(-1) & np.repeat(active, reps)
+        rows = np.nonzero(legal)[0]
+        batch_sow(counts, owners, mandarins, score, rounds, rows, cand_pit[rows], cand_dir[rows],
+                  env.apply_e1, env.apply_e2)
+
+        swing = (score[:, team_idx] - score[:, 1 - team_idx]).astype(float)
+        swing += rng.random(len(swing)) * 0.5
+        swing[~legal] = -np.inf
+        best = swing.reshape(n, reps).argmax(axis=1)
+        return best // 2, directions[best % 2]
+
+    return policy
+
+
+def summarize(results: Dict[str, np.ndarray]) -> Dict[str, float]:
+    winner = results["winner"]
+    n = max(len(winner), 1)
+    return {
+        "games": int(len(winner)),
+        "win_rate_a": float((winner == WINNER_A).sum() / n),
+        "win_rate_b": float((winner == WINNER_B).sum() / n),
+        "draw_rate": float((winner == WINNER_DRAW).sum() / n),
+        "mean_score_a": float(results["score"][:, 0].mean()) if len(winner) else 0.0,
+        "mean_score_b": float(results["score"][:, 1].mean()) if len(winner) else 0.0,
+        "mean_final_round": float(results["final_round"].mean()) if len(winner) else 0.0,
+    }
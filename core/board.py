@@ -0,0 +1,243 @@
+from typing import Dict, List, Any, NamedTuple, Optional
+
+# Clockwise order of the twelve squares; every compact structure is indexed by it.
+ORDER = ["QA", "A1", "A2", "A3", "A4", "A5", "QB", "B5", "B4", "B3", "B2", "B1"]
+PIT_INDEX = {pos: i for i, pos in enumerate(ORDER)}
+SIDE_PITS = {"A": (1, 2, 3, 4, 5), "B": (11, 10, 9, 8, 7)}
+MANDARIN_PITS = (0, 6)
+# Turning the board half a revolution swaps the two sides: QA <-> QB, A1 <-> B5, ..., A5 <-> B1.
+MIRROR_PIT = tuple((i + 6) % 12 for i in range(12))
+TEAMS = ("A", "B")
+
+NO_MANDARIN = -1
+PEASANT_TOKENS = ("peasant_a", "peasant_b")
+MANDARIN_TOKENS = ("mandarin_a", "mandarin_b")
+MANDARIN_VALUE = 10
+DEFAULT_RULES = ["E1", "E2", "E3", "E4", "E5"]
+
+
+def rule_flags(extended_rules: Optional[List[str]]) -> tuple[bool, bool]:
+    """(apply_e1, apply_e2); an empty or missing rule list means every rule is on."""
+    extended_rules = extended_rules or DEFAULT_RULES
+    return "E1" in extended_rules, "E2" in extended_rules
+
+
+class FrozenState(NamedTuple):
+    """
+    Immutable, hashable value of a `CompactState`. Forking is free: share the object.
+    Equal positions compare and hash equal, so it can key dicts and sets directly.
+    """
+    counts: tuple
+    owners: tuple
+    mandarins: tuple
+    score: tuple
+    round: int
+
+    def thaw(self) -> "CompactState":
+        return CompactState(list(self.counts), list(self.owners), list(self.mandarins), list(self.score), self.round)
+
+    def to_game_state(self) -> Dict[str, Any]:
+        return self.thaw().to_game_state()
+
+
+class CompactState:
+    """
+    Count-based game state, held in five flat slots.
+
+    Each square keeps a peasant count, an owner bit string (bit k is the team of the
+    k-th peasant in drop order, 0 = A, 1 = B) and a mandarin flag (team index or
+    NO_MANDARIN). Together they carry exactly the information of the dict-of-lists
+    board, so `to_game_state`/`from_game_state` round-trip losslessly.
+
+    `apply`/`undo` try a move and take it back in place; `freeze` gives the immutable
+    `FrozenState` value.
+    """
+    __slots__ = ("counts", "owners", "mandarins", "score", "round", "_trail")
+
+    def __init__(self, counts: List[int], owners: List[int], mandarins: List[int], score: List[int], round_idx: int = 0):
+        self.counts = counts
+        self.owners = owners
+        self.mandarins = mandarins
+        self.score = score
+        self.round = round_idx
+        self._trail = None
+
+    @classmethod
+    def initial(cls) -> "CompactState":
+        counts = [0] + [5] * 5 + [0] + [5] * 5
+        owners = [0] * 7 + [0b11111] * 5
+        mandarins = [0] + [NO_MANDARIN] * 5 + [1] + [NO_MANDARIN] * 5
+        return cls(counts, owners, mandarins, [0, 0], 0)
+
+    @classmethod
+    def from_game_state(cls, game_state: Dict[str, Any]) -> "CompactState":
+        counts = [0] * 12
+        owners = [0] * 12
+        mandarins = [NO_MANDARIN] * 12
+        board = game_state["board"]
+        for i, pos in enumerate(ORDER):
+            n, bits = 0, 0
+            for token in board.get(pos, []):
+                team = 0 if token.endswith("_a") else 1
+                if token.startswith("mandarin"):
+                    mandarins[i] = team
+                else:
+                    bits |= team << n
+                    n += 1
+            counts[i], owners[i] = n, bits
+        score = game_state.get("score", {})
+        return cls(counts, owners, mandarins, [score.get("A", 0), score.get("B", 0)], game_state.get("round", 0))
+
+    def to_game_state(self) -> Dict[str, Any]:
+        return {
+            "board": {pos: self.pieces(i) for i, pos in enumerate(ORDER)},
+            "score": {"A": self.score[0], "B": self.score[1]},
+            "round": self.round,
+        }
+
+    def copy(self) -> "CompactState":
+        return CompactState(self.counts[:], self.owners[:], self.mandarins[:], self.score[:], self.round)
+
+    def freeze(self) -> FrozenState:
+        return FrozenState(tuple(self.counts), tuple(self.owners), tuple(self.mandarins), tuple(self.score), self.round)
+
+    def restore(self, frozen: FrozenState) -> None:
+        """Overwrites this state with `frozen`, reusing the existing lists."""
+        self.counts[:] = frozen.counts
+        self.owners[:] = frozen.owners
+        self.mandarins[:] = frozen.mandarins
+        self.score[:] = frozen.score
+        self.round = frozen.round
+
+    def apply(self, idx: int, direction: int, apply_e1: bool, apply_e2: bool) -> tuple[int, int, int]:
+        """`sow` in place, remembering the previous value so `undo` can revert it."""
+        if self._trail is None:
+            self._trail = []
+        self._trail.append(self.freeze())
+        return sow(self, idx, direction, apply_e1, apply_e2)
+
+    def undo(self) -> None:
+        """Reverts the most recent `apply` that has not been undone yet."""
+        if not self._trail:
+            raise IndexError("undo() without a matching apply().")
+        self.restore(self._trail.pop())
+
+    def peasant_tokens(self, idx: int) -> List[str]:
+        bits = self.owners[idx]
+        return [PEASANT_TOKENS[(bits >> k) & 1] for k in range(self.counts[idx])]
+
+    def pieces(self, idx: int) -> List[str]:
+        tokens = self.peasant_tokens(idx)
+        if self.mandarins[idx] != NO_MANDARIN:
+            tokens.insert(0, MANDARIN_TOKENS[self.mandarins[idx]])
+        return tokens
+
+    def size(self, idx: int) -> int:
+        return self.counts[idx] + (self.mandarins[idx] != NO_MANDARIN)
+
+    def tally(self, idx: int) -> tuple[int, int]:
+        """Number of (A, B) peasants on a square."""
+        b = self.owners[idx].bit_count()
+        return self.counts[idx] - b, b
+
+    def available(self, team: str) -> List[int]:
+        return [i for i in SIDE_PITS[team] if self.size(i)]
+
+    def is_end(self) -> bool:
+        return self.mandarins[0] == NO_MANDARIN and self.mandarins[6] == NO_MANDARIN
+
+    def mirrored(self) -> "CompactState":
+        """
+        The same position seen from the other side: squares rotated by MIRROR_PIT and
+        every piece (and score) handed to the other team. Sowing commutes with it, so
+        B's move from square i equals A's move from MIRROR_PIT[i] on the mirror.
+        """
+        counts, owners, mandarins = [0] * 12, [0] * 12, [NO_MANDARIN] * 12
+        for i in range(12):
+            j = MIRROR_PIT[i]
+            n = self.counts[i]
+            counts[j] = n
+            owners[j] = self.owners[i] ^ ((1 << n) - 1)
+            if self.mandarins[i] != NO_MANDARIN:
+                mandarins[j] = 1 - self.mandarins[i]
+        return CompactState(counts, owners, mandarins, [self.score[1], self.score[0]], self.round)
+
+
+def sow(state: CompactState, idx: int, direction: int, apply_e1: bool, apply_e2: bool,
+        events: Optional[list] = None) -> tuple[int, int, int]:
+    """
+    Scatter the peasants of square `idx` and resolve captures/redistribution in place.
+
+    The caller must ensure the square holds peasants. Animation events are appended to
+    `events` when a list is given, run-length encoded: one `sow` per pickup (square,
+    direction, count and owner bits) instead of one event per dropped piece; see
+    `core.wire.expand_events`. Returns (dropped, captured_peasants, captured_mandarins).
+    """
+    counts, owners, mandarins, score = state.counts, state.owners, state.mandarins, state.score
+    dropped = captured_peasants = captured_mandarins = 0
+    loop_count = 0
+    last_scatter = False
+
+    while True:
+        n, bits = counts[idx], owners[idx]
+        counts[idx], owners[idx] = 0, 0
+        if events is not None:
+            events.append({'type': 'sow', 'pos': ORDER[idx], 'dir': direction, 'n': n, 'bits': bits})
+
+        current = idx
+        for k in range(n):
+            current = (current + direction) % 12
+            owners[current] |= ((bits >> k) & 1) << counts[current]
+            counts[current] += 1
+        dropped += n
+        if last_scatter:
+            break
+
+        redistribute = False
+        while loop_count < 100:
+            loop_count += 1
+            next_idx = (current + direction) % 12
+
+            if counts[next_idx] or mandarins[next_idx] != NO_MANDARIN:
+                # A square holding only its mandarin cannot be picked up: the turn ends.
+                redistribute = counts[next_idx] > 0
+                break
+
+            target = (next_idx + direction) % 12
+            target_mandarin = mandarins[target]
+            target_size = counts[target] + (target_mandarin != NO_MANDARIN)
+            if not target_size:
+                break
+            if apply_e1 and target in MANDARIN_PITS and (target_size < 5 or state.round < 3):
+                break
+
+            m, m_bits = counts[target], owners[target]
+            gain_b = m_bits.bit_count()
+            gain_a = m - gain_b
+            if target_mandarin != NO_MANDARIN:
+                captured_mandarins += 1
+                if target_mandarin == 0:
+                    gain_a += MANDARIN_VALUE
+                else:
+                    gain_b += MANDARIN_VALUE
+            captured_peasants += m
+            if events is not None:
+                # Team of the first piece (the mandarin if there is one), as the UI colours it.
+                team = target_mandarin if target_mandarin != NO_MANDARIN else m_bits & 1
+                events.append({'type': 'capture', 'pos': ORDER[target], 'team': TEAMS[team],
+                               'n': m, 'bits': m_bits, 'mandarin': target_mandarin})
+            score[0] += gain_a
+            score[1] += gain_b
+            counts[target], owners[target], mandarins[target] = 0, 0, NO_MANDARIN
+            if events is not None:
+                events.append({'type': 'score_update', 'score': {"A": score[0], "B": score[1]}})
+            current = target
+
+        if not redistribute:
+            break
+        # The square after the last drop still has peasants: pick them up and keep going.
+        # Without E2 this second scatter still happens once, then the turn ends.
+        idx = next_idx
+        last_scatter = not apply_e2
+
+    return dropped, captured_peasants, captured_mandarins
@@ -0,0 +1,314 @@
+"""
+Game-level helpers shared by the FastAPI server and the headless runners:
+player construction, end conditions and the structured `report.*.json` log.
+"""
+import time
+from typing import Dict, List, Any, Optional
+
+from .board import NO_MANDARIN
+from .environment import Enviroment
+from .player import MockPlayerAgent, PlayerAgent, AlphaBetaPlayerAgent, MCTSPlayerAgent
+from .persona_instruct import ATTACKER, DEFENDER, BALANCED, STRATEGIC
+from .endpoints import ENDPOINTS
+from .rule import MAX_ROUND_IN_GAME, EARLY_WIN_SCORE
+from .gamelog import STATE_ENCODING, compact_step_log
+from .tracing import finished_spans, span, turn_trace
+from models.schemas import PlayerSettings
+
+
+def create_player_from_settings(team: str, settings: PlayerSettings):
+    """Initializes a player agent based on the provided settings."""
+
+    print("SETTING: ", settings)
+
+    if settings.type == 'human':
+        return None
+
+    if settings.type == 'random_agent':
+        return MockPlayerAgent(team=team, persona= BALANCED)
+
+    if settings.type == 'alphabeta_agent':
+        return AlphaBetaPlayerAgent(
+            team=team,
+            persona=BALANCED,
+            max_depth=settings.maxDepth or 8,
+            time_limit=settings.timeLimit if settings.timeLimit is not None else 0.5,
+            tablebase=settings.tablebase,
+        )
+
+    if settings.type == 'mcts_agent':
+        return MCTSPlayerAgent(
+            team=team,
+            persona=BALANCED,
+            time_limit=settings.timeLimit if settings.timeLimit is not None else 1.0,
+            workers=settings.workers,
+            rollout=settings.rollout or "random",
+        )
+
+    if settings.type == 'agent':
+        if not settings.model:
+            settings.model = "gemini-2.0-flash-lite"
+        # Mặc định Balanced
+        persona_obj = BALANCED
+        if settings.persona:
+            persona_map = {
+                "ATTACK": ATTACKER,
+                "DEFENSE": DEFENDER,
+                "BALANCE": BALANCED,
+                "STRATEGIC": STRATEGIC,
+            }
+            key = settings.persona.strip().upper()
+            if key in persona_map:
+                persona_obj = persona_map[key]
+            else:
+                print(f"Warning: Invalid persona value '{settings.persona}'. Using default 'BALANCED'.")
+
+
+        model_provider = "google"
+        for endpoint in ENDPOINTS:
+            if endpoint["endpoint"] == settings.model:
+                model_provider = endpoint["endpoint_provider"]
+
+
+        return PlayerAgent(
+            team=team,
+            model=settings.model,
+            provider=model_provider,
+            temperature=settings.temperature,
+            top_p=settings.topP,
+            top_k=settings.topK,
+            persona=persona_obj,
+            mem_size=settings.memSize,
+            max_tokens=settings.maxTokens,
+        )
+    return None
+
+
+def player_setup_from_settings(settings: PlayerSettings) -> dict:
+    """Return a simplified view of player setup for logs.
+
+    - For 'agent': keep configured endpoint and params (with BALANCED as default persona if empty).
+    - For 'alphabeta_agent' or 'mcts_agent': mark endpoint as the type and keep the search budget.
+    - For 'random_agent' or 'human': mark endpoint as the type and null all other fields.
+    """
+    if settings.type == 'agent':
+        return {
+            "endpoint": settings.model,
+            "mem_size": settings.memSize,
+            "persona": settings.persona if settings.persona else "BALANCED",
+            "temp": settings.temperature,
+            "top_p": settings.topP,
+            "top_k": settings.topK,
+            "max_token": settings.maxTokens,
+        }
+
+    if settings.type == 'alphabeta_agent':
+        return {
+            "endpoint": settings.type,
+            "mem_size": None,
+            "persona": None,
+            "temp": None,
+            "top_p": None,
+            "top_k": None,
+            "max_token": None,
+            "max_depth": settings.maxDepth or 8,
+            "time_limit": settings.timeLimit if settings.timeLimit is not None else 0.5,
+            "tablebase": settings.tablebase,
+        }
+
+    if settings.type == 'mcts_agent':
+        return {
+            "endpoint": settings.type,
+            "mem_size": None,
+            "persona": None,
+            "temp": None,
+            "top_p": None,
+            "top_k": None,
+            "max_token": None,
+            "time_limit": settings.timeLimit if settings.timeLimit is not None else 1.0,
+            "workers": settings.workers,
+            "rollout": settings.rollout or "random",
+        }
+
+    # Non-LLM players: only indicate the kind; other params are irrelevant
+    endpoint_label = settings.type if settings.type in ['random_agent', 'human'] else 'unknown'
+    return {
+        "endpoint": endpoint_label,
+        "mem_size": None,
+        "persona": None,
+        "temp": None,
+        "top_p": None,
+        "top_k": None,
+        "max_token": None,
+    }
+
+
+def new_game_log(player1: PlayerSettings, player2: PlayerSettings,
+                 keyframe: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Empty `report.*.json` document. With a `keyframe` (the state at reset) steps are
+    stored delta-encoded, see `core.gamelog.compact_step_log`.
+    """
+    game_log = {
+        "enviroment": {"special_rules": []},
+        "setup": {
+            "player_a": player_setup_from_settings(player1),
+            "player_b": player_setup_from_settings(player2),
+        },
+    }
+    if keyframe is not None:
+        game_log["state_encoding"] = STATE_ENCODING
+        game_log["keyframe"] = keyframe
+    game_log["result"] = None
+    game_log["step_by_step"] = []
+    return game_log
+
+
+def get_end_reason(game_state: Dict[str, Any], is_end_by_capture: bool) -> Optional[str]:
+    """End conditions checked after every committed move."""
+    score = game_state["score"]
+    if is_end_by_capture: return "Both Mandarins were captured."
+    if score["A"] >= EARLY_WIN_SCORE: return f"Player A reached {score['A']} points."
+    if score["B"] >= EARLY_WIN_SCORE: return f"Player B reached {score['B']} points."
+    if game_state["round"] >= MAX_ROUND_IN_GAME: return "Reached max round limit."
+    return None
+
+
+def get_winner(score: Dict[str, int]) -> str:
+    if score["A"] > score["B"]: return "A"
+    if score["B"] > score["A"]: return "B"
+    return "Draw"
+
+
+def build_step_log(move_payload: Dict[str, Any], before_state: Dict[str, Any], after_state: Dict[str, Any],
+                   animation_events: List[Dict[str, Any]], team: str,
+                   move_stats: Optional[tuple[int, int, int]] = None) -> Dict[str, Any]:
+    """
+    Per-move structured log entry of `report.*.json`.
+
+    Capture and drop counts come from the `sow`/`capture` `animation_events`, or from `move_stats`
+    (`Enviroment.last_move_stats`) when the move was committed headless.
+    """
+    move_action = move_payload.get("action", {})
+    captured_peasants = 0
+    captured_mandarin = 0
+    scattering_step = 0
+    if move_stats is not None:
+        scattering_step, captured_peasants, captured_mandarin = move_stats
+        animation_events = []
+    for evt in animation_events:
+        if evt.get('type') == 'capture':
+            captured_peasants += evt['n']
+            captured_mandarin += evt['mandarin'] != NO_MANDARIN
+        if evt.get('type') == 'sow':
+            scattering_step += evt['n']
+
+    step_log = {
+        "observation": move_payload.get("observation", ""),
+        "reason": move_payload.get("reason", ""),
+        "action": [move_action.get("pos"), move_action.get("way")],
+        "reasoning_times": move_payload.get('_meta_reasoning_secs', 0),
+        "round": before_state.get("round"),
+        "my_score": after_state.get("score", {}).get(team),
+        "game_state_before_act": before_state,
+        "game_state_after_act": after_state,
+        "captured_peasant": captured_peasants,
+        "captured_mandarin": captured_mandarin,
+        "scattering_step": scattering_step,
+    }
+    # Only LLM moves made with a response cache configured (core/llm_cache.py).
+    if move_payload.get('_meta_llm_cache'):
+        step_log["llm_cache"] = move_payload['_meta_llm_cache']
+    return step_log
+
+
+def count_llm_cache(game_log: Dict[str, Any], step_log: Dict[str, Any], team: str) -> None:
+    """Adds the step's response cache outcome to the log's per-player `llm_cache` totals."""
+    outcome = step_log.get("llm_cache")
+    if outcome is None:
+        return
+    side = "player_a" if team == "A" else "player_b"
+    # New dicts, not in-place updates: queued `GameLogWriter` snapshots share them.
+    totals = dict(game_log.get("llm_cache", {}))
+    side_totals = dict(totals.get(side, {"hit": 0, "miss": 0, "record": 0}))
+    side_totals[outcome] += 1
+    totals[side] = side_totals
+    game_log["llm_cache"] = totals
+
+
+def build_result(winner: str, game_state: Dict[str, Any]) -> Dict[str, Any]:
+    """`result` section of the log; the winner's score comes first."""
+    score = game_state.get("score", {})
+    if winner == 'A':
+        return {"winner": "player_a", "score": [score.get('A', 0), score.get('B', 0)], "final_round": game_state.get("round")}
+    if winner == 'B':
+        return {"winner": "player_b", "score": [score.get('B', 0), score.get('A', 0)], "final_round": game_state.get("round")}
+    return {"winner": "draw", "score": [score.get('A', 0), score.get('B', 0)], "final_round": game_state.get("round")}
+
+
+def play_game(player1: PlayerSettings, player2: PlayerSettings,
+              extended_rules: Optional[List[str]] = None, max_plies: int = 1000) -> Dict[str, Any]:
+    """
+    Play one game in-process, following `/api/move` turn by turn, and return its log.
+
+    Human players are not supported. The returned document has the same schema as the
+    server's `report.*.json` (delta-encoded states, per-step trace `spans`).
+    """
+    if player1.type == 'human' or player2.type == 'human':
+        raise ValueError("play_game() cannot drive human players.")
+
+    env = Enviroment(headless=True)
+    players = {"A": create_player_from_settings("A", player1), "B": create_player_from_settings("B", player2)}
+    game_log = new_game_log(player1, player2, keyframe=env.get_game_state())
+    prev_state = game_log["keyframe"]
+    if extended_rules:
+        game_log["enviroment"]["special_rules"] = sorted(set(extended_rules))
+
+    turn = "A"
+    for _ in range(max_plies):
+        with turn_trace():
+            player = players[turn]
+            if turn == "A": env.advance_round()
+
+            with span("restore"):
+                can_continue, _ = env.restore_peasants(turn)
+            if not can_continue:
+                break
+
+            available_pos = env.get_available_pos(turn)
+            start_t = time.perf_counter()
+            with span("decide"):
+                move_payload = player.get_action(env.get_game_state(), available_pos, extended_rule=extended_rules)
+            move_payload['_meta_reasoning_secs'] = round(time.perf_counter() - start_t, 6)
+            move_action = move_payload.get("action", {})
+            if not move_action.get("pos"):
+                break
+
+            before_state = env.get_game_state()
+            try:
+                with span("commit"):
+                    _, _, is_end_by_capture = env.commit_action(move_action, extended_rules)
+            except ValueError:
+                # Like /api/move: an invalid move is logged and the turn passes.
+                env.last_move_stats, is_end_by_capture = (0, 0, 0), False
+            after_state = env.get_game_state()
+            with span("log"):
+                step_log = build_step_log(move_payload, before_state, after_state, [], turn, move_stats=env.last_move_stats)
+                compact_step_log(step_log, prev_state)
+            step_log["spans"] = finished_spans()
+            game_log["step_by_step"].append(step_log)
+            count_llm_cache(game_log, step_log, turn)
+            prev_state = after_state
+
+        if get_end_reason(after_state, is_end_by_capture):
+            break
+        turn = "B" if turn == "A" else "A"
+
+    for player in players.values():
+        # Search agents may hold a process pool.
+        if hasattr(player, "close"):
+            player.close()
+
+    final_state = env.state.to_game_state()
+    game_log["result"] = build_result(get_winner(final_state["score"]), final_state)
+    return game_log
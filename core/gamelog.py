@@ -0,0 +1,351 @@
+"""
+Append-only game log writer.
+
+Every step is appended as one JSON line to `report.<ts>.jsonl` by one background
+thread shared by all games, fed through a bounded queue, so a move costs one small
+`json.dumps` on the writer thread instead of re-serializing the whole game in the
+request handler. The `report.<ts>.json` document (same schema as before) is written
+when the game ends, is abandoned, or is exported; the journal is then deleted.
+
+Journal lines:
+  {"type": "header", "enviroment": ..., "setup": ..., "state_encoding": ..., "keyframe": ...}
+  {"type": "rules", "special_rules": [...]}
+  {"type": "step", "step": {...}}
+  {"type": "result", "result": {...}}
+`assemble_report` turns a leftover journal back into the report document after a crash.
+
+Board states are delta-encoded: the report holds one `keyframe` (the position at
+reset) and every step a `state_delta` with only the squares, score and round that
+changed, instead of full `game_state_before_act`/`game_state_after_act` copies.
+Squares are written as token strings ("A"/"B" mandarin, "a"/"b" peasant, in board
+order), so the encoding is lossless. `expand_report` gives back the full document.
+"""
+import collections
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .metrics import GAME_LOG_OVERFLOW
+
+
+STATE_ENCODING = "delta"
+_TOKEN_CODES = {"mandarin_a": "A", "mandarin_b": "B", "peasant_a": "a", "peasant_b": "b"}
+_CODE_TOKENS = {code: token for token, code in _TOKEN_CODES.items()}
+
+
+# --- Delta-encoded states ---
+
+def encode_pit(tokens: list) -> str:
+    return "".join(_TOKEN_CODES[t] for t in tokens)
+
+
+def decode_pit(code: str) -> list:
+    return [_CODE_TOKENS[c] for c in code]
+
+
+def state_delta(prev: Dict[str, Any], cur: Dict[str, Any]) -> Dict[str, Any]:
+    """What changed from game state `prev` to `cur`; an empty dict if nothing did."""
+    delta: Dict[str, Any] = {}
+    prev_board, board = prev["board"], cur["board"]
+    changed = {pos: encode_pit(tokens) for pos, tokens in board.items() if prev_board.get(pos) != tokens}
+    if changed:
+        delta["board"] = changed
+    if cur["score"] != prev["score"]:
+        delta["score"] = dict(cur["score"])
+    if cur["round"] != prev["round"]:
+        delta["round"] = cur["round"]
+    return delta
+
+
+def apply_state_delta(state: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """A new game state: `state` with `delta` applied. Unchanged square lists are shared."""
+    board = dict(state["board"])
+    for pos, code in delta.get("board", {}).items():
+        board[pos] = decode_pit(code)
+    return {
+        "board": board,
+        "score": dict(delta["score"]) if "score" in delta else state["score"],
+        "round": delta.get("round", state["round"]),
+    }
+
+
+def compact_step_log(step_log: Dict[str, Any], prev_state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replaces the full before/after states of `step_log` (from `core.game.build_step_log`)
+    by a `state_delta` against `prev_state`, the after-state of the previous step or
+    the keyframe. Mutates and returns `step_log`.
+    """
+    before = step_log.pop("game_state_before_act")
+    after = step_log.pop("game_state_after_act")
+    step_log["state_delta"] = {"before": state_delta(prev_state, before), "after": state_delta(before, after)}
+    return step_log
+
+
+def iter_step_states(report: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]]:
+    """Yields (step, game_state_before_act, game_state_after_act) for either encoding."""
+    if report.get("state_encoding") != STATE_ENCODING:
+        for step in report["step_by_step"]:
+            yield step, step["game_state_before_act"], step["game_state_after_act"]
+        return
+    state = report["keyframe"]
+    for step in report["step_by_step"]:
+        before = apply_state_delta(state, step["state_delta"]["before"])
+        state = apply_state_delta(before, step["state_delta"]["after"])
+        yield step, before, state
+
+
+def expand_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """The report with full per-step states, as written before delta encoding."""
+    if report.get("state_encoding") != STATE_ENCODING:
+        return report
+    steps = []
+    for step, before, after in iter_step_states(report):
+        full = {}
+        for k, v in step.items():
+            if k == "state_delta":
+                continue
+            full[k] = v
+            if k == "my_score":
+                # Same key order as core.game.build_step_log.
+                full["game_state_before_act"] = before
+                full["game_state_after_act"] = after
+        steps.append(full)
+    expanded = {k: v for k, v in report.items() if k not in ("state_encoding", "keyframe")}
+    expanded["step_by_step"] = steps
+    return expanded
+
+
+def journal_path_for(report_path: str) -> str:
+    root, _ = os.path.splitext(report_path)
+    return root + ".jsonl"
+
+
+def assemble_report(journal_path: str) -> Dict[str, Any]:
+    """Rebuilds the `report.*.json` document from a journal."""
+    report: Dict[str, Any] = {"enviroment": {"special_rules": []}, "setup": {}}
+    rules, result, steps = None, None, []
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from a crash; everything before it is intact.
+                break
+            kind = record.get("type")
+            if kind == "header":
+                report = {k: v for k, v in record.items() if k != "type"}
+            elif kind == "rules":
+                rules = record["special_rules"]
+            elif kind == "step":
+                steps.append(record["step"])
+            elif kind == "result":
+                result = record["result"]
+    if rules is not None:
+        report["enviroment"] = dict(report["enviroment"], special_rules=rules)
+    report["result"] = result
+    report["step_by_step"] = steps
+    return report
+
+
+class _WriterThread:
+    """
+    The one background thread writing the journals and reports of every game.
+
+    `put` never blocks (it is called from the event loop): once `max_queue` records
+    are pending, later ones wait in an overflow list, in order, and are moved to the
+    queue as the thread catches up. Overflowed records are counted in
+    `oaq_game_log_overflow_records_total`.
+    """
+
+    def __init__(self, max_queue: int = 8192):
+        self._queue: "queue.Queue[Tuple[GameLogWriter, str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._overflow: "collections.deque[Tuple[GameLogWriter, str, Any]]" = collections.deque()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, writer: "GameLogWriter", kind: str, payload: Any) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="game-log-writer", daemon=True)
+                self._thread.start()
+            # Records behind an overflow must not overtake it.
+            if not self._overflow:
+                try:
+                    self._queue.put_nowait((writer, kind, payload))
+                    return
+                except queue.Full:
+                    pass
+            self._overflow.append((writer, kind, payload))
+        GAME_LOG_OVERFLOW.inc()
+
+    def _refill(self) -> None:
+        with self._lock:
+            while self._overflow:
+                try:
+                    self._queue.put_nowait(self._overflow[0])
+                except queue.Full:
+                    return
+                self._overflow.popleft()
+
+    def join(self) -> None:
+        """Blocks until every queued record of every game is on disk."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            writer, kind, payload = self._queue.get()
+            try:
+                writer._handle(kind, payload)
+            except Exception as e:
+                # Best-effort logging; avoid crashing the app
+                print("[log] persist error:", e)
+            finally:
+                writer._done()
+                # Before task_done, so `join` can't return with records still in the overflow.
+                self._refill()
+                self._queue.task_done()
+
+
+_writer = _WriterThread()
+
+
+def wait_for_writes() -> None:
+    """Blocks until every game's queued records are written, e.g. before the server exits."""
+    _writer.join()
+
+
+class GameLogWriter:
+    """
+    Streams one game's log to disk through the shared writer thread.
+
+    `fsync_interval` is in seconds: 0 syncs after every record, None never calls
+    fsync (the OS decides). Once a report with a `result` has been written, or the
+    writer is closed right after a report, the journal is deleted: the report holds
+    everything. A journal only stays behind when the process died mid-game.
+    """
+
+    def __init__(self, report_path: str, game_log: Dict[str, Any], fsync_interval: Optional[float] = 1.0):
+        self.report_path = report_path
+        self.journal_path = journal_path_for(report_path)
+        self.fsync_interval = fsync_interval
+        self._closed = False
+        self._final_written = False
+        self._pending = 0
+        self._idle = threading.Condition()
+        # Writer-thread side
+        self._file = None
+        self._last_sync = time.monotonic()
+        self._finished = False
+        # The last report written holds every journal line so far.
+        self._report_current = False
+        header = {k: v for k, v in game_log.items() if k not in ("result", "step_by_step")}
+        self._put("line", {"type": "header", **header})
+
+    # --- producer side (request handlers) ---
+
+    def _put(self, kind: str, payload: Any) -> None:
+        if self._closed:
+            print("[log] writer is closed; dropping record")
+            return
+        with self._idle:
+            self._pending += 1
+        _writer.put(self, kind, payload)
+
+    def _done(self) -> None:
+        with self._idle:
+            self._pending -= 1
+            if not self._pending:
+                self._idle.notify_all()
+
+    def append_step(self, step_log: Dict[str, Any]) -> None:
+        self._put("line", {"type": "step", "step": step_log})
+
+    def update_rules(self, special_rules: list) -> None:
+        self._put("line", {"type": "rules", "special_rules": list(special_rules)})
+
+    def write_report(self, game_log: Dict[str, Any]) -> None:
+        """Queues the full report; a shallow snapshot is taken so later moves don't leak in."""
+        snapshot = dict(game_log, step_by_step=list(game_log["step_by_step"]))
+        if snapshot.get("result") is not None:
+            self._put("line", {"type": "result", "result": snapshot["result"]})
+            self._final_written = True
+        self._put("report", snapshot)
+
+    def flush(self) -> None:
+        """Blocks until every record of this game queued so far is on disk (call it off the event loop)."""
+        with self._idle:
+            self._idle.wait_for(lambda: not self._pending)
+
+    def close(self, game_log: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Queues the report of `game_log` unless a finished one was already queued, then
+        the closing of the journal. Does not wait for the disk.
+        """
+        if self._closed:
+            return
+        if game_log is not None and not self._final_written:
+            self.write_report(game_log)
+        self._put("close", None)
+        self._closed = True
+
+    # --- writer thread ---
+
+    def _handle(self, kind: str, payload: Any) -> None:
+        if kind == "line":
+            if not self._finished:
+                self._write_line(payload)
+        elif kind == "report":
+            self._write_report(payload)
+            self._report_current = True
+            if payload.get("result") is not None:
+                self._finish()
+        elif self._report_current:
+            self._finish()
+        elif self._file is not None:
+            self._sync(force=True)
+            self._file.close()
+            self._file = None
+
+    def _write_line(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._report_current = False
+        # Batches of records of this game reach the OS together.
+        if self._pending <= 1:
+            self._file.flush()
+        self._sync()
+
+    def _sync(self, force: bool = False) -> None:
+        if self.fsync_interval is None and not force:
+            return
+        now = time.monotonic()
+        if force or now - self._last_sync >= self.fsync_interval:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def _write_report(self, game_log: Dict[str, Any]) -> None:
+        if self._file is not None:
+            self._sync(force=True)
+        tmp_path = self.report_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(game_log, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.report_path)
+
+    def _finish(self) -> None:
+        """The report is complete: drop the journal."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._finished = True
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,220 @@
+"""
+On-disk cache of LLM agent answers (SQLite).
+
+Entries are keyed by provider, model, a hash of the prompt, the sampling parameters
+(temperature, top_p, top_k) and the token budget (max_token), and hold the parsed
+answer. Re-running a logged matchup with the same seeds builds the same prompts, so
+its moves come back from the cache without a provider call.
+
+Modes:
+  - "read_through": answer from the cache; on a miss call the provider and store.
+  - "record": always call the provider and store (overwrites), never answer from the cache.
+
+Eviction: entries older than `max_age_secs` are dropped, then the least recently used
+ones beyond `max_entries` or `max_bytes`. It runs when the cache is opened and every
+`evict_every` stores.
+
+The cache is process-wide (`configure_cache`/`get_cache`); worker processes of
+`/api/batch` and `cli/run_selfplay.py` get the config in their task and share the file.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+MODES = ("read_through", "record")
+# Bump when the prompt or the stored answer format changes, to ignore older entries.
+CACHE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_sha TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used);
+"""
+
+
+def prompt_sha(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def cache_key(provider: str, model: str, prompt: str, temperature: Optional[float],
+              top_p: Optional[float], top_k: Optional[float], max_token: Optional[int]) -> str:
+    params = json.dumps([CACHE_VERSION, provider, model, prompt_sha(prompt), temperature, top_p, top_k,
+                         max_token])
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str, mode: str = "read_through", max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, max_age_secs: Optional[float] = None,
+                 evict_every: int = 100):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}.")
+        for name, limit in (("max_entries", max_entries), ("max_bytes", max_bytes), ("max_age_secs", max_age_secs)):
+            if limit is not None and limit <= 0:
+                raise ValueError(f"{name} must be positive.")
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_secs = max_age_secs
+        self.evict_every = evict_every
+        # This process's lookups and stores.
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # A forked worker must not reuse its parent's connection.
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level=None)
+            # WAL lets worker processes read while another one writes.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+            self._evict(conn)
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The stored answer of `key`, or None (also in "record" mode and for expired entries)."""
+        if self.mode != "read_through":
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and self.max_age_secs is not None and row[1] < now - self.max_age_secs:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.evicted += 1
+                    row = None
+                if row is not None:
+                    conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                # The cache never fails a move: an unreadable entry is a miss.
+                print(f"[llm_cache] lookup failed: {e}")
+                self.errors += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, provider: str, model: str, prompt: str, response: Dict[str, Any]) -> None:
+        data = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, provider, model, prompt_sha, response, size, created, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, provider, model, prompt_sha(prompt), data, len(data.encode("utf-8")), now, now))
+                self.stores += 1
+                if self.stores % self.evict_every == 0:
+                    self._evict(conn)
+            except sqlite3.Error as e:
+                print(f"[llm_cache] store failed: {e}")
+                self.errors += 1
+
+    def evict(self) -> int:
+        """Applies the age and size limits now; returns the number of entries dropped."""
+        with self._lock:
+            return self._evict(self._connect())
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        dropped = 0
+        if self.max_age_secs is not None:
+            dropped += conn.execute("DELETE FROM responses WHERE created < ?",
+                                    (time.time() - self.max_age_secs,)).rowcount
+        if self.max_entries is not None:
+            dropped += conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)).rowcount
+        if self.max_bytes is not None:
+            dropped += conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM "
+                "(SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS total FROM responses) "
+                "WHERE total > ?)",
+                (self.max_bytes,)).rowcount
+        self.evicted += dropped
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"path": self.path, "mode": self.mode, "entries": entries, "bytes": size,
+                "hits": self.hits, "misses": self.misses, "stores": self.stores, "evicted": self.evicted,
+                "errors": self.errors}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+_config: Optional[Dict[str, Any]] = None
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def configure_cache(path: Optional[str] = None, **options) -> None:
+    """
+    Sets the process-wide cache used by LLM agents: `path` and the `ResponseCache`
+    options (mode, max_entries, max_bytes, max_age_secs). No `path` disables it.
+    The database is opened on first use.
+    """
+    global _config, _cache
+    if path is not None:
+        # Fail on a bad mode or limit now rather than at the first move.
+        ResponseCache(path, **options)
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _config = dict(path=path, **options) if path is not None else None
+        _cache = None
+
+
+def cache_config() -> Optional[Dict[str, Any]]:
+    """The `configure_cache` arguments in effect, to hand to worker processes."""
+    return dict(_config) if _config is not None else None
+
+
+def get_cache() -> Optional[ResponseCache]:
+    global _cache
+    if _config is None:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None and _config is not None:
+                _cache = ResponseCache(**_config)
+    return _cache
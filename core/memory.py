@@ -41,6 +41,15 @@ class ShortTermMemory:
         }
         self.memory.append(memory_entry)
 
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Bản sao các ký ức hiện tại, dùng để hoàn tác một lượt bị huỷ."""
+        return list(self.memory)
+
+    def restore(self, snapshot: List[Dict[str, Any]]):
+        """Khôi phục bộ nhớ về trạng thái của `snapshot`."""
+        self.memory.clear()
+        self.memory.extend(snapshot)
+
     def get_context(self) -> List[str]:
         """
         Lấy và định dạng các ký ức gần đây để đưa vào prompt.
@@ -0,0 +1,195 @@
+"""
+In-process metrics registry, exposed by the server at `/metrics` in the Prometheus
+text format.
+
+Counters and histograms are plain thread-safe objects (agents run in worker
+threads). Values are per process: games played by `/api/batch` or
+`cli/run_selfplay.py` worker processes are not counted here.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Seconds, from sub-microsecond engine calls up to slow LLM round trips.
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str, quotes: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}.")
+        try:
+            return tuple(str(labels[n]) for n in self.labelnames)
+        except KeyError as e:
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}.") from e
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation, quotes=False)}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += [line for key, value in items for line in self._sample_lines(key, value)]
+        return lines
+
+    def _sample_lines(self, key: Tuple[str, ...], value) -> List[str]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only go up.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _sample_lines(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; `time()` observes the duration of a `with` block."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (last one is +Inf) and the running sum.
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start_t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_t, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def _sample_lines(self, key, value) -> List[str]:
+        counts, total = value
+        names = self.labelnames + ("le",)
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+# --- Metrics of the game server and agents ---
+
+AGENT_PHASE_SECONDS = REGISTRY.histogram(
+    "oaq_agent_phase_seconds",
+    "LLM PlayerAgent.get_action time by phase: prompt build, response cache, pooled client checkout, provider call, response parse.",
+    ("provider", "phase"))
+ENV_COMMIT_SECONDS = REGISTRY.histogram(
+    "oaq_env_commit_seconds", "Enviroment.commit_action time.", ("mode",))
+PERSIST_LOG_SECONDS = REGISTRY.histogram(
+    "oaq_persist_game_log_seconds", "GameSession.persist_game_log time.")
+GAME_LOG_OVERFLOW = REGISTRY.counter(
+    "oaq_game_log_overflow_records_total", "Game log records queued past the writer thread's bound instead of blocking.")
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "oaq_http_request_seconds", "API request time until the response starts, by route.",
+    ("method", "route", "status"))
+
+GAMES_STARTED = REGISTRY.counter("oaq_games_started_total", "Games started.")
+GAMES_FINISHED = REGISTRY.counter("oaq_games_finished_total", "Games finished, by winner.", ("winner",))
+MOVES = REGISTRY.counter("oaq_moves_total", "Moves committed, by player type.", ("player_type",))
+CAPTURES = REGISTRY.counter("oaq_captures_total", "Pieces captured, by piece.", ("piece",))
+PROVIDER_ERRORS = REGISTRY.counter(
+    "oaq_provider_errors_total", "Failed LLM provider calls, by provider and exception type.", ("provider", "error"))
+LLM_CACHE_REQUESTS = REGISTRY.counter(
+    "oaq_llm_cache_requests_total", "LLM agent moves by response cache outcome: hit, miss or record.",
+    ("provider", "outcome"))
+PROVIDER_KEY_COOLDOWNS = REGISTRY.counter(
+    "oaq_provider_key_cooldowns_total", "API keys put on cooldown after a quota error, by provider.", ("provider",))
+
+
+def record_move(player_type: str, step_log: Dict[str, object]) -> None:
+    """Counts one committed move and its captures from its `build_step_log` entry."""
+    MOVES.inc(player_type=player_type)
+    if step_log.get("captured_peasant"):
+        CAPTURES.inc(step_log["captured_peasant"], piece="peasant")
+    if step_log.get("captured_mandarin"):
+        CAPTURES.inc(step_log["captured_mandarin"], piece="mandarin")
@@ -1,21 +1,29 @@
 # core/player.py
+import asyncio
 import os
 import random
 import json
-import together
+import math
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
 
-from google import genai
 from typing import Dict, List, Any
 from enum import Enum
 from typing import List, Dict, Any, Optional, Type, TypeVar
 from pydantic import BaseModel, Field
 from .memory import ShortTermMemory 
-from .rule import get_rules_as_str
+from .rule import get_rules_as_str, MAX_ROUND_IN_GAME, EARLY_WIN_SCORE
 from .persona_instruct import BasePersona
-from dotenv import dotenv_values
-
-
-api_config = dotenv_values(".env")
+from .board import ORDER, PIT_INDEX, SIDE_PITS, CompactState, sow, rule_flags
+from .transposition import TranspositionTable, board_key
+from .tablebase import Tablebase
+from .metrics import AGENT_PHASE_SECONDS, LLM_CACHE_REQUESTS, PROVIDER_ERRORS
+from .tracing import span
+from .profiling import profiled
+from .providers import get_provider
+from .llm_cache import cache_key, get_cache
 
 
 class DirectionOutput(str, Enum):
@@ -44,6 +52,10 @@ class PlayerAgentOutput(BaseModel):
     action: ActionOutput = Field(description="The action selected by the agent")
 
 class PlayerAgent:
+    # True if `aget_action` waits on network I/O natively; the server runs other
+    # (CPU-bound) agents' `get_action` in a worker thread instead.
+    async_native = True
+
     def __init__(self, 
                  team: str, 
                  persona: BasePersona, 
@@ -52,7 +64,8 @@ class PlayerAgent:
                  temperature: float = 0.7, 
                  top_p: float = 1.0, 
                  top_k: int = 40, 
-                 mem_size: Optional[int] = None):
+                 mem_size: Optional[int] = None,
+                 max_tokens: Optional[int] = None):
         if team not in ["A", "B"]:
             raise ValueError("Team must be 'A' or 'B'")
         self.team = team
@@ -61,6 +74,7 @@ class PlayerAgent:
         self.temperature = temperature
         self.top_p = top_p
         self.top_k = top_k
+        self.max_tokens = max_tokens
         checked_mem_size = mem_size if mem_size is not None else 5
         self.memory = ShortTermMemory(int(checked_mem_size))
         self.persona: BasePersona = persona
@@ -122,48 +136,12 @@ class PlayerAgent:
         ---"""
         return prompt 
     
-    def get_action(self, game_state: Dict[str, Any], available_pos: List[str], extended_rule=None) -> Dict[str, Any]:
-        
-        if self.provider == "togetherai":
-            client = together.Together(api_key=api_config["TOGETHER_API_KEY"])
-            response = client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Only answer in JSON.",
-                    },
-                    {
-                        "role": "user",
-                        "content": self.get_prompt(game_state, available_pos, extended_rule),
-                    },
-                ],
-                model=self.model,
-                response_format={
-                    "type": "json_schema",
-                    "schema": PlayerAgentOutput.model_json_schema(),
-                },
-            )
-            response = json.loads(response.choices[0].message.content)
-        
-        elif self.provider == "google":
-            client = genai.Client(api_key=api_config["GEMINI_API_KEY"])
-            response = client.models.generate_content(
-                model=self.model,
-                contents=self.get_prompt(game_state, available_pos, extended_rule),
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": PlayerAgentOutput,
-                    "temperature": self.temperature,
-                    "top_p": self.top_p,
-                    "top_k": self.top_k,
-                },
-            ).parsed.model_dump()
-            print("Structured Output:", response)
-
-        else:
-            NotImplementedError()
-
+    def _finish_action(self, game_state: Dict[str, Any], response: Dict[str, Any],
+                       cache_outcome: Optional[str] = None) -> Dict[str, Any]:
         # print("MODEL IN USE: ", self.model)
+        if cache_outcome is not None:
+            LLM_CACHE_REQUESTS.inc(provider=self.provider, outcome=cache_outcome)
+            response['_meta_llm_cache'] = cache_outcome
         self.memory.add_memory(
             round_num=game_state["round"],
             thought=response["reason"],
@@ -175,7 +153,99 @@ class PlayerAgent:
         response['thoughts'] = response['reason']
         return response
 
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        State a move updates besides the board, so a cancelled move can be undone with
+        `restore`. Search tables are not included: their entries stay valid.
+        """
+        return {"memory": self.memory.snapshot()}
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        self.memory.restore(snapshot["memory"])
+
+    @contextmanager
+    def _phase(self, phase: str, profile: bool = True):
+        """
+        Times one phase of `get_action` into the metrics and the turn's trace spans, and
+        profiles it when the turn is profiled (`profile=False` for phases that await).
+        """
+        with span(phase, AGENT_PHASE_SECONDS, provider=self.provider, phase=phase):
+            if not profile:
+                yield
+                return
+            with profiled():
+                yield
+
+    @contextmanager
+    def _provider_call(self):
+        """Times the provider round trip and counts its failures."""
+        try:
+            with self._phase("provider_call", profile=False):
+                yield
+        except Exception as e:
+            PROVIDER_ERRORS.inc(provider=self.provider, error=type(e).__name__)
+            raise
+
+    def _cache_lookup(self, prompt: str):
+        """(cache, key, stored answer or None) for `prompt`; all None without a configured cache."""
+        cache = get_cache()
+        if cache is None:
+            return None, None, None
+        key = cache_key(self.provider, self.model, prompt, self.temperature, self.top_p, self.top_k,
+                        self.max_tokens)
+        with self._phase("cache"):
+            return cache, key, cache.get(key)
+
+    def _cache_store(self, cache, key: Optional[str], prompt: str, response: Dict[str, Any]) -> Optional[str]:
+        """Stores a fresh answer and returns the move's cache outcome ("miss" or "record")."""
+        if cache is None:
+            return None
+        with self._phase("cache"):
+            cache.put(key, self.provider, self.model, prompt, response)
+        return "miss" if cache.mode == "read_through" else "record"
+
+    def get_action(self, game_state: Dict[str, Any], available_pos: List[str], extended_rule=None) -> Dict[str, Any]:
+        provider = get_provider(self.provider)
+        with self._phase("prompt"):
+            prompt = self.get_prompt(game_state, available_pos, extended_rule)
+            request = provider.request(self, prompt, PlayerAgentOutput)
+        cache, key, cached = self._cache_lookup(prompt)
+        if cached is not None:
+            return self._finish_action(game_state, cached, "hit")
+        with self._phase("client"):
+            lease = provider.pool().acquire()
+        with lease as client, self._provider_call():
+            response = provider.call(client, request)
+        with self._phase("parse"):
+            response = provider.parse(response)
+        return self._finish_action(game_state, response, self._cache_store(cache, key, prompt, response))
+
+    async def aget_action(self, game_state: Dict[str, Any], available_pos: List[str], extended_rule=None) -> Dict[str, Any]:
+        """
+        `get_action` through the providers' native async clients, so the event loop keeps
+        serving other requests. Cancelling it cancels the HTTP call; memory is only
+        updated once a response arrived. The response cache (SQLite) is read and
+        written in a worker thread.
+        """
+        provider = get_provider(self.provider)
+        with self._phase("prompt"):
+            prompt = self.get_prompt(game_state, available_pos, extended_rule)
+            request = provider.request(self, prompt, PlayerAgentOutput)
+        cache, key, cached = await asyncio.to_thread(self._cache_lookup, prompt)
+        if cached is not None:
+            return self._finish_action(game_state, cached, "hit")
+        with self._phase("client"):
+            lease = provider.pool().acquire(asynchronous=True)
+        with lease as client, self._provider_call():
+            response = await provider.acall(client, request)
+        with self._phase("parse"):
+            response = provider.parse(response)
+        outcome = await asyncio.to_thread(self._cache_store, cache, key, prompt, response) if cache is not None else None
+        return self._finish_action(game_state, response, outcome)
+
 class MockPlayerAgent(PlayerAgent):
+    async_native = False
+
     def __init__(self, team: str, persona: BasePersona, **kwargs):
         super().__init__(team, persona, **kwargs)
     
@@ -200,3 +270,419 @@ class MockPlayerAgent(PlayerAgent):
             'action': action,
             'memory_context': self.memory.get_context()
         }
+
+
+def advance_turn(state: CompactState, mover: str) -> tuple[str, bool]:
+    """
+    Moves `state` in place from `mover`'s committed move to the next turn, like
+    `/api/move`: end checks, round increment, then peasant restore for the next team.
+    Returns (team to move, game over).
+    """
+    score = state.score
+    if state.is_end() or score[0] >= EARLY_WIN_SCORE or score[1] >= EARLY_WIN_SCORE \
+            or state.round >= MAX_ROUND_IN_GAME:
+        return mover, True
+    nxt = "B" if mover == "A" else "A"
+    if nxt == "A":
+        state.round += 1
+    if not state.available(nxt):
+        t = 0 if nxt == "A" else 1
+        if score[t] < 5:
+            return nxt, True
+        score[t] -= 5
+        for i in SIDE_PITS[nxt]:
+            state.owners[i] |= t << state.counts[i]
+            state.counts[i] += 1
+    return nxt, False
+
+
+class _SearchAborted(Exception):
+    pass
+
+
+class AlphaBetaPlayerAgent(PlayerAgent):
+    """
+    Zero-cost search opponent: negamax alpha-beta over `core.board.sow` outcomes.
+
+    Iterative deepening runs until `max_depth` plies or until the `time_limit`
+    (seconds) or `node_limit` budget is spent; the move of the last completed
+    iteration is played. Turns are simulated like `/api/move` (round increment on A's
+    turn, `restore_peasants`, end conditions), and positions are scored by score
+    difference, with a large bonus once the game is decided. With a `tablebase` file
+    (`core.tablebase`) built for the game's rules, leaves inside the table also count
+    the points still to be won from there.
+    """
+    WIN_VALUE = 1000
+    EXACT, LOWER, UPPER = 0, 1, 2
+    async_native = False
+
+    def __init__(self, team: str, persona: BasePersona, max_depth: int = 8,
+                 time_limit: Optional[float] = 0.5, node_limit: Optional[int] = None,
+                 tt_size: int = 1 << 18, tablebase: Optional[str] = None, **kwargs):
+        super().__init__(team, persona, **kwargs)
+        self.max_depth = max(1, int(max_depth))
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.table = TranspositionTable(tt_size)
+        self.tablebase = Tablebase(tablebase) if tablebase else None
+        self._tb = None
+
+    def close(self):
+        if self.tablebase is not None:
+            self.tablebase.close()
+            self.tablebase = None
+
+    def _evaluate(self, state: CompactState, team: str, over: bool) -> float:
+        t = 0 if team == "A" else 1
+        diff = state.score[t] - state.score[1 - t]
+        if over:
+            return diff + (self.WIN_VALUE if diff > 0 else -self.WIN_VALUE if diff < 0 else 0)
+        return diff
+
+    def _children(self, state: CompactState, team: str, first: Optional[tuple[int, int]]):
+        children = []
+        for idx in state.available(team):
+            if not state.counts[idx]:
+                continue
+            for direction in (1, -1):
+                child = state.copy()
+                sow(child, idx, direction, self._e1, self._e2)
+                children.append(((idx, direction), child))
+        t = 0 if team == "A" else 1
+        # Move ordering: table move first, then the biggest immediate score swing.
+        children.sort(key=lambda mc: (mc[0] != first, -(mc[1].score[t] - mc[1].score[1 - t])))
+        return children
+
+    # --- search ---
+
+    def _key(self, state: CompactState, team: str) -> tuple:
+        # The table outlives one search, and a game's rules may change between moves.
+        return (board_key(state), state.score[0], state.score[1], state.round, team, self._e1, self._e2)
+
+    def _negamax(self, state: CompactState, team: str, depth: int, alpha: float, beta: float) -> float:
+        self._nodes += 1
+        if self.node_limit is not None and self._nodes > self.node_limit:
+            raise _SearchAborted()
+        if self._deadline is not None and not self._nodes & 15 and time.perf_counter() > self._deadline:
+            raise _SearchAborted()
+
+        key = self._key(state, team)
+        entry = self.table.get(key)
+        tt_move = None
+        if entry is not None:
+            e_depth, e_value, e_flag, tt_move = entry
+            if e_depth >= depth:
+                if e_flag == self.EXACT:
+                    return e_value
+                if e_flag == self.LOWER and e_value >= beta:
+                    return e_value
+                if e_flag == self.UPPER and e_value <= alpha:
+                    return e_value
+
+        alpha_orig = alpha
+        best_value, best_move = -float("inf"), None
+        for move, child in self._children(state, team, tt_move):
+            nxt, over = advance_turn(child, team)
+            if over or depth <= 1:
+                value = self._evaluate(child, team, over)
+                if not over and self._tb is not None:
+                    future = self._tb.probe(child, nxt)
+                    if future is not None:
+                        value -= future
+            else:
+                value = -self._negamax(child, nxt, depth - 1, -beta, -alpha)
+            if value > best_value:
+                best_value, best_move = value, move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_move is None:
+            return self._evaluate(state, team, True)
+        flag = self.UPPER if best_value <= alpha_orig else self.LOWER if best_value >= beta else self.EXACT
+        self.table.put(key, (depth, best_value, flag, best_move))
+        return best_value
+
+    def search(self, state: CompactState, team: str, extended_rule=None) -> Dict[str, Any]:
+        """Iterative deepening from `state` with `team` to move."""
+        self._e1, self._e2 = rule_flags(extended_rule)
+        self._tb = self.tablebase if self.tablebase is not None and self.tablebase.matches(extended_rule) else None
+        self._nodes = 0
+        start_t = time.perf_counter()
+        self._deadline = start_t + self.time_limit if self.time_limit else None
+
+        best_move, best_value, completed = None, None, 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                value = self._negamax(state, team, depth, -float("inf"), float("inf"))
+            except _SearchAborted:
+                break
+            entry = self.table.get(self._key(state, team))
+            if entry is not None and entry[3] is not None:
+                best_move, best_value, completed = entry[3], value, depth
+        if best_move is None:
+            # Budget ran out before depth 1 finished: fall back to the best immediate swing.
+            move, child = self._children(state, team, None)[0]
+            best_move, best_value = move, self._evaluate(child, team, False)
+
+        return {
+            "move": best_move,
+            "value": best_value,
+            "depth": completed,
+            "nodes": self._nodes,
+            "secs": round(time.perf_counter() - start_t, 6),
+        }
+
+    def get_action(self, game_state: Dict[str, Any], available_pos: List[str], extended_rule=None, *args, **kwargs) -> Dict[str, Any]:
+        if not available_pos:
+            return {'reason': "No available moves.", 'action': {'way': None, 'pos': None}, 'memory_context': self.memory.get_context()}
+
+        result = self.search(CompactState.from_game_state(game_state), self.team, extended_rule)
+        idx, direction = result["move"]
+        action = {'pos': ORDER[idx], 'way': "clockwise" if direction == 1 else "counter_clockwise"}
+        observation = f"Searched {result['nodes']} nodes to depth {result['depth']} in {result['secs']}s."
+        reason = f"Alpha-beta search: {action['pos']} {action['way']} keeps a score difference of {result['value']}."
+
+        self.memory.add_memory(
+            round_num=game_state["round"],
+            thought=reason,
+            action=action
+        )
+
+        return {
+            'observation': observation,
+            'reason': reason,
+            'action': action,
+            'memory_context': self.memory.get_context()
+        }
+
+
+class _MCTSNode:
+    __slots__ = ("state", "team", "over", "move", "parent", "children", "untried", "visits", "value")
+
+    def __init__(self, state: CompactState, team: str, over: bool, move=None, parent=None):
+        self.state = state
+        self.team = team            # team to move from this node
+        self.over = over
+        self.move = move            # (idx, direction) that led here
+        self.parent = parent
+        self.children = []
+        self.untried = [] if over else [(i, d) for i in state.available(team) for d in (1, -1)]
+        self.visits = 0
+        self.value = 0.0            # summed reward of the parent's team (the mover)
+
+
+def _rollout(state: CompactState, team: str, e1: bool, e2: bool, policy: str, rng: random.Random) -> str:
+    """Plays `state` out to the end in place; returns "A", "B" or "Draw"."""
+    for _ in range(200):
+        moves = [i for i in state.available(team) if state.counts[i]]
+        if not moves:
+            break
+        if policy == "heuristic" and rng.random() < 0.8:
+            # Greedy on the immediate score swing; random otherwise so rollouts stay diverse.
+            t = 0 if team == "A" else 1
+            best, best_gain = None, -1 << 30
+            for idx in moves:
+                for direction in (1, -1):
+                    child = state.copy()
+                    sow(child, idx, direction, e1, e2)
+                    gain = child.score[t] - child.score[1 - t]
+                    if gain > best_gain:
+                        best, best_gain = child, gain
+            state = best
+        else:
+            sow(state, rng.choice(moves), rng.choice((1, -1)), e1, e2)
+        team, over = advance_turn(state, team)
+        if over:
+            break
+    if state.score[0] > state.score[1]: return "A"
+    if state.score[1] > state.score[0]: return "B"
+    return "Draw"
+
+
+def mcts_search(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One UCT tree grown from `task["state"]` until `task["deadline"]` (`time.time()`).
+
+    Module-level so it can run in a process pool worker. Returns the root children
+    statistics as {(idx, direction): [visits, value]} plus the rollout count.
+    """
+    rng = random.Random(task["seed"])
+    e1, e2 = task["flags"]
+    c = task["exploration"]
+    policy = task["rollout"]
+    deadline = task["deadline"]
+    root = _MCTSNode(task["state"], task["team"], False)
+
+    rollouts = 0
+    # The clock is read every 8 iterations; at least one rollout always runs.
+    while rollouts == 0 or rollouts & 7 or time.time() < deadline:
+        node = root
+        # Selection
+        while not node.untried and node.children:
+            log_n = math.log(node.visits)
+            node = max(node.children, key=lambda ch: ch.value / ch.visits + c * math.sqrt(log_n / ch.visits))
+        # Expansion
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            child_state = node.state.copy()
+            sow(child_state, move[0], move[1], e1, e2)
+            nxt, over = advance_turn(child_state, node.team)
+            child = _MCTSNode(child_state, nxt, over, move, node)
+            node.children.append(child)
+            node = child
+        # Simulation
+        if node.over:
+            s = node.state.score
+            winner = "A" if s[0] > s[1] else "B" if s[1] > s[0] else "Draw"
+        else:
+            winner = _rollout(node.state.copy(), node.team, e1, e2, policy, rng)
+        rollouts += 1
+        # Backpropagation
+        while node.parent is not None:
+            mover = node.parent.team
+            node.visits += 1
+            node.value += 1.0 if winner == mover else 0.5 if winner == "Draw" else 0.0
+            node = node.parent
+        root.visits += 1
+
+    return {
+        "stats": {ch.move: [ch.visits, ch.value] for ch in root.children},
+        "rollouts": rollouts,
+    }
+
+
+# Rollout processes shared by every MCTSPlayerAgent of the process, one per core.
+_mcts_pool = None
+_mcts_pool_lock = threading.Lock()
+
+
+def _get_mcts_pool():
+    global _mcts_pool
+    with _mcts_pool_lock:
+        if _mcts_pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            # Spawned, not forked: agents call this from worker threads of a threaded server.
+            _mcts_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return _mcts_pool
+
+
+def shutdown_mcts_pool() -> None:
+    """Stops the shared rollout processes without waiting for running searches."""
+    global _mcts_pool
+    with _mcts_pool_lock:
+        pool, _mcts_pool = _mcts_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class MCTSPlayerAgent(PlayerAgent):
+    """
+    Monte Carlo Tree Search (UCT) opponent with root parallelization: `workers` trees
+    are grown on the process-wide rollout pool until the per-move `time_limit`
+    (seconds), and root visit counts and values are summed. The most visited move is
+    played.
+
+    `workers` defaults to one per core, or 1 inside a pool worker process (batch and
+    self-play games already use every core), where it runs in-process.
+
+    Without a `seed`, the agent draws one from the global `random`, so a batch game
+    seeded with `random.seed` starts its trees from the same seeds. Searches stop on
+    `time_limit`, though, so the number of rollouts (and possibly the move) still
+    depends on machine speed: MCTS games are not reproducible run to run.
+
+    `rollout` is "random" or "heuristic" (mostly greedy on the immediate score swing).
+    Rollout throughput is reported per core in the move's `observation`.
+    """
+    async_native = False
+
+    def __init__(self, team: str, persona: BasePersona, time_limit: float = 1.0,
+                 workers: Optional[int] = None, rollout: str = "random",
+                 exploration: float = 1.4, seed: Optional[int] = None, **kwargs):
+        super().__init__(team, persona, **kwargs)
+        if rollout not in ("random", "heuristic"):
+            raise ValueError("rollout must be 'random' or 'heuristic'")
+        self.time_limit = time_limit
+        if workers is None:
+            workers = 1 if multiprocessing.parent_process() is not None else os.cpu_count()
+        self.workers = max(1, workers or 1)
+        self.rollout = rollout
+        self.exploration = exploration
+        self.rng = random.Random(seed if seed is not None else random.getrandbits(64))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(super().snapshot(), rng=self.rng.getstate())
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        super().restore(snapshot)
+        self.rng.setstate(snapshot["rng"])
+
+    def search(self, state: CompactState, team: str, extended_rule=None) -> Dict[str, Any]:
+        start_t = time.perf_counter()
+        deadline = time.time() + self.time_limit
+        tasks = [{
+            "state": state,
+            "team": team,
+            "flags": rule_flags(extended_rule),
+            "exploration": self.exploration,
+            "rollout": self.rollout,
+            "deadline": deadline,
+            "seed": self.rng.getrandbits(32),
+        } for _ in range(self.workers)]
+
+        if self.workers == 1:
+            results = [mcts_search(tasks[0])]
+        else:
+            results = list(_get_mcts_pool().map(mcts_search, tasks))
+
+        stats: Dict[tuple, List[float]] = {}
+        rollouts = 0
+        for res in results:
+            rollouts += res["rollouts"]
+            for move, (visits, value) in res["stats"].items():
+                entry = stats.setdefault(move, [0, 0.0])
+                entry[0] += visits
+                entry[1] += value
+        secs = time.perf_counter() - start_t
+        # Workers beyond the machine's cores only time-share, so they don't count as cores.
+        cores = min(self.workers, os.cpu_count() or 1)
+
+        ranked = sorted(stats.items(), key=lambda kv: kv[1][0], reverse=True)
+        return {
+            "move": ranked[0][0],
+            "ranked": [(move, visits, value / visits) for move, (visits, value) in ranked],
+            "rollouts": rollouts,
+            "secs": round(secs, 6),
+            "rollouts_per_sec_per_core": round(rollouts / max(secs, 1e-9) / cores, 1),
+        }
+
+    def get_action(self, game_state: Dict[str, Any], available_pos: List[str], extended_rule=None, *args, **kwargs) -> Dict[str, Any]:
+        if not available_pos:
+            return {'reason': "No available moves.", 'action': {'way': None, 'pos': None}, 'memory_context': self.memory.get_context()}
+
+        result = self.search(CompactState.from_game_state(game_state), self.team, extended_rule)
+
+        def label(move):
+            return f"{ORDER[move[0]]} {'clockwise' if move[1] == 1 else 'counter_clockwise'}"
+
+        idx, direction = result["move"]
+        action = {'pos': ORDER[idx], 'way': "clockwise" if direction == 1 else "counter_clockwise"}
+        observation = (f"{result['rollouts']} rollouts in {result['secs']}s on {self.workers} worker(s) "
+                       f"({result['rollouts_per_sec_per_core']} rollouts/s/core).")
+        reason = "MCTS visits/value: " + "; ".join(
+            f"{label(move)}: {visits} visits, value {value:.3f}" for move, visits, value in result["ranked"]
+        )
+
+        self.memory.add_memory(
+            round_num=game_state["round"],
+            thought=reason,
+            action=action
+        )
+
+        return {
+            'observation': observation,
+            'reason': reason,
+            'action': action,
+            'memory_context': self.memory.get_context()
+        }
@@ -0,0 +1,231 @@
+"""
+Opt-in profiling of game turns (`/api/profile`).
+
+A `TurnProfiler` covers the next `moves` agent moves of one game, or the rest of the
+game when `moves` is None, following each turn into the agent's worker thread.
+
+  - "cprofile": deterministic; the artifact is a pstats file (`python -m pstats`, snakeviz).
+  - "sample": the turn's threads' stacks every `interval` seconds; the artifact is
+    collapsed stacks ("outer;inner count" lines) for flamegraph.pl or speedscope.
+
+Only synchronous work of the turn is profiled: the agent's worker thread, and on the
+event loop the turn's own blocks (`profiled()`: restore, commit, log, and an LLM
+agent's prompt, cache and parse phases). Awaits, such as the provider round trip,
+are not, since the loop serves other games meanwhile.
+
+cProfile is process-wide on Python 3.12+ (a second one raises ValueError), so only
+one "cprofile" profiler may be active at a time; creating another raises
+RuntimeError until it finishes or is stopped.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+MODES = ("cprofile", "sample")
+
+_current: ContextVar[Optional["TurnProfiler"]] = ContextVar("oaq_turn_profiler", default=None)
+
+# The active "cprofile" profiler, and whether one of its blocks has a cProfile enabled.
+_cprofile_owner: Optional["TurnProfiler"] = None
+_cprofile_running = False
+_cprofile_lock = threading.Lock()
+
+
+@contextmanager
+def profiling_turn(profiler: Optional["TurnProfiler"]) -> Iterator[None]:
+    """Makes `profiler` the one `profiled()` blocks of this task (and its threads) report to."""
+    token = _current.set(profiler)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def profiled() -> Iterator[None]:
+    """Profiles a synchronous block with the current turn's profiler, if any. Never await inside."""
+    profiler = _current.get()
+    if profiler is None or not profiler.active:
+        yield
+        return
+    with profiler.thread():
+        yield
+
+
+def _claim_cprofile(profiler: "TurnProfiler") -> None:
+    global _cprofile_owner
+    with _cprofile_lock:
+        if _cprofile_owner is not None and _cprofile_owner.active:
+            raise RuntimeError("Another game is being profiled with cProfile; stop it or use mode \"sample\".")
+        _cprofile_owner = profiler
+
+
+class TurnProfiler:
+    def __init__(self, mode: str = "sample", moves: Optional[int] = 1, interval: float = 0.005):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}.")
+        if moves is not None and moves < 1:
+            raise ValueError("moves must be a positive integer, or None for the rest of the game.")
+        if interval <= 0:
+            raise ValueError("interval must be positive.")
+        self.mode = mode
+        self.moves = moves
+        self.interval = interval
+        self.profiled_moves = 0
+        self.finished = False
+        self.samples = 0
+        # Blocks not profiled because another block already had cProfile enabled.
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._stats: Optional[pstats.Stats] = None
+        self._stacks: Counter = Counter()
+        self._threads: Dict[int, int] = {}
+        self._sampler: Optional[threading.Thread] = None
+        # Threads inside a `thread()` block of this profiler (blocks may nest).
+        self._inside = set()
+        if mode == "cprofile":
+            _claim_cprofile(self)
+
+    @property
+    def active(self) -> bool:
+        return not self.finished
+
+    # --- Collection ---
+
+    @contextmanager
+    def thread(self) -> Iterator[None]:
+        """Profiles the calling thread for the duration of the block."""
+        tid = threading.get_ident()
+        if tid in self._inside:
+            yield
+            return
+        self._inside.add(tid)
+        try:
+            if self.mode == "cprofile":
+                yield from self._cprofile_block()
+            else:
+                yield from self._sampled_block()
+        finally:
+            self._inside.discard(tid)
+
+    def call(self, fn, *args, **kwargs):
+        with self.thread():
+            return fn(*args, **kwargs)
+
+    def _cprofile_block(self):
+        global _cprofile_running
+        with _cprofile_lock:
+            busy = _cprofile_running
+            _cprofile_running = True
+        if busy:
+            self.skipped += 1
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            with _cprofile_lock:
+                _cprofile_running = False
+            profile.create_stats()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def _sampled_block(self):
+        tid = threading.get_ident()
+        with self._lock:
+            self._threads[tid] = self._threads.get(tid, 0) + 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="turn-profiler", daemon=True)
+                self._sampler.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads[tid] -= 1
+                if not self._threads[tid]:
+                    del self._threads[tid]
+
+    def _sample_loop(self) -> None:
+        while True:
+            with self._lock:
+                tids = list(self._threads)
+                if not tids:
+                    self._sampler = None
+                    return
+            frames = sys._current_frames()
+            stacks = []
+            for tid in tids:
+                frame = frames.get(tid)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def move_done(self, game_over: bool) -> None:
+        self.profiled_moves += 1
+        if game_over or (self.moves is not None and self.profiled_moves >= self.moves):
+            self.stop()
+
+    def stop(self) -> None:
+        global _cprofile_owner
+        self.finished = True
+        with _cprofile_lock:
+            if _cprofile_owner is self:
+                _cprofile_owner = None
+
+    # --- Artifacts ---
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "moves": self.moves,
+            "profiled_moves": self.profiled_moves,
+            "finished": self.finished,
+            "samples": self.samples,
+            "skipped": self.skipped,
+            "has_data": bool(self._stats is not None or self._stacks),
+        }
+
+    def pstats_bytes(self) -> bytes:
+        """The profile in the `pstats.Stats.dump_stats` file format."""
+        if self.mode != "cprofile" or self._stats is None:
+            raise ValueError("No cProfile data.")
+        with self._lock:
+            return marshal.dumps(self._stats.stats)
+
+    def pstats_text(self, sort: str = "cumulative", limit: int = 60) -> str:
+        if self.mode != "cprofile" or self._stats is None:
+            raise ValueError("No cProfile data.")
+        out = io.StringIO()
+        with self._lock:
+            self._stats.stream = out
+            self._stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def collapsed(self) -> str:
+        if self.mode != "sample" or not self._stacks:
+            raise ValueError("No stack samples.")
+        with self._lock:
+            return "".join(f"{stack} {n}\n" for stack, n in sorted(self._stacks.items()))
@@ -0,0 +1,304 @@
+"""
+LLM provider registry.
+
+`PlayerAgent` looks its provider up by the `endpoint_provider` name used in
+`core/endpoints.py`. Provider SDKs are imported on first use and API keys are read
+from `.env` on first use, so importing the game, the server or a CLI runner does not
+pay for `together`/`google.genai` unless an LLM agent actually plays.
+
+Each provider keeps a process-wide `ClientPool`: one SDK client per API key, reused
+across moves so connections stay alive. A `.env` entry may hold several keys separated
+by commas (`GEMINI_API_KEY=key1,key2`); moves are spread over them and a key that hits
+a quota error cools down for `KEY_COOLDOWN_SECS` before it is used again.
+
+To add a provider, subclass `Provider` and pass an instance to `register_provider`.
+"""
+import asyncio
+import json
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+from .metrics import PROVIDER_KEY_COOLDOWNS
+
+ROTATIONS = ("least_loaded", "round_robin")
+# Defaults of the pools created by `Provider.pool()`.
+KEY_ROTATION = "least_loaded"
+KEY_COOLDOWN_SECS = 60.0
+
+_env: Optional[Dict[str, Optional[str]]] = None
+
+
+def api_key(name: str) -> str:
+    """`name` from `.env`, which is read on the first call."""
+    global _env
+    if _env is None:
+        from dotenv import dotenv_values
+        _env = dotenv_values(".env")
+    return _env[name]
+
+
+def api_keys(name: str) -> List[str]:
+    """The comma-separated keys of `.env` entry `name`."""
+    keys = [key.strip() for key in (api_key(name) or "").split(",") if key.strip()]
+    if not keys:
+        raise ValueError(f"No API key in .env entry {name}.")
+    return keys
+
+
+class _KeySlot:
+    """One API key of a pool, its clients and its load."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.client = None
+        # Async clients hold connections bound to the event loop that opened them.
+        self.async_clients = weakref.WeakKeyDictionary()
+        self.in_flight = 0
+        self.uses = 0
+        self.quota_errors = 0
+        self.cooldown_until = 0.0
+
+
+class Lease:
+    """A pooled client checked out for one provider call; `with` returns it to the pool."""
+
+    def __init__(self, pool: "ClientPool", slot: _KeySlot, client: Any):
+        self.pool = pool
+        self.slot = slot
+        self.client = client
+
+    def __enter__(self) -> Any:
+        return self.client
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.pool.release(self.slot, exc)
+
+
+class ClientPool:
+    """
+    Clients of one provider, one per API key, shared by every agent of the process.
+
+    `rotation` picks the key of each call: "least_loaded" (fewest calls in flight, then
+    the least recently used) or "round_robin". Keys cooling down after a quota error
+    are skipped; if all of them are, the one that recovers first is used.
+    """
+
+    def __init__(self, provider: "Provider", keys: List[str], rotation: str = KEY_ROTATION,
+                 cooldown: float = KEY_COOLDOWN_SECS):
+        if rotation not in ROTATIONS:
+            raise ValueError(f"rotation must be one of {ROTATIONS}.")
+        if not keys:
+            raise ValueError("A client pool needs at least one API key.")
+        self.provider = provider
+        self.rotation = rotation
+        self.cooldown = cooldown
+        self._slots = [_KeySlot(key) for key in keys]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _pick(self) -> _KeySlot:
+        now = time.monotonic()
+        ready = [slot for slot in self._slots if slot.cooldown_until <= now]
+        if not ready:
+            return min(self._slots, key=lambda slot: slot.cooldown_until)
+        if self.rotation == "round_robin":
+            n = len(self._slots)
+            for i in range(n):
+                slot = self._slots[(self._next + i) % n]
+                if slot in ready:
+                    self._next = (self._next + i + 1) % n
+                    return slot
+        # Stable min: ties go to the slot used least, so idle keys still rotate.
+        return min(ready, key=lambda slot: (slot.in_flight, slot.uses))
+
+    def acquire(self, asynchronous: bool = False) -> Lease:
+        """Checks out a client (async flavour inside a running event loop)."""
+        with self._lock:
+            slot = self._pick()
+            slot.in_flight += 1
+            slot.uses += 1
+        try:
+            if asynchronous:
+                loop = asyncio.get_running_loop()
+                client = slot.async_clients.get(loop)
+                if client is None:
+                    client = slot.async_clients[loop] = self.provider.make_async_client(slot.key)
+            else:
+                if slot.client is None:
+                    slot.client = self.provider.make_client(slot.key)
+                client = slot.client
+        except BaseException:
+            self.release(slot, None)
+            raise
+        return Lease(self, slot, client)
+
+    def release(self, slot: _KeySlot, error: Optional[BaseException]) -> None:
+        with self._lock:
+            slot.in_flight -= 1
+            if error is not None and self.provider.is_quota_error(error):
+                slot.quota_errors += 1
+                slot.cooldown_until = time.monotonic() + self.cooldown
+                cooled = True
+            else:
+                cooled = False
+        if cooled:
+            PROVIDER_KEY_COOLDOWNS.inc(provider=self.provider.name)
+            print(f"[providers] {self.provider.name} key ...{slot.key[-4:]} cools down for {self.cooldown:g}s.")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "key": f"...{slot.key[-4:]}",
+                "in_flight": slot.in_flight,
+                "uses": slot.uses,
+                "quota_errors": slot.quota_errors,
+                "cooldown_secs": round(max(0.0, slot.cooldown_until - now), 1),
+            } for slot in self._slots]
+
+
+class Provider:
+    """One LLM API: its clients, the request for a `PlayerAgent` prompt and the answer parsing."""
+    name = ""
+    # `.env` entry holding the API key(s)
+    key_name = ""
+
+    def __init__(self):
+        self._pool: Optional[ClientPool] = None
+        self._pool_lock = threading.Lock()
+
+    def pool(self) -> ClientPool:
+        """The process-wide client pool, created with the `.env` keys on first use."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ClientPool(self, api_keys(self.key_name))
+        return self._pool
+
+    def set_pool(self, pool: Optional[ClientPool]) -> None:
+        """Replaces the pool, e.g. with explicit keys or another rotation; None re-reads `.env`."""
+        with self._pool_lock:
+            self._pool = pool
+
+    def make_client(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def make_async_client(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def is_quota_error(self, error: BaseException) -> bool:
+        """Whether `error` means the key ran out of quota or hit a rate limit (HTTP 429)."""
+        return getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429
+
+    def request(self, agent, prompt: str, schema: Type[BaseModel]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def call(self, client, request: Dict[str, Any]) -> Any:
+        raise NotImplementedError
+
+    async def acall(self, client, request: Dict[str, Any]) -> Any:
+        raise NotImplementedError
+
+    def parse(self, response: Any) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class TogetherProvider(Provider):
+    name = "togetherai"
+    key_name = "TOGETHER_API_KEY"
+
+    def make_client(self, key: str):
+        import together
+        return together.Together(api_key=key)
+
+    def make_async_client(self, key: str):
+        import together
+        return together.AsyncTogether(api_key=key)
+
+    def request(self, agent, prompt: str, schema: Type[BaseModel]) -> Dict[str, Any]:
+        return dict(
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Only answer in JSON.",
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                },
+            ],
+            model=agent.model,
+            response_format={
+                "type": "json_schema",
+                "schema": schema.model_json_schema(),
+            },
+        )
+
+    def call(self, client, request: Dict[str, Any]):
+        return client.chat.completions.create(**request)
+
+    async def acall(self, client, request: Dict[str, Any]):
+        return await client.chat.completions.create(**request)
+
+    def parse(self, response) -> Dict[str, Any]:
+        return json.loads(response.choices[0].message.content)
+
+
+class GoogleProvider(Provider):
+    name = "google"
+    key_name = "GEMINI_API_KEY"
+
+    def make_client(self, key: str):
+        from google import genai
+        return genai.Client(api_key=key)
+
+    def make_async_client(self, key: str):
+        # A client of its own; its `aio` attribute holds the async API.
+        return self.make_client(key)
+
+    def request(self, agent, prompt: str, schema: Type[BaseModel]) -> Dict[str, Any]:
+        return dict(
+            model=agent.model,
+            contents=prompt,
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": schema,
+                "temperature": agent.temperature,
+                "top_p": agent.top_p,
+                "top_k": agent.top_k,
+            },
+        )
+
+    def call(self, client, request: Dict[str, Any]):
+        return client.models.generate_content(**request)
+
+    async def acall(self, client, request: Dict[str, Any]):
+        return await client.aio.models.generate_content(**request)
+
+    def parse(self, response) -> Dict[str, Any]:
+        parsed = response.parsed.model_dump()
+        print("Structured Output:", parsed)
+        return parsed
+
+
+PROVIDERS: Dict[str, Provider] = {}
+
+
+def register_provider(provider: Provider) -> Provider:
+    PROVIDERS[provider.name] = provider
+    return provider
+
+
+def get_provider(name: str) -> Provider:
+    try:
+        return PROVIDERS[name]
+    except KeyError:
+        raise NotImplementedError(f"Unknown provider '{name}'.") from None
+
+
+register_provider(TogetherProvider())
+register_provider(GoogleProvider())
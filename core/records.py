@@ -0,0 +1,320 @@
+"""
+Compact binary game records: a whole corpus of `report.*.json` logs in one file,
+read through `mmap` without any JSON parsing.
+
+A record keeps what the analytics use: setup, rules and result in a fixed-size
+header, then one fixed-size entry per move (action, round, mover, reasoning time,
+scores, capture and drop counts). Board snapshots are not stored, because
+`GameRecord.replay` rebuilds them from the actions. Free text (`reason`,
+`observation`) stays in the JSON reports.
+
+File layout (little endian, no padding):
+  _FILE_HEADER
+  records     _GAME header + n_moves * _MOVE, one after the other
+  strings     u32 count, then (u16 length, utf-8 bytes) per string
+  index       n_games * u64 record offsets
+"""
+import json
+import math
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .board import ORDER, PIT_INDEX
+from .gamelog import expand_report
+
+MAGIC = b"OAQREC01"
+VERSION = 1
+# magic, version, number of games, strings offset, index offset
+_FILE_HEADER = struct.Struct("<8sIIQQ")
+# endpoint id, persona id, mem_size, temp, top_p, top_k, max_token
+_PLAYER_FMT = "IIhdddi"
+# source id, rules mask, winner, winner-first score (2), final round, moves, player A, player B
+_GAME = struct.Struct("<IBbhhhH" + _PLAYER_FMT * 2)
+# pos, way, round, team, reasoning secs, my_score, score A, score B after the move,
+# captured peasants, captured mandarins, scattering steps
+_MOVE = struct.Struct("<BbBBdhhhBBH")
+
+RULE_IDS = ("E1", "E2", "E3", "E4", "E5")
+WINNERS = ("player_a", "player_b", "draw")
+NO_STRING = 0xFFFFFFFF
+NO_POS = 0xFF
+
+
+class Move(NamedTuple):
+    pos: Optional[str]
+    way: Optional[str]
+    round: int
+    team: str
+    reasoning_secs: float
+    my_score: int
+    score_a: int
+    score_b: int
+    captured_peasant: int
+    captured_mandarin: int
+    scattering_step: int
+
+
+def move_dtype():
+    """NumPy structured dtype matching one `_MOVE` entry, for zero-copy views."""
+    import numpy as np
+    return np.dtype([
+        ("pos", "u1"), ("way", "i1"), ("round", "u1"), ("team", "u1"),
+        ("reasoning_secs", "<f8"), ("my_score", "<i2"), ("score_a", "<i2"), ("score_b", "<i2"),
+        ("captured_peasant", "u1"), ("captured_mandarin", "u1"), ("scattering_step", "<u2"),
+    ])
+
+
+# --- Writing ---
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        if value not in self.ids:
+            self.ids[value] = len(self.ids)
+        return self.ids[value]
+
+    def pack(self) -> bytes:
+        parts = [struct.pack("<I", len(self.ids))]
+        for value in self.ids:
+            raw = value.encode("utf-8")
+            parts.append(struct.pack("<H", len(raw)))
+            parts.append(raw)
+        return b"".join(parts)
+
+
+def _opt_float(value: Any) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _opt_int(value: Any) -> int:
+    return -1 if value is None else int(value)
+
+
+def _pack_player(setup: Dict[str, Any], strings: _StringTable) -> tuple:
+    return (
+        strings.add(setup.get("endpoint")),
+        strings.add(setup.get("persona")),
+        _opt_int(setup.get("mem_size")),
+        _opt_float(setup.get("temp")),
+        _opt_float(setup.get("top_p")),
+        _opt_float(setup.get("top_k")),
+        _opt_int(setup.get("max_token")),
+    )
+
+
+def _move_team(step: Dict[str, Any], pos: Optional[str]) -> int:
+    if pos:
+        return 0 if pos.startswith("A") else 1
+    # No action: fall back to whose score `my_score` is.
+    after = (step.get("game_state_after_act") or {}).get("score", {})
+    return 1 if after.get("B") == step.get("my_score") != after.get("A") else 0
+
+
+def pack_game(game_log: Dict[str, Any], source: str, strings: _StringTable) -> bytes:
+    """One binary record for a `report.*.json` document."""
+    game_log = expand_report(game_log)
+    rules = game_log.get("enviroment", {}).get("special_rules") or []
+    rules_mask = sum(1 << i for i, rule in enumerate(RULE_IDS) if rule in rules)
+
+    result = game_log.get("result") or {}
+    winner = WINNERS.index(result["winner"]) if result.get("winner") in WINNERS else -1
+    score = result.get("score") or [0, 0]
+
+    steps = game_log.get("step_by_step", [])
+    parts = [_GAME.pack(
+        strings.add(source), rules_mask, winner, score[0], score[1], result.get("final_round") or 0, len(steps),
+        *_pack_player(game_log["setup"]["player_a"], strings),
+        *_pack_player(game_log["setup"]["player_b"], strings),
+    )]
+    for step in steps:
+        action = step.get("action") or [None, None]
+        pos, way = action[0], action[1]
+        after = (step.get("game_state_after_act") or {}).get("score", {})
+        parts.append(_MOVE.pack(
+            PIT_INDEX.get(pos, NO_POS),
+            1 if way == "clockwise" else -1 if way == "counter_clockwise" else 0,
+            step.get("round") or 0,
+            _move_team(step, pos),
+            step.get("reasoning_times") or 0.0,
+            step.get("my_score") or 0,
+            after.get("A", 0),
+            after.get("B", 0),
+            step.get("captured_peasant", 0),
+            step.get("captured_mandarin", 0),
+            step.get("scattering_step", 0),
+        ))
+    return b"".join(parts)
+
+
+def write_corpus(games: Iterable[Tuple[str, Dict[str, Any]]], path: str) -> int:
+    """Writes (source, game_log) pairs to one corpus file; returns the number of games."""
+    strings = _StringTable()
+    offsets: List[int] = []
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * _FILE_HEADER.size)
+        for source, game_log in games:
+            offsets.append(f.tell())
+            f.write(pack_game(game_log, source, strings))
+        strings_offset = f.tell()
+        f.write(strings.pack())
+        index_offset = f.tell()
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        f.seek(0)
+        f.write(_FILE_HEADER.pack(MAGIC, VERSION, len(offsets), strings_offset, index_offset))
+    os.replace(tmp_path, path)
+    return len(offsets)
+
+
+def convert_reports(paths: Iterable[str], out_path: str, root: Optional[str] = None) -> int:
+    """JSON reports -> corpus file. Sources are stored relative to `root` if given."""
+    def games():
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                game_log = json.load(f)
+            yield (os.path.relpath(path, root) if root else path), game_log
+    return write_corpus(games(), out_path)
+
+
+# --- Reading ---
+
+def _opt(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class GameRecord:
+    """View of one record inside a `GameCorpus`; moves are decoded on demand."""
+    __slots__ = ("corpus", "offset", "source", "rules", "winner", "score", "final_round", "n_moves",
+                 "player_a", "player_b")
+
+    def __init__(self, corpus: "GameCorpus", offset: int):
+        fields = _GAME.unpack_from(corpus._mm, offset)
+        strings = corpus.strings
+        self.corpus = corpus
+        self.offset = offset
+        self.source = strings[fields[0]]
+        self.rules = [rule for i, rule in enumerate(RULE_IDS) if fields[1] >> i & 1]
+        self.winner = WINNERS[fields[2]] if fields[2] >= 0 else None
+        self.score = [fields[3], fields[4]]
+        self.final_round = fields[5]
+        self.n_moves = fields[6]
+        self.player_a = self._player(fields[7:14], strings)
+        self.player_b = self._player(fields[14:21], strings)
+
+    @staticmethod
+    def _player(fields: tuple, strings: List[str]) -> Dict[str, Any]:
+        endpoint, persona, mem_size, temp, top_p, top_k, max_token = fields
+        return {
+            "endpoint": strings[endpoint] if endpoint != NO_STRING else None,
+            "mem_size": mem_size if mem_size >= 0 else None,
+            "persona": strings[persona] if persona != NO_STRING else None,
+            "temp": _opt(temp),
+            "top_p": _opt(top_p),
+            "top_k": _opt(top_k),
+            "max_token": max_token if max_token >= 0 else None,
+        }
+
+    @property
+    def result(self) -> Optional[Dict[str, Any]]:
+        if self.winner is None:
+            return None
+        return {"winner": self.winner, "score": self.score, "final_round": self.final_round}
+
+    def moves(self) -> Iterator[Move]:
+        start = self.offset + _GAME.size
+        for pos, way, round_idx, team, secs, my_score, score_a, score_b, cap_p, cap_m, steps in _MOVE.iter_unpack(
+                self.corpus._mm[start:start + self.n_moves * _MOVE.size]):
+            yield Move(
+                ORDER[pos] if pos != NO_POS else None,
+                "clockwise" if way == 1 else "counter_clockwise" if way == -1 else None,
+                round_idx, "AB"[team], secs, my_score, score_a, score_b, cap_p, cap_m, steps,
+            )
+
+    def moves_array(self):
+        """Zero-copy NumPy view of the move entries (see `move_dtype`)."""
+        import numpy as np
+        return np.frombuffer(self.corpus._mm, dtype=move_dtype(), count=self.n_moves, offset=self.offset + _GAME.size)
+
+    def replay(self, check: bool = True) -> Iterator[Tuple[Move, Dict[str, Any], Dict[str, Any]]]:
+        """
+        Rebuilds the board: yields (move, game_state_before_act, game_state_after_act)
+        by replaying the actions through the engine. With `check`, a ValueError is
+        raised if the replayed score differs from the recorded one.
+        """
+        from .environment import Enviroment
+
+        env = Enviroment(headless=True)
+        for move in self.moves():
+            if env.state.round != move.round:
+                # Through `restore`, so the env's cached game-state view is rebuilt.
+                env.restore(env.snapshot()._replace(round=move.round))
+            env.restore_peasants(move.team)
+            before = env.get_game_state()
+            if move.pos:
+                try:
+                    env.commit_action({"pos": move.pos, "way": move.way}, self.rules)
+                except ValueError:
+                    pass
+            after = env.get_game_state()
+            if check and (after["score"]["A"], after["score"]["B"]) != (move.score_a, move.score_b):
+                raise ValueError(f"Replay of {self.source} diverged at round {move.round}.")
+            yield move, before, after
+
+
+class GameCorpus:
+    """
+    Read-only, memory-mapped corpus written by `write_corpus`. Index it or iterate it
+    for `GameRecord`s. NumPy views from `moves_array` must be dropped before `close`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        magic, version, self.n_games, strings_offset, index_offset = _FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not an O An Quan record corpus (version {VERSION}).")
+        self.strings = self._read_strings(strings_offset)
+        self._offsets = struct.unpack_from(f"<{self.n_games}Q", self._mm, index_offset)
+
+    def _read_strings(self, offset: int) -> List[str]:
+        (count,), pos, strings = struct.unpack_from("<I", self._mm, offset), offset + 4, []
+        for _ in range(count):
+            (length,) = struct.unpack_from("<H", self._mm, pos)
+            strings.append(self._mm[pos + 2:pos + 2 + length].decode("utf-8"))
+            pos += 2 + length
+        return strings
+
+    def __len__(self) -> int:
+        return self.n_games
+
+    def __getitem__(self, i: int) -> GameRecord:
+        return GameRecord(self, self._offsets[i])
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for offset in self._offsets:
+            yield GameRecord(self, offset)
+
+    def __enter__(self) -> "GameCorpus":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
@@ -1,6 +1,11 @@
 from pydantic import BaseModel
 from typing import List, Optional
 
+# --- Game Length Limits ---
+
+MAX_ROUND_IN_GAME = 12
+EARLY_WIN_SCORE = 25
+
 # --- Structure Definitions ---
 
 class RuleItem(BaseModel):
@@ -0,0 +1,530 @@
+"""
+Per-game server state and the registry that lets one FastAPI process host many games.
+
+A `GameSession` owns everything `/api/*` used to keep in module globals: the
+environment, both players, the turn, the structured log and its writer. The
+`SessionRegistry` issues game ids, keeps sessions in LRU order and evicts idle
+ones, so memory stays bounded however many browsers or CLI runs come and go.
+Callers hold `session.lock` while driving a game, so two requests for the same
+game never interleave.
+
+A session can also play itself (`start_autoplay`): a background task plays every
+ply and publishes each result to subscribers (`subscribe`), e.g. an SSE stream.
+"""
+import asyncio
+import contextvars
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .environment import Enviroment
+from .game import (create_player_from_settings, new_game_log, get_end_reason, get_winner, build_step_log,
+                   build_result, count_llm_cache)
+from .gamelog import GameLogWriter, compact_step_log, wait_for_writes
+from .metrics import GAMES_FINISHED, GAMES_STARTED, PERSIST_LOG_SECONDS, record_move
+from .profiling import TurnProfiler, profiled, profiling_turn
+from .tracing import finished_spans, span, turn_trace
+from models.schemas import GameSettings, HumanMove
+
+# Player types whose moves open the thinking dialog in the UI.
+DIALOG_PLAYER_TYPES = ('agent', 'random_agent', 'alphabeta_agent', 'mcts_agent')
+
+# Autoplay events after which a stream ends.
+TERMINAL_EVENTS = ("end", "stopped", "error", "closed")
+
+# Threads for agents without a native async `aget_action` (search and random agents).
+AGENT_EXECUTOR_WORKERS = 8
+_agent_executor = None
+
+
+def _get_agent_executor() -> ThreadPoolExecutor:
+    global _agent_executor
+    if _agent_executor is None:
+        _agent_executor = ThreadPoolExecutor(max_workers=AGENT_EXECUTOR_WORKERS, thread_name_prefix="agent")
+    return _agent_executor
+
+
+async def decide(player, game_state: Dict[str, Any], available_pos: List[str],
+                 extended_rule: Optional[List[str]] = None, profiler: Optional[TurnProfiler] = None) -> Dict[str, Any]:
+    """
+    The player's move without blocking the event loop: LLM agents await their provider,
+    other agents run in a bounded thread pool (with the caller's trace and `profiler`).
+    """
+    if player.async_native:
+        return await player.aget_action(game_state, available_pos, extended_rule=extended_rule)
+    call = partial(player.get_action, game_state, available_pos, extended_rule=extended_rule)
+    if profiler is not None:
+        call = partial(profiler.call, call)
+    future = asyncio.get_running_loop().run_in_executor(_get_agent_executor(), contextvars.copy_context().run, call)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # A thread cannot be interrupted: wait until the agent is done with its own
+        # state (search tables, pools) before the game can be driven again.
+        await asyncio.wait([future])
+        raise
+
+
+def make_new_log_filename(logs_dir: str) -> str:
+    """
+    A fresh `report.<ts>.json` path. Its journal is created right away, so games started
+    within the same second (by any session) never share a file.
+    """
+    ts = datetime.now().strftime("%Y.%m.%d.%H%M%S")
+    n = 0
+    while True:
+        path = os.path.join(logs_dir, f"report.{ts}.json" if n == 0 else f"report.{ts}.{n}.json")
+        n += 1
+        if os.path.exists(path):
+            continue
+        try:
+            with open(path[:-len(".json")] + ".jsonl", "x", encoding="utf-8"):
+                return path
+        except FileExistsError:
+            continue
+
+
+class GameSession:
+    """One game hosted by the server; see `SessionRegistry`."""
+
+    def __init__(self, game_id: str, settings: GameSettings, logs_dir: str = "logs",
+                 fsync_interval: Optional[float] = 1.0):
+        self.game_id = game_id
+        self.logs_dir = logs_dir
+        self.fsync_interval = fsync_interval
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+        self.env = Enviroment()
+        self.settings = settings
+        self.p1 = create_player_from_settings("A", settings.player1)
+        self.p2 = create_player_from_settings("B", settings.player2)
+        self.current_turn = "A"
+        self.game_over = False
+        self.winner = None
+
+        # Structured JSON log
+        self.game_json_log: Dict[str, Any] = {}
+        self.active_special_rules = set()
+        self.current_log_path = None
+        self.log_writer = None
+        # After-state of the last logged step (or the keyframe); step states are stored as deltas from it.
+        self.last_logged_state = None
+
+        # Autoplay: the running task, the events of its run and the subscriber queues.
+        self.autoplay_task: Optional[asyncio.Task] = None
+        self.events: List[Dict[str, Any]] = []
+        self._subscribers: List[asyncio.Queue] = []
+        # Opt-in profiler of the next agent moves (`/api/profile`); kept after it finishes for download.
+        self.profiler: Optional[TurnProfiler] = None
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+    # --- Lifecycle ---
+
+    def _close_players(self) -> None:
+        for old in (self.p1, self.p2):
+            # Search agents may hold a process pool.
+            if hasattr(old, "close"):
+                old.close()
+
+    def apply_settings(self, settings: GameSettings) -> None:
+        self.stop_autoplay()
+        self._close_players()
+        self.settings = settings
+        self.p1 = create_player_from_settings("A", settings.player1)
+        self.p2 = create_player_from_settings("B", settings.player2)
+        self.reset()
+
+    def reset(self) -> None:
+        self.stop_autoplay()
+        self.env.reset()
+        self.current_turn = "A"
+        self.game_over = False
+        self.winner = None
+        self.init_game_log()
+
+    def close(self) -> None:
+        """Writes the report of an unfinished game and releases the players."""
+        self.stop_autoplay()
+        if self.profiler is not None:
+            self.profiler.stop()
+        self.publish({"type": "closed"})
+        if self.log_writer:
+            self.log_writer.close(self.game_json_log)
+            self.log_writer = None
+        self._close_players()
+
+    # --- Log ---
+
+    def init_game_log(self) -> None:
+        if self.log_writer:
+            # Writes the report of an abandoned game; a finished one is already on disk.
+            self.log_writer.close(self.game_json_log)
+        self.game_json_log = new_game_log(self.settings.player1, self.settings.player2,
+                                          keyframe=self.env.get_game_state())
+        self.last_logged_state = self.game_json_log["keyframe"]
+        self.active_special_rules = set()
+        GAMES_STARTED.inc()
+        try:
+            os.makedirs(self.logs_dir, exist_ok=True)
+        except Exception:
+            pass
+        self.current_log_path = make_new_log_filename(self.logs_dir)
+        self.log_writer = GameLogWriter(self.current_log_path, self.game_json_log, fsync_interval=self.fsync_interval)
+
+    async def persist_game_log(self) -> None:
+        """
+        Writes the full report now and waits for it off the event loop; steps are
+        streamed by `log_writer`.
+        """
+        with PERSIST_LOG_SECONDS.time():
+            if not self.log_writer:
+                self.init_game_log()
+            self.log_writer.write_report(self.game_json_log)
+            await asyncio.to_thread(self.log_writer.flush)
+
+    # --- Moves ---
+
+    def state(self) -> Dict[str, Any]:
+        return {"game_over": self.game_over, "winner": self.winner, "next_turn": self.current_turn,
+                "game_state": self.env.get_game_state()}
+
+    def process_turn_end(self, end_reason, action_details, animation_events):
+        """Processes the end of a turn, checking for game-over conditions."""
+        self.game_over = True
+        self.winner = get_winner(self.env.get_game_state()["score"])
+        GAMES_FINISHED.inc(winner=self.winner)
+
+        end_message = f"[GAME END] {end_reason}"
+        if action_details.get("steps"):
+            action_details["steps"].append(end_message)
+        else:
+            action_details["steps"] = [end_message]
+
+        animation_events.append({'type': 'game_over', 'message': end_message, 'winner': self.winner})
+        return action_details, animation_events
+
+    def run_move_logic(self, move_payload, is_human_move: bool, extended_rule=None):
+        """Runs the core logic for a single move and updates the game state."""
+        env, game_json_log = self.env, self.game_json_log
+
+        action_details = move_payload.copy()
+        action_details["steps"] = action_details.get("steps", [])
+
+        thoughts = action_details.pop('thoughts', [])
+
+        move_action = move_payload.get("action", {})
+
+        # track special rules used in this move and update environment log
+        if extended_rule and not self.active_special_rules.issuperset(extended_rule):
+            self.active_special_rules.update(extended_rule)
+            game_json_log["enviroment"]["special_rules"] = sorted(self.active_special_rules)
+            if self.log_writer:
+                self.log_writer.update_rules(game_json_log["enviroment"]["special_rules"])
+
+        # Capture game state before action for logging. The env never edits a returned
+        # dict (every change builds a new one), so no copy is needed.
+        before_state = env.get_game_state()
+
+        with span("commit"):
+            steps, animation_events, is_end_by_capture = env.commit_action(move_action, extended_rule)
+        action_details["steps"].extend(steps)
+
+        end_reason = get_end_reason(env.get_game_state(), is_end_by_capture)
+        if end_reason:
+            action_details, animation_events = self.process_turn_end(end_reason, action_details, animation_events)
+
+        player_settings = self.settings.player1 if self.current_turn == "A" else self.settings.player2
+
+        show_dialog = player_settings.type in DIALOG_PLAYER_TYPES and not is_human_move
+
+        after_state = env.get_game_state()
+        with span("log"):
+            step_log = build_step_log(move_payload, before_state, after_state, animation_events, self.current_turn)
+            compact_step_log(step_log, self.last_logged_state)
+        spans = finished_spans()
+        if spans is not None:
+            step_log["spans"] = spans
+        self.last_logged_state = after_state
+        game_json_log["step_by_step"].append(step_log)
+        count_llm_cache(game_json_log, step_log, self.current_turn)
+        if self.log_writer:
+            self.log_writer.append_step(step_log)
+        record_move("human" if is_human_move else player_settings.type, step_log)
+
+        if not self.game_over:
+            self.current_turn = "B" if self.current_turn == "A" else "A"
+
+        # Update result section if game over
+        if self.game_over:
+            game_json_log["result"] = build_result(self.winner, after_state)
+            if self.log_writer:
+                self.log_writer.write_report(game_json_log)
+
+        return {
+            "action_details": action_details,
+            "animation_events": animation_events,
+            "game_over": self.game_over,
+            "winner": self.winner,
+            "next_turn": self.current_turn,
+            "game_state": env.get_game_state(),
+            "thoughts": thoughts,
+            "move_by_human": is_human_move,
+            "show_thinking_dialog": show_dialog
+        }
+
+    async def request_move(self, extended_rule: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Lets the agent whose turn it is play one move (`/api/move`). If the call is
+        cancelled while the agent thinks, the game is left as it was before.
+        """
+        profiler = self.profiler if self.profiler is not None and self.profiler.active else None
+        with turn_trace():
+            if profiler is None:
+                return await self._request_move(extended_rule)
+            with profiling_turn(profiler):
+                result = await self._request_move(extended_rule, profiler)
+        if result.get("action_details") is not None:
+            profiler.move_done(self.game_over)
+        return result
+
+    async def _request_move(self, extended_rule: Optional[List[str]] = None,
+                            profiler: Optional[TurnProfiler] = None) -> Dict[str, Any]:
+        env = self.env
+        if self.game_over:
+            return {"game_over": True, "winner": self.winner, "game_state": env.get_game_state()}
+
+        player_settings = self.settings.player1 if self.current_turn == 'A' else self.settings.player2
+
+        if player_settings.type == 'human':
+            available_pos = env.get_available_pos(self.current_turn)
+            return {"human_turn": True, "team": self.current_turn, "available_pos": available_pos,
+                    "game_state": env.get_game_state()}
+
+        snapshot = env.snapshot()
+        if self.current_turn == "A": env.advance_round()
+
+        player = self.p1 if self.current_turn == "A" else self.p2
+
+        steps = []
+
+        with span("restore"), profiled():
+            can_continue, restore_message = env.restore_peasants(player.team)
+        if not can_continue:
+            action_details, _ = self.process_turn_end(restore_message, {}, [])
+            return {"action_details": action_details, "game_over": True, "winner": self.winner,
+                    "game_state": env.get_game_state()}
+        if restore_message: steps.append(restore_message)
+
+        available_pos = env.get_available_pos(player.team)
+        # `decide` lets a thread-pool agent finish before re-raising a cancellation; by
+        # then the agent has remembered the move, so that is undone with the board.
+        player_snapshot = player.snapshot()
+        start_t = time.perf_counter()
+        try:
+            with span("decide"):
+                move_payload = await decide(player, env.get_game_state(), available_pos,
+                                            extended_rule=extended_rule, profiler=profiler)
+        except asyncio.CancelledError:
+            env.restore(snapshot)
+            player.restore(player_snapshot)
+            raise
+        end_t = time.perf_counter()
+        move_payload['_meta_reasoning_secs'] = round(end_t - start_t, 6)
+        move_payload['team'] = player.team
+        move_payload["steps"] = steps
+
+        if not move_payload.get("action", {}).get("pos"):
+            action_details, _ = self.process_turn_end(f"Player {player.team} has no available moves.", move_payload, [])
+            return {"action_details": action_details, "game_over": True, "winner": self.winner,
+                    "game_state": env.get_game_state()}
+
+        with profiled():
+            return self.run_move_logic(move_payload, is_human_move=False, extended_rule=extended_rule)
+
+    def human_move(self, move: HumanMove) -> Dict[str, Any]:
+        """Plays a move chosen in the UI (`/api/human_move`)."""
+        if self.game_over:
+            return {"game_over": True, "winner": self.winner, "game_state": self.env.get_game_state()}
+        if self.current_turn == "A": self.env.advance_round()
+
+        move_payload = {
+            "reason": "Human action",
+            "action": {
+                "pos": move.pos,
+                "way": move.way
+            },
+            "extended_rule": move.extended_rule,
+            "observation": "",
+            "_meta_reasoning_secs": 0.0,
+            "team": self.current_turn
+        }
+        with turn_trace():
+            return self.run_move_logic(move_payload, is_human_move=True, extended_rule=move.extended_rule)
+
+    def start_profile(self, mode: str = "sample", moves: Optional[int] = 1, interval: float = 0.005) -> TurnProfiler:
+        """
+        Profiles the next `moves` agent moves, or the rest of the game if `moves` is None.
+        RuntimeError if another game is running a "cprofile" profile.
+        """
+        if self.profiler is not None:
+            self.profiler.stop()
+        self.profiler = TurnProfiler(mode, moves=moves, interval=interval)
+        return self.profiler
+
+    # --- Autoplay ---
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def subscribe(self, since: int = 0) -> asyncio.Queue:
+        """A queue of autoplay events, starting with the current run's events from `since` on."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in self.events[since:]:
+            queue.put_nowait(event)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    @property
+    def autoplaying(self) -> bool:
+        return self.autoplay_task is not None and not self.autoplay_task.done()
+
+    def start_autoplay(self, extended_rule: Optional[List[str]] = None, delay: float = 0.0) -> bool:
+        """
+        Plays the game to the end in a background task, `delay` seconds between plies.
+        Returns False if autoplay is already running; ValueError if a player is human.
+        """
+        if self.settings.player1.type == 'human' or self.settings.player2.type == 'human':
+            raise ValueError("Autoplay needs two agents.")
+        if self.autoplaying:
+            return False
+        self.events = []
+        self.autoplay_task = asyncio.get_running_loop().create_task(self._autoplay(extended_rule, delay))
+        return True
+
+    def stop_autoplay(self) -> None:
+        if self.autoplaying:
+            self.autoplay_task.cancel()
+
+    async def _autoplay(self, extended_rule: Optional[List[str]], delay: float) -> None:
+        ply = 0
+        try:
+            while True:
+                async with self.lock:
+                    if self.game_over:
+                        break
+                    result = await self.request_move(extended_rule)
+                self.touch()
+                self.publish({"type": "move", "ply": ply, "data": result})
+                ply += 1
+                if result.get("game_over"):
+                    break
+                if delay:
+                    await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.publish({"type": "stopped", **self.state()})
+            raise
+        except Exception as e:
+            # Best-effort: report to subscribers instead of dying silently
+            print("[autoplay] error:", e)
+            self.publish({"type": "error", "message": str(e), **self.state()})
+        else:
+            self.publish({"type": "end", **self.state()})
+
+
+class SessionRegistry:
+    """
+    Game id -> `GameSession`, in least-recently-used order.
+
+    Sessions idle for more than `idle_timeout` seconds are closed (their log is
+    written as an abandoned game) on the next registry access. At most
+    `max_sessions` games are kept: creating one more evicts the least recently used
+    game that is finished or idle for more than `evict_after` seconds, and raises
+    ValueError if no game is, so games still being played are never cut short.
+    Autoplaying games are never evicted, however long their moves take.
+    """
+
+    def __init__(self, max_sessions: int = 64, idle_timeout: float = 1800.0, logs_dir: str = "logs",
+                 fsync_interval: Optional[float] = 1.0, evict_after: float = 60.0):
+        if max_sessions <= 0:
+            raise ValueError("max_sessions must be a positive integer.")
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.evict_after = evict_after
+        self.logs_dir = logs_dir
+        self.fsync_interval = fsync_interval
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._sessions
+
+    def create(self, settings: GameSettings) -> GameSession:
+        """Starts a new game with its own id; the game is reset and its log opened."""
+        self.evict_idle()
+        if len(self._sessions) >= self.max_sessions and not self._evict_one():
+            raise ValueError(f"Too many active games (max {self.max_sessions}); try again later.")
+        game_id = uuid.uuid4().hex
+        # Players may mutate their settings (e.g. a default model), so each game gets a copy.
+        session = GameSession(game_id, settings.model_copy(deep=True), self.logs_dir, self.fsync_interval)
+        session.reset()
+        self._sessions[game_id] = session
+        return session
+
+    def get(self, game_id: Optional[str]) -> Optional[GameSession]:
+        self.evict_idle()
+        session = self._sessions.get(game_id) if game_id else None
+        if session is not None:
+            self._sessions.move_to_end(game_id)
+            session.touch()
+        return session
+
+    def remove(self, game_id: str) -> bool:
+        session = self._sessions.pop(game_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def evict_idle(self) -> int:
+        """Closes every unlocked game idle for longer than `idle_timeout`; returns how many."""
+        now = time.monotonic()
+        idle = [gid for gid, s in self._sessions.items()
+                if now - s.last_used > self.idle_timeout and not s.lock.locked() and not s.autoplaying]
+        for game_id in idle:
+            self.remove(game_id)
+        self.evictions += len(idle)
+        return len(idle)
+
+    def _evict_one(self) -> bool:
+        now = time.monotonic()
+        for game_id, session in self._sessions.items():
+            if session.lock.locked() or session.autoplaying:
+                continue
+            if session.game_over or now - session.last_used > self.evict_after:
+                self.remove(game_id)
+                self.evictions += 1
+                return True
+        return False
+
+    def close_all(self) -> None:
+        """Closes every game and waits until their logs are on disk (server shutdown)."""
+        for game_id in list(self._sessions):
+            self.remove(game_id)
+        wait_for_writes()
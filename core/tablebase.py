@@ -0,0 +1,306 @@
+"""
+Retrograde endgame tablebase over positions with at most K peasants on the board.
+
+For every position with A to move (B-to-move positions are read through the A/B
+mirror) the table stores, as one signed byte, the points the side to move can still
+win over its opponent with best play on both sides: captures credited to their owner
+teams, counted until both mandarins are gone or the side to move has no peasant left
+to scatter (the restore boundary). Play that never captures again is worth 0.
+
+The round limit, the early-win score and restores are left out; the E1 early-round
+guard is treated as expired (round >= 3), which is always the case in endgames.
+
+Solving goes layer by layer. A layer is (peasants on the board, mandarins still on
+the board, up to the mirror); every capture leads to an already solved lower layer,
+and moves inside a layer capture nothing but may cycle. Those are resolved by retrograde attractor
+passes, one per threshold t: "the side to move wins at least t" / "loses at least t".
+
+File layout (little endian): the `_HEADER` struct, then one int8 per position, in
+`position_index` order. Readers `mmap` the file, so a probe is a rank computation
+plus a one-byte read.
+"""
+import mmap
+import os
+import struct
+import time
+from math import comb
+from typing import Any, Callable, Dict, List, Optional
+
+from .board import SIDE_PITS, NO_MANDARIN, CompactState, sow, rule_flags
+from .transposition import rules_mask
+
+MAGIC = b"OAQTB001"
+# magic, max peasants, rules mask (core.transposition.rules_mask), number of positions
+_HEADER = struct.Struct("<8sIIQ")
+_SQUARES = 12
+# Peasants beyond this make the table (and the solve) far too large anyway.
+_MAX_TABLE_PIECES = 16
+# Mandarin masks solved together: the mirror swaps "only QA left" and "only QB left",
+# so non-capturing moves cycle between those two layers.
+_MASK_GROUPS = ((0,), (1, 2), (3,))
+
+
+def _compositions(n: int, k: int) -> int:
+    """Ways to spread `n` peasants over `k` squares."""
+    return comb(n + k - 1, k - 1) if k else int(n == 0)
+
+
+def layer_size(n: int) -> int:
+    """Positions of one layer with `n` peasants: square counts times owner bit strings."""
+    return _compositions(n, _SQUARES) << n
+
+
+def layer_offsets(max_pieces: int) -> Dict[tuple[int, int], int]:
+    """Start index of every (peasants, mandarin mask) layer; mask bit 0 = QA, bit 1 = QB."""
+    offsets, pos = {}, 0
+    for n in range(max_pieces + 1):
+        for mask in range(4):
+            offsets[(n, mask)] = pos
+            pos += layer_size(n)
+    offsets[None] = pos
+    return offsets
+
+
+def _rank_counts(counts: List[int], n: int) -> int:
+    """Lexicographic rank of the square counts among all compositions of `n`."""
+    rank, left = 0, n
+    for i in range(_SQUARES - 1):
+        c = counts[i]
+        if c:
+            k = _SQUARES - 1 - i
+            # Compositions whose square i holds fewer than c peasants (hockey-stick sum).
+            rank += comb(left + k, k) - comb(left - c + k, k)
+            left -= c
+    return rank
+
+
+def _iter_counts(n: int, k: int = _SQUARES):
+    """Compositions of `n` over `k` squares, in `_rank_counts` order."""
+    if k == 1:
+        yield (n,)
+        return
+    for v in range(n + 1):
+        for rest in _iter_counts(n - v, k - 1):
+            yield (v,) + rest
+
+
+def position_index(state: CompactState, team: str, offsets: Dict[Any, int], max_pieces: int) -> Optional[int]:
+    """Table index of `state` with `team` to move, or None if the table does not hold it."""
+    if team == "B":
+        state = state.mirrored()
+    counts, owners, mandarins = state.counts, state.owners, state.mandarins
+    n = sum(counts)
+    if n > max_pieces:
+        return None
+    mask = 0
+    if mandarins[0] != NO_MANDARIN:
+        if mandarins[0] != 0:
+            return None
+        mask |= 1
+    if mandarins[6] != NO_MANDARIN:
+        if mandarins[6] != 1:
+            return None
+        mask |= 2
+    if any(mandarins[i] != NO_MANDARIN for i in range(12) if i not in (0, 6)):
+        return None
+
+    code, shift = 0, 0
+    for i in range(_SQUARES):
+        if counts[i]:
+            code |= owners[i] << shift
+            shift += counts[i]
+    return offsets[(n, mask)] + (_rank_counts(counts, n) << n) + code
+
+
+def _state_at(counts: tuple, code: int, mask: int) -> CompactState:
+    owners, shift = [0] * _SQUARES, 0
+    for i, c in enumerate(counts):
+        if c:
+            owners[i] = (code >> shift) & ((1 << c) - 1)
+            shift += c
+    mandarins = [NO_MANDARIN] * _SQUARES
+    if mask & 1:
+        mandarins[0] = 0
+    if mask & 2:
+        mandarins[6] = 1
+    # Round 3: the E1 early-round guard no longer applies.
+    return CompactState(list(counts), owners, mandarins, [0, 0], 3)
+
+
+def _solve_layer(exits: List[Optional[int]], internal: List[List[int]]) -> List[int]:
+    """
+    Values of one layer. `exits[p]` is the best value position p reaches by a capturing
+    (layer-leaving) move, None if it has none; `internal[p]` lists the positions its
+    non-capturing moves lead to (the opponent to move there).
+    """
+    size = len(exits)
+    preds: List[List[int]] = [[] for _ in range(size)]
+    for p, children in enumerate(internal):
+        for q in children:
+            preds[q].append(p)
+    thresholds = sorted({abs(e) for e in exits if e})
+    values = [0] * size
+
+    for t in thresholds:
+        win = bytearray(size)
+        lose = bytearray(size)
+        pending = [len(children) for children in internal]
+        queue = []
+        for p in range(size):
+            e = exits[p]
+            if e is not None and e >= t:
+                win[p] = 1
+                queue.append(p)
+            elif not pending[p] and e is not None and e <= -t:
+                lose[p] = 1
+                queue.append(p)
+
+        while queue:
+            x = queue.pop()
+            if win[x]:
+                # Every move of a parent into a won position is a lost move for that parent.
+                for q in preds[x]:
+                    if win[q] or lose[q]:
+                        continue
+                    pending[q] -= 1
+                    if not pending[q] and (exits[q] is None or exits[q] <= -t):
+                        lose[q] = 1
+                        queue.append(q)
+            else:
+                for q in preds[x]:
+                    if not win[q]:
+                        win[q] = 1
+                        queue.append(q)
+
+        for p in range(size):
+            if win[p]:
+                values[p] = t
+            elif lose[p]:
+                values[p] = -t
+    return values
+
+
+def solve(max_pieces: int, extended_rules: Optional[List[str]] = None,
+          progress: Optional[Callable[[int, tuple, int, float], None]] = None) -> bytearray:
+    """Solves every layer up to `max_pieces` peasants; returns the int8 value array."""
+    if not 0 <= max_pieces <= _MAX_TABLE_PIECES:
+        raise ValueError(f"max_pieces must be between 0 and {_MAX_TABLE_PIECES}.")
+    apply_e1, apply_e2 = rule_flags(extended_rules)
+    offsets = layer_offsets(max_pieces)
+    table = bytearray(offsets[None])
+
+    for n in range(max_pieces + 1):
+        for masks in _MASK_GROUPS:
+            start_t = time.perf_counter()
+            # Groups are contiguous in the table, so local index = table index - base.
+            base = offsets[(n, masks[0])]
+            size = layer_size(n) * len(masks)
+            exits: List[Optional[int]] = [None] * size
+            internal: List[List[int]] = [[] for _ in range(size)]
+
+            p = 0
+            for mask in masks:
+                for counts in _iter_counts(n):
+                    movable = [i for i in SIDE_PITS["A"] if counts[i]]
+                    # Both mandarins gone: the game is over and every position is worth 0.
+                    if not mask or not movable:
+                        p += 1 << n
+                        continue
+                    for code in range(1 << n):
+                        state = _state_at(counts, code, mask)
+                        best = None
+                        for idx in movable:
+                            for direction in (1, -1):
+                                child = state.copy()
+                                sow(child, idx, direction, apply_e1, apply_e2)
+                                gain = child.score[0] - child.score[1]
+                                if child.is_end():
+                                    value = gain
+                                else:
+                                    q = position_index(child, "B", offsets, max_pieces) - base
+                                    if 0 <= q < size:
+                                        internal[p].append(q)
+                                        continue
+                                    v = table[q + base]
+                                    value = gain - (v - 256 if v > 127 else v)
+                                if best is None or value > best:
+                                    best = value
+                        exits[p] = best
+                        p += 1
+
+            values = _solve_layer(exits, internal)
+            struct.pack_into(f"{size}b", table, base, *values)
+            if progress:
+                progress(n, masks, size, time.perf_counter() - start_t)
+    return table
+
+
+def build(path: str, max_pieces: int, extended_rules: Optional[List[str]] = None,
+          progress: Optional[Callable[[int, tuple, int, float], None]] = None) -> Dict[str, Any]:
+    """Solves the table and writes it to `path`."""
+    start_t = time.perf_counter()
+    table = solve(max_pieces, extended_rules, progress)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, max_pieces, rules_mask(extended_rules), len(table)))
+        f.write(table)
+    os.replace(tmp_path, path)
+    return {
+        "path": path,
+        "positions": len(table),
+        "bytes": _HEADER.size + len(table),
+        "elapsed_secs": round(time.perf_counter() - start_t, 3),
+    }
+
+
+class Tablebase:
+    """
+    Read-only, memory-mapped view of a table written by `build`.
+
+    `probe` returns the stored value for the team to move, or None when the position
+    has more than `max_pieces` peasants (or is otherwise outside the table).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        magic, self.max_pieces, self.rules_mask, self.positions = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an O An Quan tablebase.")
+        if len(self._mm) != _HEADER.size + self.positions:
+            self.close()
+            raise ValueError(f"{path} is truncated.")
+        self._offsets = layer_offsets(self.max_pieces)
+
+    def __enter__(self) -> "Tablebase":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def matches(self, extended_rules: Optional[List[str]]) -> bool:
+        """True if the table was solved under the same E1/E2 flags as `extended_rules`."""
+        return rules_mask(extended_rules) & 0b11 == self.rules_mask & 0b11
+
+    def probe(self, state: CompactState, team: str) -> Optional[int]:
+        idx = position_index(state, team, self._offsets, self.max_pieces)
+        if idx is None:
+            return None
+        value = self._mm[_HEADER.size + idx]
+        return value - 256 if value > 127 else value
+
+    def probe_game_state(self, game_state: Dict[str, Any], team: str) -> Optional[int]:
+        return self.probe(CompactState.from_game_state(game_state), team)
@@ -0,0 +1,233 @@
+"""
+Batch tournaments: many headless games of one matchup on a process pool.
+
+`run_game_task` is the worker entry point shared with `cli/run_selfplay.py`: it plays
+one game with `core.game.play_game` and writes its `report.*.json`. A `BatchJob`
+submits a whole matchup from the server's event loop, tracks progress and keeps an
+aggregate `summarize` of the finished games; `BatchManager` keeps the recent jobs.
+"""
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from statistics import fmean
+from typing import Any, Dict, List, Optional
+
+WINNERS = ("player_a", "player_b", "draw")
+
+
+def _side_scores(result: Dict[str, Any]) -> tuple[int, int]:
+    """(A, B) from the winner-first `result.score`."""
+    score = result["score"]
+    return (score[1], score[0]) if result["winner"] == "player_b" else (score[0], score[1])
+
+
+def run_game_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker entry point: plays one game, writes its report and returns its totals."""
+    from .game import play_game
+    from .llm_cache import cache_config, configure_cache
+    from models.schemas import PlayerSettings
+
+    if task.get("llm_cache") != cache_config():
+        configure_cache(**(task.get("llm_cache") or {}))
+    if task.get("seed") is not None:
+        random.seed(task["seed"])
+
+    start_t = time.perf_counter()
+    sink = io.StringIO() if task.get("quiet", True) else None
+    with contextlib.redirect_stdout(sink) if sink else contextlib.nullcontext():
+        game_log = play_game(
+            PlayerSettings(**task["player1"]),
+            PlayerSettings(**task["player2"]),
+            extended_rules=task.get("extended_rules"),
+        )
+
+    with open(task["path"], "w", encoding="utf-8") as f:
+        json.dump(game_log, f, ensure_ascii=False, indent=2)
+
+    reasoning = {"A": [], "B": []}
+    for ply, step in enumerate(game_log["step_by_step"]):
+        pos = (step.get("action") or [None])[0]
+        # No action: turns alternate, A first.
+        team = pos[0] if pos else "AB"[ply % 2]
+        reasoning[team].append(step.get("reasoning_times") or 0.0)
+
+    result = game_log["result"]
+    score_a, score_b = _side_scores(result)
+    return {
+        "path": task["path"],
+        "result": result,
+        "score": {"A": score_a, "B": score_b},
+        "steps": len(game_log["step_by_step"]),
+        "reasoning_secs": {team: sum(times) for team, times in reasoning.items()},
+        "moves": {team: len(times) for team, times in reasoning.items()},
+        "elapsed_secs": round(time.perf_counter() - start_t, 3),
+        "llm_cache": game_log.get("llm_cache", {}),
+    }
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate of `run_game_task` results: wins, mean score, rounds and reasoning time."""
+    n = len(results)
+    wins = {w: sum(1 for r in results if r["result"]["winner"] == w) for w in WINNERS}
+    summary: Dict[str, Any] = {
+        "games": n,
+        "wins": wins,
+        "win_rate": {w: round(c * 100 / n, 2) if n else 0.0 for w, c in wins.items()},
+    }
+    if not n:
+        return summary
+    moves = {team: sum(r["moves"][team] for r in results) for team in "AB"}
+    summary.update({
+        "mean_score": {team: round(fmean(r["score"][team] for r in results), 3) for team in "AB"},
+        "mean_rounds": round(fmean(r["result"]["final_round"] or 0 for r in results), 3),
+        "mean_steps": round(fmean(r["steps"] for r in results), 3),
+        # Per move, over every move of that side in the batch.
+        "mean_reasoning_secs": {
+            team: round(sum(r["reasoning_secs"][team] for r in results) / moves[team], 6) if moves[team] else 0.0
+            for team in "AB"
+        },
+    })
+    cache = {}
+    for r in results:
+        for totals in r.get("llm_cache", {}).values():
+            for outcome, n in totals.items():
+                cache[outcome] = cache.get(outcome, 0) + n
+    if cache:
+        # LLM response cache outcomes over both sides' moves.
+        summary["llm_cache"] = cache
+    return summary
+
+
+class BatchJob:
+    """One matchup played `games` times; game i uses `seed + i` when a seed is given."""
+
+    def __init__(self, player1: Dict[str, Any], player2: Dict[str, Any], games: int, out_dir: str,
+                 extended_rules: Optional[List[str]] = None, seed: Optional[int] = None,
+                 llm_cache: Optional[Dict[str, Any]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.out_dir = out_dir
+        self.status = "queued"
+        self.total = games
+        self.results: List[Dict[str, Any]] = []
+        self.errors: List[str] = []
+        self.created = time.time()
+        self.started_t: Optional[float] = None
+        self.finished_t: Optional[float] = None
+        self._futures: list = []
+        self._task: Optional[asyncio.Task] = None
+
+        ts = datetime.now().strftime("%Y.%m.%d.%H%M%S")
+        self.tasks = [{
+            "player1": player1,
+            "player2": player2,
+            "extended_rules": extended_rules,
+            "seed": None if seed is None else seed + gi,
+            "quiet": True,
+            # `configure_cache` arguments for the worker process
+            "llm_cache": llm_cache,
+            # The job id keeps names unique when two jobs share a folder and a second.
+            "path": os.path.join(out_dir, f"report.{ts}.{self.job_id[:8]}.{gi:04d}.json"),
+        } for gi in range(games)]
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def start(self, pool: ProcessPoolExecutor) -> None:
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._task = asyncio.get_running_loop().create_task(self._run(pool))
+
+    async def _run(self, pool: ProcessPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        self.status = "running"
+        self.started_t = time.perf_counter()
+        self._futures = [loop.run_in_executor(pool, run_game_task, task) for task in self.tasks]
+        try:
+            for fut in asyncio.as_completed(self._futures):
+                try:
+                    self.results.append(await fut)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.errors.append(f"{type(e).__name__}: {e}")
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+        else:
+            self.status = "failed" if self.errors and not self.results else "done"
+        finally:
+            self.finished_t = time.perf_counter()
+
+    def cancel(self) -> None:
+        """Drops the games that have not started; running ones still write their reports but are not counted."""
+        if self.done:
+            return
+        for fut in self._futures:
+            fut.cancel()
+        if self._task is not None:
+            self._task.cancel()
+
+    def progress(self) -> Dict[str, Any]:
+        end_t = self.finished_t or time.perf_counter()
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": self.total,
+            "completed": len(self.results),
+            "failed": len(self.errors),
+            "elapsed_secs": round(end_t - self.started_t, 3) if self.started_t else 0.0,
+            "out_dir": self.out_dir,
+            "errors": self.errors[:10],
+            "summary": summarize(self.results),
+        }
+
+
+class BatchManager:
+    """
+    Runs `BatchJob`s on one shared process pool of `workers` processes and keeps the
+    `max_jobs` most recent ones; finished jobs are dropped first.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_jobs: int = 32):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, not forked: the server's threads (agents, log writer) may hold locks
+            # that a forked child would inherit locked.
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def submit(self, job: BatchJob) -> BatchJob:
+        if len(self._jobs) >= self.max_jobs:
+            finished = [job_id for job_id, j in self._jobs.items() if j.done]
+            if not finished:
+                raise ValueError(f"Too many batch jobs in progress (max {self.max_jobs}).")
+            del self._jobs[finished[0]]
+        self._jobs[job.job_id] = job
+        job.start(self._get_pool())
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[BatchJob]:
+        return list(self._jobs.values())
+
+    def shutdown(self) -> None:
+        for job in self._jobs.values():
+            job.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,51 @@
+"""
+Per-turn span tracing.
+
+`turn_trace()` opens a trace for one turn; `span(name)` blocks inside it (in the same
+task, or a thread started with a copy of its context) add their duration in seconds
+to it. The game loops store the result in the step's `spans`, e.g.
+    {"restore": 1e-06, "client": 0.01, "prompt": 0.0004, "provider_call": 1.2,
+     "parse": 0.0001, "decide": 1.21, "commit": 4e-05, "log": 6e-05}
+Outside a trace, `span` only feeds its optional histogram.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Iterator, Optional
+
+_current: ContextVar[Optional[Dict[str, float]]] = ContextVar("oaq_turn_spans", default=None)
+
+
+@contextmanager
+def turn_trace() -> Iterator[Dict[str, float]]:
+    spans: Dict[str, float] = {}
+    token = _current.set(spans)
+    try:
+        yield spans
+    finally:
+        _current.reset(token)
+
+
+def current_spans() -> Optional[Dict[str, float]]:
+    return _current.get()
+
+
+def finished_spans() -> Optional[Dict[str, float]]:
+    """Rounded copy of the current trace for the game log, or None outside a trace."""
+    spans = _current.get()
+    return {name: round(secs, 6) for name, secs in spans.items()} if spans is not None else None
+
+
+@contextmanager
+def span(name: str, histogram=None, **labels) -> Iterator[None]:
+    """Times the block into the current trace (repeated names add up) and `histogram`."""
+    start_t = perf_counter()
+    try:
+        yield
+    finally:
+        secs = perf_counter() - start_t
+        spans = _current.get()
+        if spans is not None:
+            spans[name] = spans.get(name, 0.0) + secs
+        if histogram is not None:
+            histogram.observe(secs, **labels)
@@ -0,0 +1,152 @@
+"""
+Zobrist position keys and a bounded LRU transposition table over `CompactState`.
+
+Keys are taken from the point of view of the team to move: a position with B to
+move is first turned into its A/B mirror (`CompactState.mirrored`), so both sides
+share one canonical entry. A key covers the board, the score delta of the team to
+move, the round and the active extended-rule set.
+"""
+import random
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Hashable
+
+from .board import MIRROR_PIT, NO_MANDARIN, DEFAULT_RULES, CompactState, sow, rule_flags
+
+_MASK64 = (1 << 64) - 1
+# Large enough for every square: a game never has more than 70 peasants.
+_MAX_PIECES = 128
+
+_rng = random.Random(0x0A9A11)
+_Z_COUNT = [[_rng.getrandbits(64) for _ in range(_MAX_PIECES + 1)] for _ in range(12)]
+_Z_OWNER = [[_rng.getrandbits(64) for _ in range(_MAX_PIECES)] for _ in range(12)]
+_Z_MANDARIN = [[_rng.getrandbits(64) for _ in range(2)] for _ in range(12)]
+_RULE_IDS = ("E1", "E2", "E3", "E4", "E5")
+
+
+def _mix64(x: int) -> int:
+    """splitmix64 finalizer, used to key unbounded scalars (score delta, round, rules)."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def rules_mask(extended_rules: Optional[List[str]]) -> int:
+    extended_rules = extended_rules or DEFAULT_RULES
+    return sum(1 << i for i, rule in enumerate(_RULE_IDS) if rule in extended_rules)
+
+
+def board_key(state: CompactState) -> int:
+    """Zobrist hash of the squares only (counts, owner order, mandarins)."""
+    key = 0
+    for i in range(12):
+        n = state.counts[i]
+        key ^= _Z_COUNT[i][n]
+        bits, z_owner = state.owners[i], _Z_OWNER[i]
+        while bits:
+            low = bits & -bits
+            key ^= z_owner[low.bit_length() - 1]
+            bits ^= low
+        if state.mandarins[i] != NO_MANDARIN:
+            key ^= _Z_MANDARIN[i][state.mandarins[i]]
+    return key
+
+
+def canonical(state: CompactState, team: str) -> tuple[CompactState, bool]:
+    """The position as seen by the team to move (always "A"), and whether it was mirrored."""
+    if team == "B":
+        return state.mirrored(), True
+    return state, False
+
+
+def position_key(state: CompactState, team: str, extended_rules: Optional[List[str]] = None,
+                 include_score: bool = True) -> int:
+    """
+    Canonical 64-bit key; mirror images with the other team to move share it.
+
+    `include_score=False` drops the score delta, for values that only depend on the
+    squares (such as move outcomes).
+    """
+    state, _ = canonical(state, team)
+    key = board_key(state)
+    if include_score:
+        key ^= _mix64(((state.score[0] - state.score[1]) << 1) ^ 0x51)
+    key ^= _mix64((state.round << 8) ^ 0xA7)
+    key ^= _mix64((rules_mask(extended_rules) << 8) ^ 0x3C)
+    return key
+
+
+class TranspositionTable:
+    """
+    Bounded LRU map from position keys to arbitrary values.
+
+    The least recently used entry is evicted once `max_entries` is reached. `hits`,
+    `misses` and `evictions` are counted for `get`/`put`.
+    """
+
+    def __init__(self, max_entries: int = 1 << 18):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be a positive integer.")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def outcome(self, state: CompactState, team: str, idx: int, direction: int,
+                extended_rules: Optional[List[str]] = None) -> tuple[CompactState, tuple[int, int, int]]:
+        """
+        Result of `team` sowing square `idx` in `direction`, served from the table.
+
+        Returns a new state (the input is left untouched) and the
+        (dropped, captured_peasants, captured_mandarins) tuple of `core.board.sow`.
+        Outcomes are stored in canonical orientation and without the score, so the
+        mirrored move of the other team and any score reuse the same entry.
+        """
+        base, mirrored = canonical(state, team)
+        c_idx = MIRROR_PIT[idx] if mirrored else idx
+        key = (position_key(base, "A", extended_rules, include_score=False), c_idx, direction)
+
+        entry = self.get(key)
+        if entry is None:
+            child = base.copy()
+            stats = sow(child, c_idx, direction, *rule_flags(extended_rules))
+            entry = (child, (child.score[0] - base.score[0], child.score[1] - base.score[1]), stats)
+            self.put(key, entry)
+
+        cached, gain, stats = entry
+        child = cached.copy()
+        child.score[0], child.score[1] = base.score[0] + gain[0], base.score[1] + gain[1]
+        return (child.mirrored() if mirrored else child), stats
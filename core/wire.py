@@ -0,0 +1,79 @@
+"""
+Wire format of the game API responses.
+
+`commit_action` emits run-length animation events: one `sow` per pickup
+    {"type": "sow", "pos": "A1", "dir": 1, "n": 5, "bits": 0}
+(bit k of `bits` is the team of the k-th piece sown, 0 = A) and `capture` events
+with counts (`n`, `bits`, `mandarin` = team index or -1) instead of token lists.
+
+`encoding="compact"` sends them as they are, with count-based boards: every square
+is `[peasants, owner bits, mandarin]` as in `core.board.CompactState`.
+`encoding="full"` (the default) expands both to the original per-piece `pickup`/`drop`
+events and token-list boards. `static/js/ui/renderer.js` expands compact payloads.
+"""
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from .board import MANDARIN_TOKENS, NO_MANDARIN, ORDER, PIT_INDEX, PEASANT_TOKENS, CompactState
+
+try:
+    import orjson
+except ImportError:  # optional, only faster
+    orjson = None
+
+ENCODINGS = ("full", "compact")
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """UTF-8 JSON of `obj`, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default).encode("utf-8")
+
+
+def _tokens(n: int, bits: int) -> List[str]:
+    return [PEASANT_TOKENS[(bits >> k) & 1] for k in range(n)]
+
+
+def compact_game_state(game_state: Dict[str, Any]) -> Dict[str, Any]:
+    state = CompactState.from_game_state(game_state)
+    return {
+        "board": {pos: [state.counts[i], state.owners[i], state.mandarins[i]] for i, pos in enumerate(ORDER)},
+        "score": dict(game_state["score"]),
+        "round": game_state["round"],
+    }
+
+
+def expand_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-piece `pickup`/`drop`/`capture` events of the run-length ones."""
+    expanded = []
+    for event in events:
+        kind = event.get("type")
+        if kind == "sow":
+            pieces = _tokens(event["n"], event["bits"])
+            expanded.append({"type": "pickup", "pos": event["pos"], "pieces": pieces})
+            current = PIT_INDEX[event["pos"]]
+            for piece in pieces:
+                previous, current = current, (current + event["dir"]) % 12
+                expanded.append({"type": "drop", "from_pos": ORDER[previous], "to_pos": ORDER[current], "piece": piece})
+        elif kind == "capture" and "n" in event:
+            pieces = _tokens(event["n"], event["bits"])
+            if event["mandarin"] != NO_MANDARIN:
+                pieces.insert(0, MANDARIN_TOKENS[event["mandarin"]])
+            expanded.append({"type": "capture", "pos": event["pos"], "team": event["team"], "pieces": pieces})
+        else:
+            expanded.append(event)
+    return expanded
+
+
+def encode_response(data: Dict[str, Any], encoding: str = "full") -> Dict[str, Any]:
+    """`data` (a move or state response) in `encoding`; the input is not modified."""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"encoding must be one of {ENCODINGS}.")
+    data = dict(data)
+    if encoding == "compact":
+        if data.get("game_state"):
+            data["game_state"] = compact_game_state(data["game_state"])
+    elif data.get("animation_events"):
+        data["animation_events"] = expand_events(data["animation_events"])
+    return data
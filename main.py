@@ -1,301 +1,167 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, FileResponse
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Literal, Optional
+
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from core.environment import Enviroment
-from core.player import MockPlayerAgent, PlayerAgent
-from core.persona_instruct import ATTACKER, DEFENDER, BALANCED, STRATEGIC
-from models.schemas import GameSettings, PlayerSettings, HumanMove
+from core.session import GameSession, SessionRegistry, TERMINAL_EVENTS
+from core.tournament import BatchJob, BatchManager
+from models.schemas import GameSettings, PlayerSettings, HumanMove, BatchRequest, ProfileRequest
 from core.endpoints import ENDPOINTS
-from copy import deepcopy
-import time
+from core.gamelog import expand_report
+from core.wire import dumps, encode_response
+from core.metrics import REGISTRY, HTTP_REQUEST_SECONDS
+from core.llm_cache import cache_config, configure_cache, get_cache
+from core.player import shutdown_mcts_pool
 import os
-import json
-from datetime import datetime
 
-app = FastAPI()
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Write the logs of games still in progress.
+    sessions.close_all()
+    batches.shutdown()
+    shutdown_mcts_pool()
 
-# --- Helper Function ---
-def create_player_from_settings(team: str, settings: PlayerSettings):
-    """Initializes a player agent based on the provided settings."""
-
-    print("SETTING: ", settings)
-
-    if settings.type == 'human':
-        return None
-    
-    if settings.type == 'random_agent':
-        return MockPlayerAgent(team=team, persona= BALANCED)
-
-    if settings.type == 'agent':
-        if not settings.model:
-            settings.model = "gemini-2.0-flash-lite" 
-        # Mặc định Balanced
-        persona_obj = BALANCED
-        if settings.persona:
-            persona_map = {
-                "ATTACK": ATTACKER,
-                "DEFENSE": DEFENDER,
-                "BALANCE": BALANCED,
-                "STRATEGIC": STRATEGIC,
-            }
-            key = settings.persona.strip().upper()
-            if key in persona_map:
-                persona_obj = persona_map[key]
-            else:
-                print(f"Warning: Invalid persona value '{settings.persona}'. Using default 'BALANCED'.")
-
-        
-        model_provider = "google"
-        for endpoint in ENDPOINTS:
-            if endpoint["endpoint"] == settings.model:
-                model_provider = endpoint["endpoint_provider"]
-        
-        
-        return PlayerAgent(
-            team=team,
-            model=settings.model,
-            provider=model_provider,
-            temperature=settings.temperature,
-            top_p=settings.topP,
-            top_k=settings.topK,
-            persona=persona_obj,
-            mem_size=settings.memSize,
-        )
-    return None
 
-# --- Global State ---
-env = Enviroment()
+app = FastAPI(lifespan=lifespan)
+
+app.mount("/static", StaticFiles(directory="static"), name="static")
+templates = Jinja2Templates(directory="templates")
 
-game_settings = GameSettings(
+# --- Game Sessions ---
+DEFAULT_SETTINGS = GameSettings(
     player1=PlayerSettings(type='agent', model='gemini-2.0-flash', temperature=0.7, maxTokens=50, topP=1.0, topK=40, memSize=5),
     player2=PlayerSettings(type='agent', model='gemini-2.0-flash', temperature=0.7, maxTokens=50, topP=1.0, topK=40, memSize=5)
 )
 
-p1 = create_player_from_settings("A", game_settings.player1)
-p2 = create_player_from_settings("B", game_settings.player2)
+LOGS_DIR = "logs"
+# Seconds between fsyncs of the step journal (0 = every step, None = leave it to the OS)
+LOG_FSYNC_INTERVAL = 1.0
+# Games kept in memory at once, and seconds without a request before a game is closed.
+MAX_SESSIONS = 64
+SESSION_IDLE_TIMEOUT = 1800.0
+# When full, only finished games or games idle this many seconds make room for a new one.
+SESSION_EVICT_AFTER = 60.0
+# Seconds between keep-alive comments on an idle event stream.
+EVENT_STREAM_PING = 15.0
+
+sessions = SessionRegistry(
+    max_sessions=MAX_SESSIONS, idle_timeout=SESSION_IDLE_TIMEOUT,
+    logs_dir=LOGS_DIR, fsync_interval=LOG_FSYNC_INTERVAL, evict_after=SESSION_EVICT_AFTER,
+)
 
-print("SETTING 1: ", game_settings.player1)
-print("SETTING 2: ", game_settings.player2)
+# Worker processes shared by all /api/batch jobs (None = one per core), and jobs kept.
+BATCH_WORKERS = None
+MAX_BATCH_JOBS = 32
 
-current_turn = "A"
-game_over = False
-winner = None
+batches = BatchManager(workers=BATCH_WORKERS, max_jobs=MAX_BATCH_JOBS)
 
-MAX_ROUND_IN_GAME = 12
-EARLY_WIN_SCORE = 25
+# LLM response cache (core/llm_cache.py) used by game and batch agents, e.g.
+# {"path": "logs/llm_cache.sqlite", "mode": "read_through", "max_age_secs": 30 * 86400}; None disables it.
+LLM_CACHE = None
 
+if LLM_CACHE:
+    configure_cache(**LLM_CACHE)
 
-# --- Structured JSON Log State ---
-game_json_log = {
-    "enviroment": {"special_rules": []},
-    "setup": {
-        "player_a": {},
-        "player_b": {}
-    },
-    "result": None,
-    "step_by_step": []
-}
-active_special_rules = set()
-LOGS_DIR = "logs"
-current_log_path = None
 
+@lru_cache(maxsize=1)
+def initial_state():
+    """Board shown before any game is started, built on first use. Game state dicts are never mutated."""
+    return Enviroment(headless=True).get_game_state()
 
-def _player_setup_from_settings(settings: PlayerSettings) -> dict:
-    """Return a simplified view of player setup for logs.
 
-    - For 'agent': keep configured endpoint and params (with BALANCED as default persona if empty).
-    - For 'random_agent' or 'human': mark endpoint as the type and null all other fields.
-    """
-    if settings.type == 'agent':
-        return {
-            "endpoint": settings.model,
-            "mem_size": settings.memSize,
-            "persona": settings.persona if settings.persona else "BALANCED",
-            "temp": settings.temperature,
-            "top_p": settings.topP,
-            "top_k": settings.topK,
-            "max_token": settings.maxTokens,
-        }
-
-    # Non-LLM players: only indicate the kind; other params are irrelevant
-    endpoint_label = settings.type if settings.type in ['random_agent', 'human'] else 'unknown'
-    return {
-        "endpoint": endpoint_label,
-        "mem_size": None,
-        "persona": None,
-        "temp": None,
-        "top_p": None,
-        "top_k": None,
-        "max_token": None,
-    }
-
-
-def init_game_log():
-    global game_json_log, active_special_rules, current_log_path
-    game_json_log = {
-        "enviroment": {"special_rules": []},
-        "setup": {
-            "player_a": _player_setup_from_settings(game_settings.player1),
-            "player_b": _player_setup_from_settings(game_settings.player2),
-        },
-        "result": None,
-        "step_by_step": []
-    }
-    active_special_rules = set()
-    ensure_logs_dir()
-    current_log_path = make_new_log_filename()
-    persist_game_log()
-
-
-def ensure_logs_dir():
+# Wire format of game responses, see core/wire.py: "full" (per-piece events, token
+# lists) or "compact" (run-length events, count-based boards; used by the web UI).
+Encoding = Literal["full", "compact"]
+
+
+class WireResponse(JSONResponse):
+    """JSON response serialized with orjson when it is installed."""
+
+    def render(self, content) -> bytes:
+        return dumps(content, default=jsonable_encoder)
+
+
+def wire_response(data, encoding: Encoding) -> Response:
+    if isinstance(data, Response):
+        return data
+    return WireResponse(encode_response(data, encoding))
+
+
+def get_session(game_id: Optional[str]) -> GameSession:
+    session = sessions.get(game_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown game id {game_id!r}. Start a game with /api/settings or /api/reset.")
+    return session
+
+
+async def cancel_on_disconnect(request: Request, coro, poll_interval: float = 0.5):
+    """Awaits `coro`, cancelling it if the client goes away first (the result would be lost)."""
+    task = asyncio.ensure_future(coro)
     try:
-        os.makedirs(LOGS_DIR, exist_ok=True)
-    except Exception:
-        pass
+        while True:
+            done, _ = await asyncio.wait([task], timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.wait([task])
+                return JSONResponse({"detail": "Client closed request."}, status_code=499)
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def require_manual(session: GameSession) -> None:
+    if session.autoplaying:
+        raise HTTPException(status_code=409, detail="Autoplay is running for this game; stop it first.")
+
+
+def get_batch(job_id: str) -> BatchJob:
+    job = batches.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch job {job_id!r}.")
+    return job
 
 
-def make_new_log_filename() -> str:
-    ts = datetime.now().strftime("%Y.%m.%d.%H%M%S")
-    return os.path.join(LOGS_DIR, f"report.{ts}.json")
+def batch_out_dir(out_dir: str) -> str:
+    """`out_dir` as a folder inside LOGS_DIR; anything that escapes it is rejected."""
+    root = os.path.abspath(LOGS_DIR)
+    path = os.path.abspath(os.path.join(root, out_dir))
+    if os.path.isabs(out_dir) or os.path.commonpath([root, path]) != root or path == root:
+        raise HTTPException(status_code=400, detail=f"out_dir must be a subfolder of {LOGS_DIR}/.")
+    return path
 
 
-def persist_game_log():
-    global current_log_path
+def new_session(settings: GameSettings) -> GameSession:
     try:
-        if not current_log_path:
-            ensure_logs_dir()
-            current_log_path = make_new_log_filename()
-        with open(current_log_path, "w", encoding="utf-8") as f:
-            json.dump(game_json_log, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        # Best-effort logging; avoid crashing the app
-        print("[log] persist error:", e)
-
-# Do not create a log file at import time.
-# A new log will be created on the first reset/apply_settings before a game starts.
-
-
-def process_turn_end(end_reason, action_details, animation_events):
-    """Processes the end of a turn, checking for game-over conditions."""
-    global game_over, winner
-    game_over = True
-    score = env.get_game_state()["score"]
-    
-    if score["A"] > score["B"]: winner = "A"
-    elif score["B"] > score["A"]: winner = "B"
-    else: winner = "Draw"
-    
-    end_message = f"[GAME END] {end_reason}"
-    if action_details.get("steps"):
-        action_details["steps"].append(end_message)
-    else:
-        action_details["steps"] = [end_message]
-    
-    animation_events.append({'type': 'game_over', 'message': end_message, 'winner': winner})
-    return action_details, animation_events
-
-def run_move_logic(move_payload, is_human_move: bool, extended_rule=None):
-    """Runs the core logic for a single move and updates the game state."""
-    global current_turn, game_over, winner
-    global game_json_log, active_special_rules
-    
-    action_details = move_payload.copy()
-    action_details["steps"] = action_details.get("steps", [])
-
-    thoughts = action_details.pop('thoughts', [])
-
-    move_action = move_payload.get("action", {})
-
-    # track special rules used in this move and update environment log
-    if extended_rule:
-        for r in extended_rule:
-            active_special_rules.add(r)
-        game_json_log["enviroment"]["special_rules"] = sorted(list(active_special_rules))
-
-    # Capture game state before action for logging
-    before_state = deepcopy(env.get_game_state())
-
-    steps, animation_events, is_end_by_capture = env.commit_action(move_action, extended_rule)
-    action_details["steps"].extend(steps)
-    
-    score = env.get_game_state()["score"]
-    end_reason = None
-    if is_end_by_capture: end_reason = "Both Mandarins were captured."
-    elif score["A"] >= EARLY_WIN_SCORE: end_reason = f"Player A reached {score['A']} points."
-    elif score["B"] >= EARLY_WIN_SCORE: end_reason = f"Player B reached {score['B']} points."
-    elif env.get_game_state()["round"] >= MAX_ROUND_IN_GAME: end_reason = f"Reached max round limit."
-        
-    if end_reason:
-        action_details, animation_events = process_turn_end(end_reason, action_details, animation_events)
-        
-    player_settings = game_settings.player1 if current_turn == "A" else game_settings.player2
-    
-    show_dialog = (
-        player_settings.type in ['agent', 'random_agent'] and 
-        not is_human_move
-    )
+        return sessions.create(settings)
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    # Build per-move structured log entry
-    captured_peasants = 0
-    captured_mandarin = 0
-    scattering_step = 0
-    for evt in animation_events:
-        if evt.get('type') == 'capture':
-            pieces = evt.get('pieces', [])
-            captured_peasants += sum(1 for t in pieces if isinstance(t, str) and t.startswith('peasant'))
-            captured_mandarin += sum(1 for t in pieces if isinstance(t, str) and t.startswith('mandarin'))
-        if evt.get('type') == 'drop':
-            scattering_step += 1
-
-    after_state = deepcopy(env.get_game_state())
-    reasoning_secs = move_payload.get('_meta_reasoning_secs', 0)
-
-    step_log = {
-        "observation": move_payload.get("observation", ""),
-        "reason": move_payload.get("reason", ""),
-        "action": [move_action.get("pos"), move_action.get("way")],
-        "reasoning_times": reasoning_secs,
-        "round": before_state.get("round"),
-        "my_score": after_state.get("score", {}).get(current_turn),
-        "game_state_before_act": before_state,
-        "game_state_after_act": after_state,
-        "captured_peasant": captured_peasants,
-        "captured_mandarin": captured_mandarin,
-        "scattering_step": scattering_step,
-    }
-    game_json_log["step_by_step"].append(step_log)
-    persist_game_log()
-
-    if not game_over:
-        current_turn = "B" if current_turn == "A" else "A"
-
-    # Update result section if game over
-    if game_over:
-        score = after_state.get("score", {})
-        if winner == 'A':
-            game_json_log["result"] = {"winner": "player_a", "score": [score.get('A', 0), score.get('B', 0)], "final_round": after_state.get("round")}
-        elif winner == 'B':
-            game_json_log["result"] = {"winner": "player_b", "score": [score.get('B', 0), score.get('A', 0)], "final_round": after_state.get("round")}
-        else:
-            game_json_log["result"] = {"winner": "draw", "score": [score.get('A', 0), score.get('B', 0)], "final_round": after_state.get("round")}
-        persist_game_log()
-
-    return {
-        "action_details": action_details, 
-        "animation_events": animation_events, 
-        "game_over": game_over, 
-        "winner": winner, 
-        "next_turn": current_turn, 
-        "game_state": env.get_game_state(), 
-        "thoughts": thoughts,
-        "move_by_human": is_human_move,
-        "show_thinking_dialog": show_dialog
-    }
+
+@app.middleware("http")
+async def record_request_time(request: Request, call_next):
+    """Observes every request in `oaq_http_request_seconds`, labelled by route template."""
+    start_t = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start_t, method=request.method,
+                                     route=getattr(route, "path", "unmatched"), status=status)
 
 
 # --- API Endpoints ---
@@ -303,105 +169,248 @@ def run_move_logic(move_payload, is_human_move: bool, extended_rule=None):
 async def read_root(request: Request):
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of the metrics in core/metrics.py."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/llm-cache")
+async def llm_cache_stats():
+    """Size of the LLM response cache and this process's hits, misses and stores."""
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
 @app.get("/api/endpoints")
 async def get_endpoints():
     return ENDPOINTS
 
 @app.post("/api/settings")
-async def apply_settings(settings: GameSettings):
-    global game_settings, p1, p2
-    game_settings = settings
-    p1 = create_player_from_settings("A", game_settings.player1)
-    p2 = create_player_from_settings("B", game_settings.player2)
-    await reset_game()
-    return {"message": "Settings applied successfully. Game has been reset.", "game_state": env.get_game_state(), "next_turn": current_turn, "game_over": False, "winner": None}
+async def apply_settings(settings: GameSettings, game_id: Optional[str] = None, encoding: Encoding = "full"):
+    """Applies player settings to `game_id`, or starts a new game with them if it is not given."""
+    session = sessions.get(game_id)
+    if session is None:
+        session = new_session(settings)
+    else:
+        # Cancel a running autoplay first so its current move does not hold the lock.
+        session.stop_autoplay()
+        async with session.lock:
+            session.apply_settings(settings)
+    return wire_response({"message": "Settings applied successfully. Game has been reset.", "game_id": session.game_id, **session.state()}, encoding)
 
 @app.post("/api/reset")
-async def reset_game():
-    global env, current_turn, game_over, winner
-    env.reset()
-    current_turn = "A"
-    game_over = False
-    winner = None
-    init_game_log()
-    return {"message": "Game has been reset!", "game_state": env.get_game_state(), "next_turn": current_turn, "game_over": False, "winner": None}
+async def reset_game(game_id: Optional[str] = None, encoding: Encoding = "full"):
+    """Resets `game_id`, or starts a new game with the default settings if it is not given."""
+    session = sessions.get(game_id)
+    if session is None:
+        session = new_session(DEFAULT_SETTINGS)
+    else:
+        session.stop_autoplay()
+        async with session.lock:
+            session.reset()
+    return wire_response({"message": "Game has been reset!", "game_id": session.game_id, **session.state()}, encoding)
 
 @app.post("/api/move")
-async def request_move(request: Request):
-    if game_over: return {"game_over": True, "winner": winner, "game_state": env.get_game_state()}
-
+async def request_move(request: Request, game_id: Optional[str] = None, encoding: Encoding = "full"):
+    session = get_session(game_id)
     try:
         body = await request.json()
     except Exception:
         body = {}
     extended_rule = body.get("extended_rule")
 
-    player_settings = game_settings.player1 if current_turn == 'A' else game_settings.player2
-    
-    if player_settings.type == 'human':
-        available_pos = env.get_available_pos(current_turn)
-        return {"human_turn": True, "team": current_turn, "available_pos": available_pos, "game_state": env.get_game_state()}
-
-    if current_turn == "A": env.game_state["round"] += 1
-
-    player = p1 if current_turn == "A" else p2
-    
-    action_details = {}
-    steps = []
-
-    can_continue, restore_message = env.restore_peasants(player.team)
-    if not can_continue:
-        action_details, _ = process_turn_end(restore_message, {}, [])
-        return {"action_details": action_details, "game_over": True, "winner": winner, "game_state": env.get_game_state()}
-    if restore_message: steps.append(restore_message)
-
-    available_pos = env.get_available_pos(player.team)
-    start_t = time.perf_counter()
-    move_payload = player.get_action(env.get_game_state(), available_pos, extended_rule=extended_rule)
-    end_t = time.perf_counter()
-    move_payload['_meta_reasoning_secs'] = round(end_t - start_t, 6)
-    move_payload['team'] = player.team
-    move_payload["steps"] = steps
-
-    if not move_payload.get("action", {}).get("pos"):
-        action_details, _ = process_turn_end(f"Player {player.team} has no available moves.", move_payload, [])
-        return {"action_details": action_details, "game_over": True, "winner": winner, "game_state": env.get_game_state()}
+    require_manual(session)
+    async with session.lock:
+        result = await cancel_on_disconnect(request, session.request_move(extended_rule))
+    return wire_response(result, encoding)
 
-    return run_move_logic(move_payload, is_human_move=False, extended_rule=extended_rule)
+@app.post("/api/autoplay")
+async def start_autoplay(request: Request, game_id: Optional[str] = None):
+    """
+    Plays the rest of an agent-vs-agent game on the server. Moves are pushed to
+    `/api/events` as they are committed. Body: {"extended_rule": [...], "delay": secs}.
+    """
+    session = get_session(game_id)
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    try:
+        started = session.start_autoplay(body.get("extended_rule"), delay=float(body.get("delay") or 0.0))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"game_id": session.game_id, "started": started, "autoplay": session.autoplaying}
+
+@app.post("/api/autoplay/stop")
+async def stop_autoplay(game_id: Optional[str] = None):
+    session = get_session(game_id)
+    session.stop_autoplay()
+    return {"game_id": session.game_id, "autoplay": False}
+
+@app.get("/api/events")
+async def stream_events(request: Request, game_id: Optional[str] = None, since: int = 0, encoding: Encoding = "full"):
+    """
+    Server-Sent Events of the game's autoplay run: one `move` event per ply (the
+    `/api/move` response as `data`), then `end`, `stopped`, `error` or `closed`.
+    `since` skips events already received.
+    """
+    session = get_session(game_id)
+
+    async def event_source():
+        queue = session.subscribe(since)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_STREAM_PING)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                payload = encode_response(event, encoding)
+                if "data" in payload:
+                    payload["data"] = encode_response(payload["data"], encoding)
+                yield b"data: " + dumps(payload, default=jsonable_encoder) + b"\n\n"
+                if event["type"] in TERMINAL_EVENTS:
+                    break
+        finally:
+            session.unsubscribe(queue)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.post("/api/human_move")
-async def human_move(move: HumanMove):
-    if game_over: return {"game_over": True, "winner": winner, "game_state": env.get_game_state()}
-    if current_turn == "A": env.game_state["round"] += 1
-    
-    move_payload = {
-        "reason": "Human action",
-        "action": {
-            "pos": move.pos,
-            "way": move.way
-        },
-        "extended_rule": move.extended_rule,
-        "observation": "",
-        "_meta_reasoning_secs": 0.0,
-        "team": current_turn
-    }
-    return run_move_logic(move_payload, is_human_move=True, extended_rule=move.extended_rule)
+async def human_move(move: HumanMove, game_id: Optional[str] = None, encoding: Encoding = "full"):
+    session = get_session(game_id)
+    require_manual(session)
+    async with session.lock:
+        result = session.human_move(move)
+    return wire_response(result, encoding)
+
+@app.post("/api/batch")
+async def start_batch(batch: BatchRequest):
+    """
+    Plays `games` headless games of one matchup on the worker pool, one report each
+    under `logs/<out_dir>/`. Poll `/api/batch/{job_id}` for progress and the summary.
+    """
+    if "human" in (batch.player1.type, batch.player2.type):
+        raise HTTPException(status_code=400, detail="Batch games need two non-human players.")
+    job = BatchJob(
+        batch.player1.model_dump(), batch.player2.model_dump(), batch.games,
+        batch_out_dir(batch.out_dir), extended_rules=batch.extended_rule, seed=batch.seed,
+        llm_cache=cache_config(),
+    )
+    try:
+        batches.submit(job)
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job.progress()
+
+@app.get("/api/batch")
+async def list_batches():
+    return [{"job_id": j.job_id, "status": j.status, "total": j.total, "completed": len(j.results)}
+            for j in batches.jobs()]
+
+@app.get("/api/batch/{job_id}")
+async def batch_progress(job_id: str):
+    return get_batch(job_id).progress()
+
+@app.post("/api/batch/{job_id}/cancel")
+async def cancel_batch(job_id: str):
+    job = get_batch(job_id)
+    job.cancel()
+    # Let the job record its status before reporting it.
+    await asyncio.sleep(0)
+    return job.progress()
+
+@app.post("/api/profile")
+async def start_profile(profile: ProfileRequest, game_id: Optional[str] = None):
+    """
+    Profiles the next `moves` agent moves of the game (`/api/move` or autoplay), or the
+    rest of the game if `moves` is null. Download the result from /api/profile/download.
+    """
+    session = get_session(game_id)
+    try:
+        profiler = session.start_profile(profile.mode, moves=profile.moves, interval=profile.interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"game_id": session.game_id, **profiler.status()}
+
+@app.get("/api/profile")
+async def profile_status(game_id: Optional[str] = None):
+    session = get_session(game_id)
+    if session.profiler is None:
+        raise HTTPException(status_code=404, detail="No profile for this game; start one with POST /api/profile.")
+    return {"game_id": session.game_id, **session.profiler.status()}
+
+@app.post("/api/profile/stop")
+async def stop_profile(game_id: Optional[str] = None):
+    session = get_session(game_id)
+    if session.profiler is not None:
+        session.profiler.stop()
+    return {"game_id": session.game_id, "profiling": False}
+
+@app.get("/api/profile/download")
+async def download_profile(game_id: Optional[str] = None, format: Optional[str] = None):
+    """
+    The profile as a file: `pstats` (default for "cprofile", open with `python -m pstats`)
+    or `text` (top functions by cumulative time); `collapsed` stacks for "sample".
+    """
+    session = get_session(game_id)
+    profiler = session.profiler
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="No profile for this game; start one with POST /api/profile.")
+    format = format or ("pstats" if profiler.mode == "cprofile" else "collapsed")
+    try:
+        if format == "pstats":
+            content, media_type, ext = profiler.pstats_bytes(), "application/octet-stream", "prof"
+        elif format == "text":
+            content, media_type, ext = profiler.pstats_text(), "text/plain; charset=utf-8", "txt"
+        elif format == "collapsed":
+            content, media_type, ext = profiler.collapsed(), "text/plain; charset=utf-8", "collapsed.txt"
+        else:
+            raise HTTPException(status_code=400, detail="format must be pstats, text or collapsed.")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    filename = f"profile.{session.game_id}.{ext}"
+    return Response(content, media_type=media_type,
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 @app.get("/api/state")
-async def get_state():
-    return {"game_over": game_over, "winner": winner, "next_turn": current_turn, "game_state": env.get_game_state()}
+async def get_state(game_id: Optional[str] = None, encoding: Encoding = "full"):
+    """State of `game_id`; without one, the initial board (no game is created)."""
+    if not game_id:
+        return wire_response({"game_id": None, "game_over": False, "winner": None, "next_turn": "A", "game_state": initial_state()}, encoding)
+    session = get_session(game_id)
+    return wire_response({"game_id": session.game_id, **session.state()}, encoding)
 
 @app.get("/api/export_json")
-async def export_json():
-    """Return the structured JSON game log as a downloadable file."""
-    persist_game_log()
-    if not current_log_path or not os.path.exists(current_log_path):
-        # Fallback to return JSON in-memory if file not created
-        return game_json_log
-    filename = os.path.basename(current_log_path)
-    return FileResponse(
-        current_log_path,
-        media_type="application/json",
-        filename=filename,
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+async def export_json(game_id: Optional[str] = None, encoding: str = "full"):
+    """
+    Return the structured JSON game log as a downloadable file.
+
+    By default states are expanded to full `game_state_before_act`/`_after_act`
+    snapshots; `?encoding=delta` returns the compact file as stored.
+    """
+    session = get_session(game_id)
+    async with session.lock:
+        await session.persist_game_log()
+        game_json_log, current_log_path = session.game_json_log, session.current_log_path
+        if not current_log_path or not os.path.exists(current_log_path):
+            # Fallback to return JSON in-memory if file not created
+            return game_json_log if encoding == "delta" else expand_report(game_json_log)
+        filename = os.path.basename(current_log_path)
+        if encoding == "delta":
+            return FileResponse(
+                current_log_path,
+                media_type="application/json",
+                filename=filename,
+                headers={"Content-Disposition": f"attachment; filename={filename}"}
+            )
+        return JSONResponse(
+            expand_report(game_json_log),
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
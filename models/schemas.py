@@ -10,6 +10,12 @@ class PlayerSettings(BaseModel):
     topK: Optional[float] = Field(None, alias='topK')
     persona: Optional[str] = None 
     memSize: Optional[int] = Field(None, alias='memSize')
+    # Search agents ('alphabeta_agent', 'mcts_agent')
+    maxDepth: Optional[int] = Field(None, alias='maxDepth')
+    timeLimit: Optional[float] = Field(None, alias='timeLimit')
+    workers: Optional[int] = None
+    rollout: Optional[str] = None
+    tablebase: Optional[str] = None
 
 class GameSettings(BaseModel):
     player1: PlayerSettings
@@ -18,4 +24,21 @@ class GameSettings(BaseModel):
 class HumanMove(BaseModel):
     pos: str
     way: str
-    extended_rule: Optional[list[str]] = None
\ No newline at end of file
+    extended_rule: Optional[list[str]] = None
+class BatchRequest(BaseModel):
+    player1: PlayerSettings
+    player2: PlayerSettings
+    extended_rule: Optional[list[str]] = None
+    games: int = Field(1, ge=1, le=10000)
+    # Base seed; game i uses seed + i
+    seed: Optional[int] = None
+    # Folder under logs/ for the reports
+    out_dir: str = "batch"
+
+class ProfileRequest(BaseModel):
+    # "sample" (collapsed stacks) or "cprofile" (pstats)
+    mode: str = "sample"
+    # Agent moves to profile; None = the rest of the game
+    moves: Optional[int] = 1
+    # Seconds between stack samples
+    interval: float = 0.005
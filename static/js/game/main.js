@@ -7,6 +7,10 @@ let gameState = {
     isAutoMode: false,
     autoMoveTimeout: null,
     lastApiData: null,
+    // Autoplay phía server: nước đi được đẩy qua SSE, xếp hàng và phát lại từng nước một.
+    eventSource: null,
+    streamQueue: [],
+    waitingForStream: false,
 };
 
 function getEnabledRules() {
@@ -20,6 +24,7 @@ function getEnabledRules() {
 }
 
 function processApiResponse(data) {
+    renderer.expandPayload(data);
     if (!data || !data.game_state) return;
     gameState.lastApiData = data;
     gameState.currentRound = data.game_state.round;    
@@ -50,6 +55,7 @@ function processApiResponse(data) {
 }
 
 function updateUI(data, skipBoardRendering = false) {
+    renderer.expandPayload(data);
     if (!data || !data.game_state) return;
     gameState.lastApiData = data;
     const { game_state, game_over, winner, next_turn, human_turn, available_pos } = data;
@@ -71,6 +77,7 @@ function updateUI(data, skipBoardRendering = false) {
         }
         gameState.isAutoMode = false;
         clearTimeout(gameState.autoMoveTimeout);
+        closeEventStream();
         renderer.setHumanInteraction(false);
     } else {
         renderer.updateStatus(`Round ${game_state.round} - Turn: Player ${next_turn}`);
@@ -84,11 +91,56 @@ function updateUI(data, skipBoardRendering = false) {
     if (gameState.isAutoMode && !game_over && !human_turn) {
         clearTimeout(gameState.autoMoveTimeout);
         gameState.autoMoveTimeout = setTimeout(() => {
-            gameHandlers.onAgentMove();
+            if (gameState.eventSource) {
+                playNextStreamedMove();
+            } else {
+                gameHandlers.onAgentMove();
+            }
         }, 1000); 
     }
 }
 
+function playNextStreamedMove() {
+    const data = gameState.streamQueue.shift();
+    if (data) {
+        gameState.waitingForStream = false;
+        processApiResponse(data);
+    } else {
+        gameState.waitingForStream = true;
+        renderer.updateStatus('Thinking...');
+    }
+}
+
+function closeEventStream() {
+    if (gameState.eventSource) {
+        gameState.eventSource.close();
+        gameState.eventSource = null;
+    }
+    gameState.streamQueue = [];
+    gameState.waitingForStream = false;
+}
+
+async function startServerAutoplay() {
+    closeEventStream();
+    const started = await api.startAutoplay(getEnabledRules());
+    if (!started) return false;  // Có người chơi là human: dùng vòng lặp /api/move như cũ.
+
+    const source = new EventSource(api.eventsUrl());
+    gameState.eventSource = source;
+    source.onmessage = (e) => {
+        const event = JSON.parse(e.data);
+        if (event.type === 'move') {
+            gameState.streamQueue.push(event.data);
+            if (gameState.waitingForStream) playNextStreamedMove();
+        } else {
+            source.close();
+            if (event.type === 'error') renderer.updateStatus(`Autoplay error: ${event.message}`);
+        }
+    };
+    source.onerror = () => source.close();
+    return true;
+}
+
 
 const getPersonaSelection = (playerNum) => {
     // Tên của input radio button sẽ là 'persona-player1' hoặc 'persona-player2'
@@ -160,7 +212,7 @@ export const gameHandlers = {
         gameHandlers.onToggleAutoMode(false);
         const getPlayerSettings = (playerNum) => {
             const type = document.getElementById(`player${playerNum}`).value;
-            if (type === 'human' || type === 'random_agent') {
+            if (type === 'human' || type === 'random_agent' || type === 'alphabeta_agent' || type === 'mcts_agent') {
                 return { type: type };
             }
             const persona = getPersonaSelection(playerNum);
@@ -194,18 +246,31 @@ export const gameHandlers = {
     
     onExportHistory: () => {
         // Yêu cầu backend xuất file JSON và tải xuống trực tiếp
-        window.open('/api/export_json', '_blank');
+        window.open(api.exportUrl(), '_blank');
     },
 
-    onToggleAutoMode: (enabled) => {
+    onToggleAutoMode: async (enabled) => {
         gameState.isAutoMode = enabled;
-        
-        if (gameState.lastApiData) {
-            updateUI(gameState.lastApiData);
-        }
 
         if (!enabled) {
             clearTimeout(gameState.autoMoveTimeout);
+            if (gameState.eventSource) {
+                closeEventStream();
+                const data = await api.stopAutoplay();
+                // Đồng bộ lại bàn cờ với server (nước đang nghĩ dở đã bị huỷ).
+                const state = data ? await api.getGameState() : null;
+                if (state) updateUI(state);
+                return;
+            }
+        } else if (gameState.lastApiData && !gameState.lastApiData.game_over && !gameState.lastApiData.human_turn) {
+            if (await startServerAutoplay()) {
+                updateUI(gameState.lastApiData);
+                return;
+            }
+        }
+
+        if (gameState.lastApiData) {
+            updateUI(gameState.lastApiData);
         }
     }
 };
@@ -229,7 +294,7 @@ async function populateEndpoints() {
 export async function initializeGame() {
     renderer.updateStatus('Fetching initial game state...');
     await populateEndpoints();
-    const data = await api.getGameState();
+    const data = renderer.expandPayload(await api.getGameState());
     if (data) {
         // Không gọi updateUI() nữa, chỉ cập nhật thủ công những gì cần thiết
         const { game_state } = data;
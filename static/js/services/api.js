@@ -20,11 +20,36 @@ export async function fetchAPI(endpoint, method = 'GET', body = null) {
     }
 }
 
+// Id của ván đấu do server cấp qua /api/settings hoặc /api/reset; mọi request sau đó đều gắn kèm.
+let gameId = null;
+
+function withGame(path, params = {}) {
+    const query = new URLSearchParams(params);
+    if (gameId) query.set('game_id', gameId);
+    const qs = query.toString();
+    return qs ? `${path}?${qs}` : path;
+}
+
+// Ván đấu trả về ở định dạng gọn (xem core/wire.py); renderer.expandPayload giải nén lại.
+const WIRE = { encoding: 'compact' };
+
+async function fetchGameAPI(endpoint, method = 'GET', body = null) {
+    const data = await fetchAPI(withGame(endpoint, WIRE), method, body);
+    if (data && data.game_id) {
+        gameId = data.game_id;
+    }
+    return data;
+}
+
 export const api = {
-    getGameState: () => fetchAPI('/api/state'),
-    requestAgentMove: (extended_rule) => fetchAPI('/api/move', 'POST', { extended_rule }),
-    sendHumanMove: (pos, way, extended_rule) => fetchAPI('/api/human_move', 'POST', { pos, way, extended_rule }),
-    resetGame: () => fetchAPI('/api/reset', 'POST'),
-    applySettings: (settings) => fetchAPI('/api/settings', 'POST', settings),
+    getGameState: () => fetchGameAPI('/api/state'),
+    requestAgentMove: (extended_rule) => fetchGameAPI('/api/move', 'POST', { extended_rule }),
+    sendHumanMove: (pos, way, extended_rule) => fetchGameAPI('/api/human_move', 'POST', { pos, way, extended_rule }),
+    resetGame: () => fetchGameAPI('/api/reset', 'POST'),
+    applySettings: (settings) => fetchGameAPI('/api/settings', 'POST', settings),
     getEndpoints: () => fetchAPI('/api/endpoints'), // Thêm dòng này
+    exportUrl: () => withGame('/api/export_json'),
+    startAutoplay: (extended_rule) => fetchGameAPI('/api/autoplay', 'POST', { extended_rule }),
+    stopAutoplay: () => fetchGameAPI('/api/autoplay/stop', 'POST'),
+    eventsUrl: () => withGame('/api/events', WIRE),
 };
\ No newline at end of file
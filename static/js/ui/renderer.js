@@ -2,6 +2,65 @@
 
 const sleep = ms => new Promise(res => setTimeout(res, ms));
 
+// --- GIẢI NÉN ĐỊNH DẠNG GỌN CỦA SERVER (core/wire.py) ---
+
+const ORDER = ['QA', 'A1', 'A2', 'A3', 'A4', 'A5', 'QB', 'B5', 'B4', 'B3', 'B2', 'B1'];
+const PEASANTS = ['peasant_a', 'peasant_b'];
+const MANDARINS = ['mandarin_a', 'mandarin_b'];
+
+// Bit k của `bits` là phe của quân thứ k (0 = A). Có thể vượt 32 bit nên không dùng toán tử bit.
+function peasantTokens(n, bits) {
+    const tokens = [];
+    for (let k = 0; k < n; k++) {
+        tokens.push(PEASANTS[Math.floor(bits / 2 ** k) % 2]);
+    }
+    return tokens;
+}
+
+// Ô dạng [số dân, bits, quan] -> danh sách quân; ô đã là danh sách thì giữ nguyên.
+function expandPit(pit) {
+    if (!Array.isArray(pit) || typeof pit[0] !== 'number') return pit;
+    const [n, bits, mandarin] = pit;
+    const tokens = peasantTokens(n, bits);
+    if (mandarin >= 0) tokens.unshift(MANDARINS[mandarin]);
+    return tokens;
+}
+
+// Mỗi sự kiện 'sow' (ô, hướng, số quân) -> một 'pickup' và từng 'drop' như trước.
+function expandEvents(events) {
+    const expanded = [];
+    for (const event of events) {
+        if (event.type === 'sow') {
+            const pieces = peasantTokens(event.n, event.bits);
+            expanded.push({ type: 'pickup', pos: event.pos, pieces });
+            let current = ORDER.indexOf(event.pos);
+            for (const piece of pieces) {
+                const previous = current;
+                current = (current + event.dir + 12) % 12;
+                expanded.push({ type: 'drop', from_pos: ORDER[previous], to_pos: ORDER[current], piece });
+            }
+        } else if (event.type === 'capture' && event.n !== undefined) {
+            const pieces = peasantTokens(event.n, event.bits);
+            if (event.mandarin >= 0) pieces.unshift(MANDARINS[event.mandarin]);
+            expanded.push({ type: 'capture', pos: event.pos, team: event.team, pieces });
+        } else {
+            expanded.push(event);
+        }
+    }
+    return expanded;
+}
+
+// Giải nén bàn cờ và sự kiện của một response (tại chỗ); gọi nhiều lần vẫn an toàn.
+export function expandPayload(data) {
+    if (!data) return data;
+    const board = data.game_state?.board;
+    if (board) {
+        for (const pos of Object.keys(board)) board[pos] = expandPit(board[pos]);
+    }
+    if (data.animation_events) data.animation_events = expandEvents(data.animation_events);
+    return data;
+}
+
 // --- CÁC HÀM TẠO VÀ QUẢN LÝ QUÂN CỜ (BUBBLES) ---
 
 function createBubbleElement(piece) {
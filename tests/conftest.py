@@ -0,0 +1,19 @@
+import os
+import random
+import sys
+
+import pytest
+
+# Run from anywhere: the packages live at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def played_game():
+    """`play_game` report of two seeded random agents (delta-encoded states)."""
+    from core.game import play_game
+    from models.schemas import PlayerSettings
+
+    random.seed(7)
+    settings = PlayerSettings(type="random_agent")
+    return play_game(settings, settings, extended_rules=["E1", "E2"])
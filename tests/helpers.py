@@ -0,0 +1,82 @@
+"""Shared helpers of the test modules (fixtures live in conftest.py)."""
+import random
+
+from core.board import ORDER, rule_flags
+from core.environment import Enviroment
+
+WAYS = ("clockwise", "counter_clockwise")
+
+
+def random_positions(seed: int, games: int = 20, max_plies: int = 120):
+    """Yields (state, team to move) positions reached by random legal play, restores included."""
+    rng = random.Random(seed)
+    for _ in range(games):
+        env = Enviroment(headless=True)
+        team = "A"
+        for _ in range(max_plies):
+            if team == "A":
+                env.advance_round()
+            can_continue, _ = env.restore_peasants(team)
+            if not can_continue:
+                break
+            yield env.state.copy(), team
+            idx = rng.choice(env.state.available(team))
+            _, _, is_end = env.commit_action({"pos": ORDER[idx], "way": rng.choice(WAYS)})
+            if is_end:
+                break
+            team = "B" if team == "A" else "A"
+
+
+def reference_move(game_state, pos, way, extended_rules):
+    """
+    (board, score, animation events) after a move, as the original dict-of-lists
+    `Enviroment.commit_action` played it, with its per-piece `pickup`/`drop` events.
+    """
+    apply_e1, apply_e2 = rule_flags(extended_rules)
+    board = {k: list(v) for k, v in game_state["board"].items()}
+    score = dict(game_state["score"])
+    round_idx = game_state["round"]
+    events = []
+
+    def scatter(pos):
+        tokens = [t for t in board[pos] if not t.startswith("mandarin")]
+        events.append({"type": "pickup", "pos": pos, "pieces": tokens})
+        board[pos] = [t for t in board[pos] if t.startswith("mandarin")]
+        index, previous = ORDER.index(pos), pos
+        for i, token in enumerate(tokens):
+            target = ORDER[(index + direction * (i + 1)) % 12]
+            board[target].append(token)
+            events.append({"type": "drop", "from_pos": previous, "to_pos": target, "piece": token})
+            previous = target
+        return (index + direction * len(tokens)) % 12
+
+    direction = 1 if way == "clockwise" else -1
+    current = scatter(pos)
+    loop_count = 0
+    while loop_count < 100:
+        loop_count += 1
+        next_index = (current + direction) % 12
+        next_pos = ORDER[next_index]
+        if not board[next_pos]:
+            target_index = (next_index + direction) % 12
+            target = ORDER[target_index]
+            if not board[target]:
+                break
+            if target.startswith("Q") and apply_e1 and (len(board[target]) < 5 or round_idx < 3):
+                break
+            pieces = board[target]
+            events.append({"type": "capture", "pos": target, "team": "A" if pieces[0].endswith("_a") else "B",
+                           "pieces": pieces})
+            for token in pieces:
+                value = 10 if token.startswith("mandarin") else 1
+                score["A" if token.endswith("_a") else "B"] += value
+            board[target] = []
+            events.append({"type": "score_update", "score": dict(score)})
+            current = target_index
+        else:
+            if not any(not t.startswith("mandarin") for t in board[next_pos]):
+                break
+            current = scatter(next_pos)
+            if not apply_e2:
+                break
+    return board, score, events
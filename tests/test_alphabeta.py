@@ -0,0 +1,64 @@
+from core.board import PIT_INDEX, CompactState
+from core.persona_instruct import BALANCED
+from core.player import AlphaBetaPlayerAgent
+
+
+def capture_position(round_idx=3):
+    """A to move: A3 counter-clockwise takes QA's mandarin (10 points for A), clockwise gives B the QB one."""
+    board = {pos: [] for pos in ("QA", "A1", "A2", "A3", "A4", "A5", "QB", "B5", "B4", "B3", "B2", "B1")}
+    board["QA"] = ["mandarin_a"]
+    board["QB"] = ["mandarin_b"]
+    board["A3"] = ["peasant_a"]
+    board["B3"] = ["peasant_b", "peasant_b"]
+    return CompactState.from_game_state({"board": board, "score": {"A": 0, "B": 0}, "round": round_idx})
+
+
+def agent(**kwargs):
+    kwargs.setdefault("time_limit", None)
+    return AlphaBetaPlayerAgent("A", BALANCED, **kwargs)
+
+
+def test_takes_an_immediate_mandarin_capture():
+    for max_depth in (1, 4):
+        result = agent(max_depth=max_depth).search(capture_position(), "A", ["E2", "E3"])
+        assert result["move"] == (PIT_INDEX["A3"], -1)
+        assert result["value"] >= 10
+
+
+def test_node_limit_falls_back_to_a_legal_move():
+    state = CompactState.initial()
+    state.round = 1
+    for node_limit in (1, 0):
+        result = agent(node_limit=node_limit).search(state, "A", ["E1", "E2"])
+        idx, direction = result["move"]
+        assert idx in state.available("A") and state.counts[idx] and direction in (1, -1)
+        assert result["depth"] <= node_limit
+
+
+def test_search_honours_max_depth():
+    state = CompactState.initial()
+    state.round = 1
+    assert agent(max_depth=2).search(state, "A", ["E1", "E2"])["depth"] == 2
+    assert agent(max_depth=1).search(state, "A", ["E1", "E2"])["depth"] == 1
+
+
+def test_table_is_reused_between_searches():
+    state = CompactState.initial()
+    state.round = 1
+    player = agent(max_depth=3)
+    first = player.search(state, "A", ["E1", "E2"])
+    hits = player.table.hits
+    second = player.search(state, "A", ["E1", "E2"])
+    assert player.table.hits > hits
+    assert second["nodes"] < first["nodes"]
+    assert second["move"] == first["move"] and second["value"] == first["value"]
+
+
+def test_table_entries_do_not_leak_across_rules():
+    # Under E1 the lone mandarin on QA cannot be captured; without E1 it can.
+    player = agent(max_depth=1)
+    with_e1 = player.search(capture_position(), "A", ["E1", "E2"])
+    without_e1 = player.search(capture_position(), "A", ["E2"])
+    assert with_e1["value"] < 10
+    assert without_e1["move"] == (PIT_INDEX["A3"], -1)
+    assert without_e1["value"] >= 10
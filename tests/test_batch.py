@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from helpers import random_positions
+from core.batch import BatchEnviroment, batch_sow, greedy_policy, random_policy, summarize
+from core.board import ORDER, SIDE_PITS, rule_flags, sow
+from core.environment import Enviroment
+
+
+def stack(states):
+    counts = np.array([s.counts for s in states], dtype=np.int16)
+    owners = np.array([s.owners for s in states], dtype=np.uint64)
+    mandarins = np.array([s.mandarins for s in states], dtype=np.int8)
+    score = np.array([s.score for s in states], dtype=np.int64)
+    rounds = np.array([s.round for s in states], dtype=np.int32)
+    return counts, owners, mandarins, score, rounds
+
+
+@pytest.mark.parametrize("extended_rules", [["E1", "E2"], ["E1"], ["E2"], ["E3"]])
+def test_batch_sow_matches_sow(extended_rules):
+    apply_e1, apply_e2 = rule_flags(extended_rules)
+    rng = np.random.default_rng(0)
+    states, starts, directions = [], [], []
+    for state, team in random_positions(seed=11, games=8):
+        movable = [i for i in SIDE_PITS[team] if state.counts[i]]
+        states.append(state)
+        starts.append(int(rng.choice(movable)))
+        directions.append(int(rng.choice([1, -1])))
+    counts, owners, mandarins, score, rounds = stack(states)
+    # Every third game sits this batch out and must stay untouched.
+    rows = np.arange(0, len(states))
+    rows = rows[rows % 3 != 0]
+    batch_sow(counts, owners, mandarins, score, rounds, rows,
+              np.array(starts)[rows], np.array(directions)[rows], apply_e1, apply_e2)
+
+    for g, state in enumerate(states):
+        expected = state.copy()
+        if g % 3:
+            sow(expected, starts[g], directions[g], apply_e1, apply_e2)
+        assert counts[g].tolist() == expected.counts
+        assert [int(v) for v in owners[g]] == expected.owners
+        assert mandarins[g].tolist() == expected.mandarins
+        assert score[g].tolist() == expected.score
+
+
+def test_batch_sow_needs_contiguous_arrays():
+    counts, owners, mandarins, score, rounds = stack([s for s, _ in random_positions(seed=1, games=1, max_plies=2)])
+    with pytest.raises(ValueError):
+        batch_sow(counts[:, ::-1], owners, mandarins, score, rounds, np.array([0]), np.array([1]), np.array([1]),
+                  True, True)
+
+
+def test_lockstep_games_match_the_engine():
+    n = 16
+    env = BatchEnviroment(n, extended_rules=["E1", "E2"])
+    engines = [Enviroment(headless=True) for _ in range(n)]
+    policy = random_policy(np.random.default_rng(5))
+
+    for _ in range(400):
+        if env.done.all():
+            break
+        team, active = env.team, ~env.done
+        if team == "A":
+            for g in np.nonzero(active)[0]:
+                engines[g].advance_round()
+        for g in np.nonzero(active)[0]:
+            engines[g].restore_peasants(team)
+        moves = []
+
+        def recording(batch, live):
+            choice, direction = policy(batch, live)
+            moves.append((choice, direction, live.copy()))
+            return choice, direction
+
+        env.step(recording)
+        if moves:
+            choice, direction, live = moves[0]
+            for g in np.nonzero(live)[0]:
+                pos = ORDER[SIDE_PITS[team][choice[g]]]
+                engines[g].commit_action({"pos": pos, "way": "clockwise" if direction[g] == 1 else "counter_clockwise"},
+                                         ["E1", "E2"])
+        for g in range(n):
+            if active[g]:
+                assert env.get_game_state(g) == engines[g].get_game_state()
+
+    assert env.done.all()
+    stats = summarize(env.results())
+    assert stats["games"] == n
+    assert stats["win_rate_a"] + stats["win_rate_b"] + stats["draw_rate"] == pytest.approx(1.0)
+
+
+def test_greedy_beats_random():
+    env = BatchEnviroment(200)
+    results = env.run(greedy_policy(np.random.default_rng(1)), random_policy(np.random.default_rng(2)))
+    stats = summarize(results)
+    assert stats["win_rate_a"] > stats["win_rate_b"]
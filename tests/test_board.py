@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from helpers import WAYS, random_positions, reference_move
+from core.board import ORDER, PIT_INDEX, SIDE_PITS, CompactState, rule_flags, sow
+from core.environment import Enviroment
+
+RULE_SETS = (["E1", "E2"], ["E1"], ["E2"], ["E3"])
+
+
+def test_game_state_round_trip():
+    for state, _ in random_positions(seed=1, games=5):
+        game_state = state.to_game_state()
+        assert CompactState.from_game_state(game_state).to_game_state() == game_state
+
+
+@pytest.mark.parametrize("extended_rules", RULE_SETS)
+def test_moves_match_original_engine(extended_rules):
+    rng = random.Random(2)
+    checked = 0
+    for state, team in random_positions(seed=3, games=10):
+        before = state.to_game_state()
+        for idx in state.available(team):
+            if not state.counts[idx]:
+                continue
+            way = rng.choice(WAYS)
+            env = Enviroment(headless=True)
+            env.game_state = before
+            env.commit_action({"pos": ORDER[idx], "way": way}, extended_rules)
+            after = env.get_game_state()
+            board, score, _ = reference_move(before, ORDER[idx], way, extended_rules)
+            assert after["board"] == board
+            assert after["score"] == score
+            checked += 1
+    assert checked > 100
+
+
+def test_invalid_move_raises_headless():
+    env = Enviroment(headless=True)
+    with pytest.raises(ValueError):
+        env.commit_action({"pos": "QA", "way": "clockwise"})
+    steps, events, is_end = Enviroment().commit_action({"pos": "QA", "way": "clockwise"})
+    assert steps[0].startswith("[error]") and events == [] and not is_end
+
+
+def test_apply_undo_restores_every_position():
+    apply_e1, apply_e2 = rule_flags(None)
+    for state, team in random_positions(seed=4, games=5):
+        frozen = state.freeze()
+        for idx in state.available(team):
+            if not state.counts[idx]:
+                continue
+            for direction in (1, -1):
+                expected = state.copy()
+                stats = sow(expected, idx, direction, apply_e1, apply_e2)
+                assert state.apply(idx, direction, apply_e1, apply_e2) == stats
+                assert state.freeze() == expected.freeze()
+                state.undo()
+                assert state.freeze() == frozen
+        with pytest.raises(IndexError):
+            state.undo()
+
+
+def test_nested_apply_undo():
+    state = CompactState.initial()
+    state.round = 3
+    start = state.freeze()
+    state.apply(PIT_INDEX["A1"], 1, True, True)
+    middle = state.freeze()
+    side = [i for i in SIDE_PITS["B"] if state.counts[i]]
+    state.apply(side[0], -1, True, True)
+    state.undo()
+    assert state.freeze() == middle
+    state.undo()
+    assert state.freeze() == start
+    assert hash(start) == hash(CompactState.initial().freeze()._replace(round=3))
@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+from analytics.catalog import Catalog
+
+
+def write_report(logs, name, game_log):
+    path = logs / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(game_log), encoding="utf-8")
+    return path
+
+
+def count(catalog, table):
+    return catalog.query(f"SELECT COUNT(*) AS n FROM {table}")[0]["n"]
+
+
+def changes(stats):
+    return {k: v for k, v in stats.items() if k != "elapsed_secs"}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with Catalog(str(tmp_path / "catalog.sqlite")) as catalog:
+        yield catalog
+
+
+def test_update_only_touches_changed_reports(played_game, tmp_path, catalog):
+    logs = tmp_path / "logs"
+    n_steps = len(played_game["step_by_step"])
+    first = write_report(logs, "ex_rule/E1_E2/report.1.json", played_game)
+    write_report(logs, "ex_rule/E1_E2/report.2.json", played_game)
+
+    assert changes(catalog.update(str(logs))) == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+    assert count(catalog, "games") == 2 and count(catalog, "steps") == 2 * n_steps
+    assert changes(catalog.update(str(logs))) == {"added": 0, "updated": 0, "removed": 0, "unchanged": 2, "failed": 0}
+
+    shorter = dict(played_game, step_by_step=played_game["step_by_step"][:3])
+    write_report(logs, "ex_rule/E1_E2/report.1.json", shorter)
+    os.utime(first, ns=(1, 1))
+    assert changes(catalog.update(str(logs)))["updated"] == 1
+    assert count(catalog, "games") == 2 and count(catalog, "steps") == n_steps + 3
+
+    os.remove(first)
+    assert changes(catalog.update(str(logs))) == {"added": 0, "updated": 0, "removed": 1, "unchanged": 1, "failed": 0}
+    assert count(catalog, "games") == 1 and count(catalog, "steps") == n_steps
+    assert count(catalog, "setups") == 2
+
+
+def test_unreadable_report_is_retried_when_it_changes(played_game, tmp_path, catalog):
+    logs = tmp_path / "logs"
+    broken = logs / "ex" / "report.1.json"
+    broken.parent.mkdir(parents=True)
+    broken.write_text("{not json", encoding="utf-8")
+
+    assert catalog.update(str(logs))["failed"] == 1
+    assert [path for path, _ in catalog.errors()] == ["ex/report.1.json"]
+    assert catalog.update(str(logs))["unchanged"] == 1
+
+    write_report(logs, "ex/report.1.json", played_game)
+    assert catalog.update(str(logs))["updated"] == 1
+    assert catalog.errors() == []
+
+
+def test_queries_filter_by_experiment(played_game, tmp_path, catalog):
+    logs = tmp_path / "logs"
+    write_report(logs, "ex_rule/E1_E2/report.1.json", played_game)
+    write_report(logs, "ex_backbone/random/report.1.json", played_game)
+    catalog.update(str(logs))
+
+    assert [g["experiment"] for g in catalog.games(experiment="ex_rule")] == ["ex_rule/E1_E2"]
+    assert len(catalog.games(rules=["E2", "E1"])) == 2
+    rates = catalog.win_rate(by="endpoint", include_random=True)
+    assert rates["random_agent"]["games"] == 4
+    with pytest.raises(ValueError):
+        catalog.win_rate(by="nope")
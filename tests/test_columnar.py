@@ -0,0 +1,54 @@
+import json
+
+import pandas as pd
+import pytest
+
+from analytics.catalog import Catalog
+from analytics.columnar import load_logs, select, win_rate
+
+
+@pytest.fixture
+def logs(played_game, tmp_path):
+    logs = tmp_path / "logs"
+    drawn = dict(played_game, result=dict(played_game["result"], winner="draw"))
+    for name, game_log in (("ex_rule/E1_E2/report.1.json", played_game),
+                           ("ex_rule/E1_E2/report.2.json", drawn),
+                           ("ex_backbone/random/report.1.json", played_game)):
+        path = logs / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(game_log), encoding="utf-8")
+    (logs / "ex_rule" / "report.broken.json").write_text("{", encoding="utf-8")
+    return logs
+
+
+def test_frames_hold_every_report(played_game, logs):
+    games, steps = load_logs(str(logs), workers=1)
+    n_steps = len(played_game["step_by_step"])
+    assert len(games) == 3
+    assert games["n_steps"].tolist() == [n_steps] * 3
+    assert len(steps) == 3 * n_steps
+    first = steps[steps["game"] == 0]
+    assert first["ply"].tolist() == list(range(n_steps))
+    assert first["round"].tolist() == [step["round"] for step in played_game["step_by_step"]]
+    assert first["scattering_step"].tolist() == [step["scattering_step"] for step in played_game["step_by_step"]]
+
+
+def test_process_pool_gives_the_same_frames(logs):
+    games, steps = load_logs(str(logs), workers=1)
+    pooled_games, pooled_steps = load_logs(str(logs), workers=2, chunk_size=1)
+    pd.testing.assert_frame_equal(games, pooled_games)
+    pd.testing.assert_frame_equal(steps, pooled_steps)
+
+
+def test_metrics_match_the_catalog(logs, tmp_path):
+    games, steps = load_logs(str(logs), workers=1)
+    rule_games, rule_steps = select(games, steps, "ex_rule")
+    assert len(rule_games) == 2
+    assert set(rule_steps["game"]) == set(rule_games.index)
+
+    rates = win_rate(games, by="endpoint", include_random=True)
+    with Catalog(str(tmp_path / "catalog.sqlite")) as catalog:
+        catalog.update(str(logs))
+        expected = catalog.win_rate(by="endpoint", include_random=True)
+    for name, row in expected.items():
+        assert {k: rates.loc[name, k] for k in row} == row
@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+
+from core import gamelog
+from core.gamelog import (GameLogWriter, apply_state_delta, assemble_report, expand_report, iter_step_states,
+                          journal_path_for, state_delta, wait_for_writes)
+
+
+def journal_lines(game_log):
+    header = {k: v for k, v in game_log.items() if k not in ("result", "step_by_step")}
+    lines = [{"type": "header", **header}, {"type": "rules", "special_rules": ["E1", "E2"]}]
+    lines += [{"type": "step", "step": step} for step in game_log["step_by_step"]]
+    return [json.dumps(line) for line in lines]
+
+
+def test_assemble_report_skips_a_torn_last_line(played_game, tmp_path):
+    path = tmp_path / "report.1.jsonl"
+    lines = journal_lines(played_game)
+    path.write_text("\n".join(lines) + "\n" + lines[-1][: len(lines[-1]) // 2], encoding="utf-8")
+
+    report = assemble_report(str(path))
+    assert report["step_by_step"] == played_game["step_by_step"]
+    assert report["setup"] == played_game["setup"]
+    assert report["keyframe"] == played_game["keyframe"]
+    assert report["enviroment"]["special_rules"] == ["E1", "E2"]
+    assert report["result"] is None
+
+
+def test_assemble_report_keeps_the_result(played_game, tmp_path):
+    path = tmp_path / "report.1.jsonl"
+    lines = journal_lines(played_game) + [json.dumps({"type": "result", "result": played_game["result"]})]
+    path.write_text("\n".join(lines) + "\n\n", encoding="utf-8")
+    assert assemble_report(str(path))["result"] == played_game["result"]
+
+
+def stream(writer, game_log):
+    partial = dict(game_log, result=None, step_by_step=[])
+    for step in game_log["step_by_step"]:
+        partial["step_by_step"].append(step)
+        writer.append_step(step)
+    return partial
+
+
+def test_finished_game_leaves_only_the_report(played_game, tmp_path):
+    report_path = str(tmp_path / "logs" / "report.1.json")
+    writer = GameLogWriter(report_path, dict(played_game, result=None, step_by_step=[]), fsync_interval=None)
+    stream(writer, played_game)
+    writer.write_report(played_game)
+    writer.close(played_game)
+    wait_for_writes()
+
+    with open(report_path, encoding="utf-8") as f:
+        assert json.load(f) == played_game
+    assert not os.path.exists(journal_path_for(report_path))
+
+
+def test_abandoned_game_is_written_on_close(played_game, tmp_path):
+    report_path = str(tmp_path / "report.1.json")
+    writer = GameLogWriter(report_path, dict(played_game, result=None, step_by_step=[]), fsync_interval=0)
+    partial = stream(writer, played_game)
+    writer.close(partial)
+    writer.append_step({"late": True})
+    wait_for_writes()
+
+    with open(report_path, encoding="utf-8") as f:
+        assert json.load(f)["step_by_step"] == played_game["step_by_step"]
+    assert not os.path.exists(journal_path_for(report_path))
+
+
+def test_journal_survives_until_the_game_ends(played_game, tmp_path):
+    report_path = str(tmp_path / "report.1.json")
+    writer = GameLogWriter(report_path, dict(played_game, result=None, step_by_step=[]))
+    stream(writer, played_game)
+    writer.flush()
+
+    # What a crashed server leaves behind: the journal only.
+    assert not os.path.exists(report_path)
+    report = assemble_report(journal_path_for(report_path))
+    assert report["step_by_step"] == played_game["step_by_step"]
+    writer.close()
+    wait_for_writes()
+    assert os.path.exists(journal_path_for(report_path))
+
+
+class Gate:
+    """Stands in for a game whose first record keeps the writer thread busy."""
+
+    def __init__(self):
+        self.open = threading.Event()
+
+    def _handle(self, kind, payload):
+        self.open.wait(5)
+
+    def _done(self):
+        pass
+
+
+def test_full_queue_overflows_in_order_without_blocking(played_game, tmp_path, monkeypatch):
+    monkeypatch.setattr(gamelog, "_writer", gamelog._WriterThread(max_queue=1))
+    overflowed = gamelog.GAME_LOG_OVERFLOW.value()
+    gate = Gate()
+    gamelog._writer.put(gate, "line", None)
+
+    report_path = str(tmp_path / "report.1.json")
+    writer = GameLogWriter(report_path, dict(played_game, result=None, step_by_step=[]), fsync_interval=None)
+    stream(writer, played_game)
+    writer.close()
+    assert gamelog.GAME_LOG_OVERFLOW.value() - overflowed >= len(played_game["step_by_step"])
+
+    gate.open.set()
+    wait_for_writes()
+    assert not gamelog._writer._overflow
+    report = assemble_report(journal_path_for(report_path))
+    assert report["step_by_step"] == played_game["step_by_step"]
+
+
+def test_state_delta_round_trip(played_game):
+    states = [played_game["keyframe"]]
+    for _, before, after in iter_step_states(played_game):
+        states += [before, after]
+    for prev, cur in zip(states, states[1:]):
+        delta = state_delta(prev, cur)
+        assert apply_state_delta(prev, delta) == cur
+        assert json.loads(json.dumps(delta)) == delta
+    assert state_delta(states[-1], states[-1]) == {}
+
+
+def test_expanded_report_matches_the_engine(played_game):
+    from core.environment import Enviroment
+
+    expanded = expand_report(played_game)
+    assert "keyframe" not in expanded and "state_encoding" not in expanded
+    assert [states for _, *states in iter_step_states(expanded)] == \
+        [states for _, *states in iter_step_states(played_game)]
+
+    env = Enviroment(headless=True)
+    for step in expanded["step_by_step"]:
+        env.game_state = step["game_state_before_act"]
+        pos, way = step["action"]
+        env.commit_action({"pos": pos, "way": way}, ["E1", "E2"])
+        assert env.get_game_state() == step["game_state_after_act"]
@@ -0,0 +1,17 @@
+import subprocess
+import sys
+
+from cli.check_import_time import ROOT, measure
+
+
+def test_core_game_loads_no_provider_sdk():
+    # A fresh interpreter: this test session may already have imported them.
+    ms, imports, loaded = measure("core.game")
+    assert loaded == []
+    assert ms > 0 and any(name == "core.game" for _, name in imports)
+
+
+def test_checker_does_not_import_the_http_client():
+    code = "import sys, cli.check_import_time; print('cli.run_basic' in sys.modules, 'requests' in sys.modules)"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert proc.stdout.split() == ["False", "False"]
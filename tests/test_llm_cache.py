@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core import providers
+from core.environment import Enviroment
+from core.llm_cache import ResponseCache, cache_config, cache_key, configure_cache, get_cache
+from core.persona_instruct import BALANCED
+from core.player import PlayerAgent
+from core.providers import ClientPool, Provider, register_provider
+
+
+def fill(cache, n, size=10):
+    for i in range(n):
+        cache.put(f"k{i}", "p", "m", f"prompt {i}", {"reason": "r" * size, "i": i})
+        # Distinct last_used stamps, in insertion order.
+        time.sleep(0.002)
+
+
+def keys(cache):
+    return sorted(row[0] for row in cache._connect().execute("SELECT key FROM responses"))
+
+
+def test_get_put_and_modes(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    assert cache.get("k0") is None
+    fill(cache, 1)
+    assert cache.get("k0") == {"reason": "r" * 10, "i": 0}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    recorder = ResponseCache(path, mode="record")
+    assert recorder.get("k0") is None
+    recorder.put("k0", "p", "m", "prompt 0", {"i": "new"})
+    assert cache.get("k0") == {"i": "new"}
+    with pytest.raises(ValueError):
+        ResponseCache(path, mode="replay")
+    with pytest.raises(ValueError):
+        ResponseCache(path, max_entries=0)
+
+
+def test_evicts_least_recently_used_beyond_max_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    unbounded = ResponseCache(path)
+    fill(unbounded, 5)
+    assert unbounded.get("k0") is not None
+    # Limits are applied when a cache is opened.
+    cache = ResponseCache(path, max_entries=3)
+    assert keys(cache) == ["k0", "k3", "k4"]
+    assert cache.stats()["evicted"] == 2
+    assert cache.evict() == 0
+
+
+def test_evicts_beyond_max_bytes(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    fill(ResponseCache(path), 5, size=100)
+    entry = ResponseCache(path).stats()["bytes"] // 5
+    cache = ResponseCache(path, max_bytes=2 * entry + 1)
+    assert keys(cache) == ["k3", "k4"]
+    assert cache.stats()["evicted"] == 3
+
+
+def test_evicts_by_age(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    fill(ResponseCache(path), 2)
+    cache = ResponseCache(path, max_age_secs=0.05)
+    assert cache.get("k0") is not None
+    time.sleep(0.06)
+    assert cache.get("k0") is None
+    assert cache.evict() == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_every_n_stores(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2, evict_every=3)
+    fill(cache, 3)
+    assert cache.stats()["entries"] == 2
+
+
+def test_unreadable_database_is_a_miss(tmp_path):
+    path = tmp_path / "broken.sqlite"
+    path.write_bytes(b"not a database" * 100)
+    cache = ResponseCache(str(path))
+    assert cache.get("k0") is None
+    assert cache.errors == 1
+
+
+def test_key_covers_every_sampling_parameter():
+    base = ("google", "m", "prompt", 0.7, 1.0, 40, 50)
+    key = cache_key(*base)
+    assert cache_key(*base) == key
+    for i, other in enumerate(("togetherai", "m2", "prompt!", 0.8, 0.9, 41, 100)):
+        changed = list(base)
+        changed[i] = other
+        assert cache_key(*changed) != key
+
+
+class ScriptedProvider(Provider):
+    """Always plays A1 (B1 for team B) clockwise, and counts its calls."""
+    name = "scripted"
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def make_client(self, key):
+        return object()
+
+    def request(self, agent, prompt, schema):
+        return {"prompt": prompt}
+
+    def call(self, client, request):
+        self.calls += 1
+        pos = "A1" if "A1" in request["prompt"] else "B1"
+        return {"reason": "scripted", "action": {"pos": pos, "way": "clockwise"}}
+
+    def make_async_client(self, key):
+        return object()
+
+    async def acall(self, client, request):
+        return self.call(client, request)
+
+    def parse(self, response):
+        return dict(response)
+
+
+@pytest.fixture
+def scripted(tmp_path):
+    provider = ScriptedProvider()
+    provider.set_pool(ClientPool(provider, ["key"]))
+    register_provider(provider)
+    configure_cache(str(tmp_path / "cache.sqlite"))
+    yield provider
+    configure_cache(None)
+    providers.PROVIDERS.pop(provider.name)
+
+
+def test_agent_replays_answers_from_the_cache(scripted):
+    env = Enviroment()
+    env.advance_round()
+
+    def move(**options):
+        agent = PlayerAgent("A", BALANCED, provider="scripted", model="m", **options)
+        return agent.get_action(env.get_game_state(), env.get_available_pos("A"))
+
+    first = move(max_tokens=50)
+    assert scripted.calls == 1 and first["_meta_llm_cache"] == "miss"
+    replayed = move(max_tokens=50)
+    assert scripted.calls == 1 and replayed["_meta_llm_cache"] == "hit"
+    assert replayed["action"] == first["action"]
+    assert move(max_tokens=100)["_meta_llm_cache"] == "miss"
+    assert scripted.calls == 2
+    assert get_cache().stats()["entries"] == 2
+    assert cache_config()["path"] == get_cache().path
+
+    configure_cache(cache_config()["path"], mode="record")
+    assert move(max_tokens=50)["_meta_llm_cache"] == "record"
+    assert scripted.calls == 3
+
+
+def test_async_moves_use_the_cache_off_the_event_loop(scripted, monkeypatch):
+    env = Enviroment()
+    env.advance_round()
+    threads = []
+    for name in ("get", "put"):
+        method = getattr(ResponseCache, name)
+
+        def spy(self, *args, _method=method, _name=name):
+            threads.append((_name, threading.get_ident()))
+            return _method(self, *args)
+
+        monkeypatch.setattr(ResponseCache, name, spy)
+
+    async def move():
+        agent = PlayerAgent("A", BALANCED, provider="scripted", model="m")
+        result = await agent.aget_action(env.get_game_state(), env.get_available_pos("A"))
+        return result, threading.get_ident()
+
+    (first, loop_thread), (replayed, _) = asyncio.run(move()), asyncio.run(move())
+    assert first["_meta_llm_cache"] == "miss" and replayed["_meta_llm_cache"] == "hit"
+    assert scripted.calls == 1
+    assert [name for name, _ in threads] == ["get", "put", "get"]
+    assert all(ident != loop_thread for _, ident in threads)
+
+
+def test_settings_thread_max_tokens_to_the_agent():
+    from core.game import create_player_from_settings
+    from models.schemas import PlayerSettings
+
+    agent = create_player_from_settings("A", PlayerSettings(type="agent", model="gemini-2.0-flash", maxTokens=64))
+    assert agent.max_tokens == 64
@@ -0,0 +1,72 @@
+import pytest
+
+from core import player as player_module
+from core.environment import Enviroment
+from core.persona_instruct import BALANCED
+from core.player import MCTSPlayerAgent, shutdown_mcts_pool
+
+
+@pytest.fixture
+def env():
+    env = Enviroment(headless=True)
+    env.advance_round()
+    return env
+
+
+@pytest.mark.parametrize("rollout", ["random", "heuristic"])
+def test_plays_a_legal_move_in_process(env, rollout):
+    agent = MCTSPlayerAgent("A", BALANCED, time_limit=0.05, workers=1, rollout=rollout, seed=1)
+    available = env.get_available_pos("A")
+    move = agent.get_action(env.get_game_state(), available, extended_rule=["E1", "E2"])
+    assert move["action"]["pos"] in available
+    assert move["action"]["way"] in ("clockwise", "counter_clockwise")
+    assert "rollouts" in move["observation"]
+    assert player_module._mcts_pool is None
+
+
+def test_agents_share_one_rollout_pool(env):
+    try:
+        agents = [MCTSPlayerAgent(team, BALANCED, time_limit=0.05, workers=2, seed=2) for team in ("A", "B")]
+        agents[0].get_action(env.get_game_state(), env.get_available_pos("A"))
+        pool = player_module._mcts_pool
+        assert pool is not None
+        agents[1].get_action(env.get_game_state(), env.get_available_pos("B"))
+        assert player_module._mcts_pool is pool
+    finally:
+        shutdown_mcts_pool()
+    assert player_module._mcts_pool is None
+
+
+def test_snapshot_restores_memory_and_rng(env):
+    agent = MCTSPlayerAgent("A", BALANCED, time_limit=0.02, workers=1, seed=3)
+    snapshot = agent.snapshot()
+    context, draw = agent.memory.get_context(), agent.rng.random()
+    agent.rng.setstate(snapshot["rng"])
+    agent.get_action(env.get_game_state(), env.get_available_pos("A"))
+    assert agent.memory.get_context() != context
+    agent.restore(snapshot)
+    assert agent.memory.get_context() == context
+    assert agent.rng.random() == draw
+
+
+def test_rejects_unknown_rollout():
+    with pytest.raises(ValueError):
+        MCTSPlayerAgent("A", BALANCED, rollout="greedy")
+
+
+def test_settings_leave_the_worker_default_to_the_agent():
+    from core.game import create_player_from_settings
+    from models.schemas import PlayerSettings
+
+    agent = create_player_from_settings("A", PlayerSettings(type="mcts_agent"))
+    assert agent.workers == MCTSPlayerAgent("A", BALANCED).workers
+    assert create_player_from_settings("A", PlayerSettings(type="mcts_agent", workers=3)).workers == 3
+
+
+def test_unseeded_agents_follow_the_global_seed():
+    import random
+
+    random.seed(11)
+    first = MCTSPlayerAgent("A", BALANCED).rng.random()
+    random.seed(11)
+    assert MCTSPlayerAgent("A", BALANCED).rng.random() == first
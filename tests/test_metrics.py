@@ -0,0 +1,70 @@
+import pytest
+
+from core.metrics import Registry
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def test_histogram_renders_cumulative_buckets(registry):
+    hist = registry.histogram("req_seconds", "Request time.\nBy route.", ("route", "status"), buckets=(1.0, 0.1))
+    for secs in (0.05, 0.1, 0.5, 1.0, 2.5):
+        hist.observe(secs, route='/a"b\\c', status=200)
+    hist.observe(0, route="/x\ny", status="500")
+    assert hist.count(route='/a"b\\c', status=200) == 5
+    assert hist.count(route="/other", status=200) == 0
+
+    assert registry.render().splitlines() == [
+        "# HELP req_seconds Request time.\\nBy route.",
+        "# TYPE req_seconds histogram",
+        'req_seconds_bucket{route="/a\\"b\\\\c",status="200",le="0.1"} 2',
+        'req_seconds_bucket{route="/a\\"b\\\\c",status="200",le="1"} 4',
+        'req_seconds_bucket{route="/a\\"b\\\\c",status="200",le="+Inf"} 5',
+        'req_seconds_sum{route="/a\\"b\\\\c",status="200"} 4.15',
+        'req_seconds_count{route="/a\\"b\\\\c",status="200"} 5',
+        'req_seconds_bucket{route="/x\\ny",status="500",le="0.1"} 1',
+        'req_seconds_bucket{route="/x\\ny",status="500",le="1"} 1',
+        'req_seconds_bucket{route="/x\\ny",status="500",le="+Inf"} 1',
+        'req_seconds_sum{route="/x\\ny",status="500"} 0',
+        'req_seconds_count{route="/x\\ny",status="500"} 1',
+    ]
+
+
+def test_histogram_times_a_block(registry):
+    hist = registry.histogram("block_seconds", "Block time.")
+    with hist.time():
+        pass
+    with pytest.raises(KeyError):
+        with hist.time():
+            raise KeyError("still observed")
+    assert hist.count() == 2
+
+
+def test_counter(registry):
+    counter = registry.counter("moves_total", "Moves.", ("player_type",))
+    counter.inc(player_type="mcts_agent")
+    counter.inc(2.5, player_type="agent")
+    assert counter.value(player_type="agent") == 2.5 and counter.value(player_type="human") == 0
+    assert registry.render().splitlines() == [
+        "# HELP moves_total Moves.",
+        "# TYPE moves_total counter",
+        'moves_total{player_type="agent"} 2.5',
+        'moves_total{player_type="mcts_agent"} 1',
+    ]
+    with pytest.raises(ValueError):
+        counter.inc(-1, player_type="agent")
+    with pytest.raises(ValueError):
+        counter.inc(team="A")
+    with pytest.raises(ValueError):
+        counter.inc()
+    registry.clear()
+    assert counter.value(player_type="agent") == 0
+
+
+def test_names_are_unique(registry):
+    registry.counter("games_total", "Games.")
+    with pytest.raises(ValueError):
+        registry.histogram("games_total", "Games.")
+    assert registry.render() == "# HELP games_total Games.\n# TYPE games_total counter\n"
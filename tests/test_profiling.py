@@ -0,0 +1,124 @@
+import marshal
+import threading
+import time
+
+import pytest
+
+from core.profiling import TurnProfiler, profiled, profiling_turn
+from core.session import SessionRegistry
+from models.schemas import GameSettings, PlayerSettings
+
+
+def busy_work(secs=0.02):
+    end = time.perf_counter() + secs
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+@pytest.fixture
+def cprofiler():
+    profiler = TurnProfiler("cprofile", moves=2)
+    yield profiler
+    profiler.stop()
+
+
+def test_cprofile_collects_the_turns_blocks(cprofiler):
+    with profiling_turn(cprofiler):
+        with profiled():
+            busy_work()
+        # Nested blocks are part of the outer one.
+        with profiled(), profiled():
+            busy_work()
+    cprofiler.move_done(game_over=False)
+    assert cprofiler.active
+    cprofiler.move_done(game_over=False)
+    assert not cprofiler.active
+
+    assert "busy_work" in cprofiler.pstats_text()
+    stats = marshal.loads(cprofiler.pstats_bytes())
+    assert any(func[2] == "busy_work" for func in stats)
+    status = cprofiler.status()
+    assert status["profiled_moves"] == 2 and status["finished"] and status["has_data"] and status["skipped"] == 0
+    with pytest.raises(ValueError):
+        cprofiler.collapsed()
+
+
+def test_blocks_outside_a_turn_are_not_profiled(cprofiler):
+    with profiled():
+        busy_work(0.001)
+    with profiling_turn(None), profiled():
+        busy_work(0.001)
+    assert not cprofiler.status()["has_data"]
+
+
+def test_overlapping_blocks_share_one_cprofile(cprofiler):
+    inside, release = threading.Event(), threading.Event()
+
+    def hold():
+        with cprofiler.thread():
+            inside.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    try:
+        assert inside.wait(5)
+        cprofiler.call(busy_work, 0.001)
+    finally:
+        release.set()
+        worker.join()
+    assert cprofiler.skipped == 1
+
+
+def test_only_one_cprofile_profiler_at_a_time(cprofiler):
+    with pytest.raises(RuntimeError):
+        TurnProfiler("cprofile")
+    TurnProfiler("sample").stop()
+    cprofiler.stop()
+    TurnProfiler("cprofile").stop()
+
+
+def test_sampling_collects_stacks():
+    profiler = TurnProfiler("sample", moves=None, interval=0.001)
+    profiler.call(busy_work, 0.05)
+    profiler.stop()
+    assert profiler.samples > 0
+    assert "busy_work (test_profiling.py:" in profiler.collapsed()
+    with pytest.raises(ValueError):
+        profiler.pstats_bytes()
+
+
+@pytest.mark.parametrize("kwargs", [{"mode": "trace"}, {"moves": 0}, {"interval": 0}])
+def test_rejects_bad_arguments(kwargs):
+    with pytest.raises(ValueError):
+        TurnProfiler(**kwargs)
+
+
+def test_profile_endpoint_rejects_a_second_cprofile(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    registry = SessionRegistry(logs_dir=str(tmp_path), fsync_interval=None)
+    monkeypatch.setattr(main, "sessions", registry)
+    settings = GameSettings(player1=PlayerSettings(type="random_agent"), player2=PlayerSettings(type="random_agent"))
+    first, second = registry.create(settings), registry.create(settings)
+    client = TestClient(main.app)
+    try:
+        response = client.post("/api/profile", params={"game_id": first.game_id}, json={"mode": "cprofile"})
+        assert response.status_code == 200
+        response = client.post("/api/profile", params={"game_id": second.game_id}, json={"mode": "cprofile"})
+        assert response.status_code == 409
+        # The same game may restart its own profile, and closing it frees cProfile.
+        response = client.post("/api/profile", params={"game_id": first.game_id}, json={"mode": "cprofile"})
+        assert response.status_code == 200
+        registry.remove(first.game_id)
+        response = client.post("/api/profile", params={"game_id": second.game_id}, json={"mode": "cprofile"})
+        assert response.status_code == 200
+    finally:
+        registry.close_all()
+
+
+def test_play_game_records_the_spans_of_every_step(played_game):
+    for step in played_game["step_by_step"]:
+        assert set(step["spans"]) == {"restore", "decide", "commit", "log"}
+        assert all(secs >= 0 for secs in step["spans"].values())
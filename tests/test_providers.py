@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from core import providers
+from core.providers import ClientPool, Provider, api_keys, get_provider
+
+
+class QuotaError(Exception):
+    status_code = 429
+
+
+class FakeProvider(Provider):
+    name = "fake"
+
+    def __init__(self):
+        super().__init__()
+        self.made = []
+
+    def make_client(self, key):
+        self.made.append(("sync", key))
+        return ("client", key)
+
+    def make_async_client(self, key):
+        self.made.append(("async", key))
+        return ("async_client", key)
+
+
+def used_keys(pool, n):
+    keys = []
+    for _ in range(n):
+        with pool.acquire() as client:
+            keys.append(client[1])
+    return keys
+
+
+def test_least_loaded_spreads_calls_and_reuses_clients():
+    provider = FakeProvider()
+    pool = ClientPool(provider, ["k1", "k2", "k3"])
+    assert sorted(used_keys(pool, 9)) == ["k1"] * 3 + ["k2"] * 3 + ["k3"] * 3
+    assert provider.made == [("sync", "k1"), ("sync", "k2"), ("sync", "k3")]
+
+    # A key with a call in flight is passed over.
+    busy = pool.acquire()
+    assert busy.client[1] not in used_keys(pool, 2)
+    pool.release(busy.slot, None)
+    assert [s["in_flight"] for s in pool.stats()] == [0, 0, 0]
+
+
+def test_round_robin_order():
+    pool = ClientPool(FakeProvider(), ["k1", "k2", "k3"], rotation="round_robin")
+    assert used_keys(pool, 4) == ["k1", "k2", "k3", "k1"]
+
+
+def test_quota_error_cools_the_key_down():
+    pool = ClientPool(FakeProvider(), ["key-1", "key-2"], rotation="round_robin", cooldown=60)
+    with pytest.raises(QuotaError):
+        with pool.acquire():
+            raise QuotaError()
+    assert used_keys(pool, 3) == ["key-2"] * 3
+    stats = pool.stats()
+    assert stats[0]["key"] == "...ey-1" and stats[0]["quota_errors"] == 1 and stats[0]["cooldown_secs"] > 0
+
+    # Other errors don't cool a key down.
+    with pytest.raises(ValueError):
+        with pool.acquire():
+            raise ValueError()
+    assert pool.stats()[1]["quota_errors"] == 0
+
+
+def test_all_keys_cooling_down_uses_the_first_to_recover():
+    pool = ClientPool(FakeProvider(), ["k1", "k2"], cooldown=60)
+    for _ in range(2):
+        with pytest.raises(QuotaError):
+            with pool.acquire():
+                raise QuotaError()
+    pool._slots[1].cooldown_until -= 30
+    assert used_keys(pool, 1) == ["k2"]
+
+
+def test_async_clients_are_kept_per_event_loop():
+    provider = FakeProvider()
+    pool = ClientPool(provider, ["k1"])
+
+    async def call():
+        with pool.acquire(asynchronous=True) as first:
+            pass
+        with pool.acquire(asynchronous=True) as second:
+            pass
+        return first, second
+
+    first, second = asyncio.run(call())
+    assert first is second
+    asyncio.run(call())
+    assert provider.made == [("async", "k1"), ("async", "k1")]
+
+
+def test_pool_checks_its_arguments():
+    with pytest.raises(ValueError):
+        ClientPool(FakeProvider(), [])
+    with pytest.raises(ValueError):
+        ClientPool(FakeProvider(), ["k1"], rotation="random")
+
+
+def test_keys_and_pools_come_from_env(monkeypatch):
+    monkeypatch.setattr(providers, "_env", {"FAKE_KEYS": " k1, k2 ,,", "EMPTY": ""})
+    assert api_keys("FAKE_KEYS") == ["k1", "k2"]
+    with pytest.raises(ValueError):
+        api_keys("EMPTY")
+
+    provider = FakeProvider()
+    provider.key_name = "FAKE_KEYS"
+    pool = provider.pool()
+    assert provider.pool() is pool and [s["key"] for s in pool.stats()] == ["...k1", "...k2"]
+    provider.set_pool(None)
+    assert provider.pool() is not pool
+
+
+def test_registry():
+    assert get_provider("google").name == "google"
+    with pytest.raises(NotImplementedError):
+        get_provider("nope")
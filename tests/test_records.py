@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from core.gamelog import expand_report, iter_step_states
+from core.records import GameCorpus, convert_reports, write_corpus
+
+
+def test_corpus_round_trip(played_game, tmp_path):
+    path = str(tmp_path / "games.oaqrec")
+    unfinished = dict(played_game, result=None)
+    assert write_corpus([("a/report.1.json", played_game), ("b/report.2.json", unfinished)], path) == 2
+
+    steps = list(iter_step_states(played_game))
+    with GameCorpus(path) as corpus:
+        assert len(corpus) == 2
+        record, other = corpus[0], corpus[1]
+        assert record.source == "a/report.1.json"
+        assert record.rules == ["E1", "E2"]
+        assert record.result == played_game["result"]
+        assert other.result is None
+        assert record.player_a == played_game["setup"]["player_a"]
+        assert record.n_moves == len(steps)
+
+        moves = list(record.moves())
+        for move, (step, before, after) in zip(moves, steps):
+            assert [move.pos, move.way] == step["action"]
+            assert move.round == step["round"]
+            assert move.my_score == step["my_score"]
+            assert (move.score_a, move.score_b) == (after["score"]["A"], after["score"]["B"])
+            assert move.scattering_step == step["scattering_step"]
+            assert move.reasoning_secs == pytest.approx(step["reasoning_times"])
+
+        array = record.moves_array()
+        assert array["score_a"].tolist() == [m.score_a for m in moves]
+        del array
+
+        replayed = list(record.replay())
+        assert len(replayed) == len(steps)
+        for (_, before, after), (_, logged_before, logged_after) in zip(replayed, steps):
+            assert before == logged_before
+            assert after == logged_after
+        assert [r.source for r in corpus] == ["a/report.1.json", "b/report.2.json"]
+
+
+def test_convert_reports(played_game, tmp_path):
+    report = tmp_path / "logs" / "ex" / "report.1.json"
+    report.parent.mkdir(parents=True)
+    report.write_text(json.dumps(expand_report(played_game)), encoding="utf-8")
+    out = str(tmp_path / "games.oaqrec")
+    assert convert_reports([str(report)], out, root=str(tmp_path / "logs")) == 1
+    with GameCorpus(out) as corpus:
+        assert corpus[0].source == "ex/report.1.json"
+        assert corpus[0].n_moves == len(played_game["step_by_step"])
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_corpus.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        GameCorpus(str(path))
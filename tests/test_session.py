@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import random
+
+import pytest
+
+from core.gamelog import journal_path_for, wait_for_writes
+from core.session import TERMINAL_EVENTS, SessionRegistry
+from models.schemas import GameSettings, PlayerSettings
+
+
+def settings(type_a="random_agent", type_b="random_agent"):
+    return GameSettings(player1=PlayerSettings(type=type_a), player2=PlayerSettings(type=type_b))
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = SessionRegistry(max_sessions=2, idle_timeout=60.0, logs_dir=str(tmp_path), fsync_interval=None,
+                               evict_after=10.0)
+    yield registry
+    registry.close_all()
+
+
+def read_report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def play_out(session, max_moves=500):
+    for _ in range(max_moves):
+        if session.game_over:
+            break
+        await session.request_move(["E1", "E2"])
+    return session
+
+
+def test_games_run_concurrently_and_log_separately(registry):
+    random.seed(3)
+    sessions = [registry.create(settings()) for _ in range(2)]
+    assert sessions[0].game_id != sessions[1].game_id
+
+    async def main():
+        return await asyncio.gather(*(play_out(s) for s in sessions))
+
+    asyncio.run(main())
+    wait_for_writes()
+    for session in sessions:
+        assert session.game_over
+        report = read_report(session.current_log_path)
+        assert report["result"] is not None
+        assert len(report["step_by_step"]) == len(session.game_json_log["step_by_step"])
+        assert not os.path.exists(journal_path_for(session.current_log_path))
+
+
+def test_least_recently_used_idle_game_is_evicted(registry):
+    first, second = registry.create(settings()), registry.create(settings())
+    first.last_used -= registry.evict_after + 1
+    second.last_used -= registry.evict_after + 1
+    assert registry.get(first.game_id) is first
+
+    async def create_while_busy():
+        async with first.lock:
+            return registry.create(settings())
+
+    third = asyncio.run(create_while_busy())
+    assert first.game_id in registry and second.game_id not in registry and third.game_id in registry
+    assert registry.evictions == 1
+    # The abandoned game still gets its report.
+    wait_for_writes()
+    assert read_report(second.current_log_path)["result"] is None
+
+    async def create_while_all_busy():
+        async with first.lock, third.lock:
+            registry.create(settings())
+
+    with pytest.raises(ValueError):
+        asyncio.run(create_while_all_busy())
+
+
+def test_active_games_are_not_evicted(registry):
+    random.seed(4)
+    active = [registry.create(settings()) for _ in range(2)]
+    with pytest.raises(ValueError):
+        registry.create(settings())
+    assert all(s.game_id in registry for s in active) and registry.evictions == 0
+
+    # A finished game makes room however recently it was played.
+    asyncio.run(play_out(active[1]))
+    newer = registry.create(settings())
+    assert active[0].game_id in registry and active[1].game_id not in registry and newer.game_id in registry
+
+
+async def collect_events(queue):
+    events = []
+    while not events or events[-1]["type"] not in TERMINAL_EVENTS:
+        events.append(await asyncio.wait_for(queue.get(), 30))
+    return events
+
+
+def test_autoplay_publishes_every_move(registry):
+    random.seed(5)
+    session = registry.create(settings())
+
+    async def main():
+        assert session.start_autoplay(["E1", "E2"])
+        assert not session.start_autoplay(["E1", "E2"])
+        return await collect_events(session.subscribe())
+
+    events = asyncio.run(main())
+    moves, end = events[:-1], events[-1]
+    assert end["type"] == "end" and session.game_over
+    assert [e["type"] for e in moves] == ["move"] * len(moves)
+    assert [e["ply"] for e in moves] == list(range(len(moves)))
+    assert moves[-1]["data"]["game_over"]
+    assert len(moves) == len(session.game_json_log["step_by_step"])
+    assert session.events == events
+
+
+def test_autoplaying_game_is_not_evicted(registry):
+    random.seed(6)
+    slow, other = registry.create(settings()), registry.create(settings())
+
+    async def main():
+        slow.start_autoplay(["E1", "E2"], delay=0.5)
+        queue = slow.subscribe()
+        await queue.get()
+        # Between two autoplay moves: unlocked and, by the clock, long idle.
+        slow.last_used -= registry.idle_timeout + 1
+        other.last_used -= registry.evict_after + 1
+        assert not slow.lock.locked()
+        assert registry.get(slow.game_id) is slow
+        slow.last_used -= registry.evict_after + 1
+        newer = registry.create(settings())
+        with pytest.raises(ValueError):
+            registry.create(settings())
+        slow.stop_autoplay()
+        return newer
+
+    newer = asyncio.run(main())
+    assert slow.game_id in registry and other.game_id not in registry and newer.game_id in registry
+
+
+def test_idle_games_are_closed(registry):
+    session = registry.create(settings())
+    session.last_used -= registry.idle_timeout + 1
+    assert registry.get(session.game_id) is None
+    assert len(registry) == 0
+
+
+def test_human_turn_is_not_played(registry):
+    session = registry.create(settings(type_a="human"))
+    result = asyncio.run(session.request_move())
+    assert result["human_turn"] and result["team"] == "A"
+    assert session.game_json_log["step_by_step"] == []
+
+
+def test_cancelled_move_leaves_the_game_unchanged(registry):
+    mcts = PlayerSettings(type="mcts_agent", timeLimit=0.3, workers=1)
+    session = registry.create(GameSettings(player1=mcts, player2=mcts))
+    before = session.env.snapshot()
+    context, rng_state = session.p1.memory.get_context(), session.p1.rng.getstate()
+
+    async def cancel_move():
+        task = asyncio.ensure_future(session.request_move())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert session.env.snapshot() == before
+        assert session.p1.memory.get_context() == context
+        assert session.p1.rng.getstate() == rng_state
+        assert session.current_turn == "A" and session.game_json_log["step_by_step"] == []
+        return await session.request_move()
+
+    result = asyncio.run(cancel_move())
+    assert result["action_details"]["team"] == "A"
+    assert len(session.game_json_log["step_by_step"]) == 1
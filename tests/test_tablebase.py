@@ -0,0 +1,77 @@
+import pytest
+
+from core.board import NO_MANDARIN, SIDE_PITS, CompactState, rule_flags, sow
+from core.tablebase import _HEADER, Tablebase, _iter_counts, _state_at, build, solve
+
+MAX_PIECES = 3
+RULES = ["E1", "E2"]
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tablebase") / "k3.bin")
+    info = build(path, MAX_PIECES, RULES)
+    assert info["bytes"] == _HEADER.size + info["positions"]
+    with Tablebase(path) as tb:
+        yield tb
+
+
+def positions(n):
+    for mask in range(4):
+        for counts in _iter_counts(n):
+            for code in range(1 << n):
+                yield _state_at(counts, code, mask), mask
+
+
+def test_values_satisfy_best_play(table):
+    """Every stored value is the best move's capture swing minus the opponent's value after it."""
+    apply_e1, apply_e2 = rule_flags(RULES)
+    nonzero = 0
+    for n in range(MAX_PIECES + 1):
+        for state, mask in positions(n):
+            value = table.probe(state, "A")
+            movable = [i for i in SIDE_PITS["A"] if state.counts[i]]
+            if not mask or not movable:
+                assert value == 0
+                continue
+            best = None
+            for idx in movable:
+                for direction in (1, -1):
+                    child = state.copy()
+                    sow(child, idx, direction, apply_e1, apply_e2)
+                    gain = child.score[0] - child.score[1]
+                    v = gain if child.is_end() else gain - table.probe(child, "B")
+                    best = v if best is None else max(best, v)
+            assert value == best
+            nonzero += value != 0
+    assert nonzero > 0
+
+
+def test_probe_reads_b_through_the_mirror(table):
+    for state, _ in positions(2):
+        assert table.probe(state.mirrored(), "B") == table.probe(state, "A")
+    assert table.probe_game_state(state.to_game_state(), "A") == table.probe(state, "A")
+
+
+def test_probe_outside_the_table(table):
+    assert table.probe(CompactState.initial(), "A") is None
+    state = _state_at((1,) + (0,) * 11, 0, 3)
+    state.mandarins[0], state.mandarins[3] = NO_MANDARIN, 0
+    assert table.probe(state, "A") is None
+
+
+def test_rules_and_file_checks(table, tmp_path):
+    assert table.matches(["E1", "E2", "E3"])
+    assert not table.matches(["E1"])
+    with pytest.raises(ValueError):
+        solve(-1)
+
+    truncated = tmp_path / "truncated.bin"
+    with open(table.path, "rb") as f:
+        truncated.write_bytes(f.read()[:-1])
+    with pytest.raises(ValueError):
+        Tablebase(str(truncated))
+    garbage = tmp_path / "garbage.bin"
+    garbage.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        Tablebase(str(garbage))
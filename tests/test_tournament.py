@@ -0,0 +1,33 @@
+import asyncio
+import json
+import os
+
+from core.tournament import BatchJob, BatchManager
+
+
+def test_batch_job_plays_every_game(tmp_path):
+    out_dir = str(tmp_path / "batch")
+    manager = BatchManager(workers=2)
+    job = BatchJob({"type": "random_agent"}, {"type": "random_agent"}, games=4, out_dir=out_dir,
+                   extended_rules=["E1", "E2"], seed=1)
+
+    async def run():
+        manager.submit(job)
+        await job._task
+
+    try:
+        asyncio.run(run())
+    finally:
+        manager.shutdown()
+
+    progress = job.progress()
+    assert progress["status"] == "done" and progress["errors"] == []
+    assert progress["completed"] == 4 and progress["failed"] == 0
+    summary = progress["summary"]
+    assert summary["games"] == 4 and sum(summary["wins"].values()) == 4
+
+    reports = sorted(os.listdir(out_dir))
+    assert len(reports) == 4 and sorted(os.path.basename(r["path"]) for r in job.results) == reports
+    for name in reports:
+        with open(os.path.join(out_dir, name), encoding="utf-8") as f:
+            assert json.load(f)["result"]["winner"] in ("player_a", "player_b", "draw")
@@ -0,0 +1,85 @@
+import pytest
+
+from helpers import random_positions
+from core.board import MIRROR_PIT, SIDE_PITS, CompactState, rule_flags, sow
+from core.transposition import TranspositionTable, position_key
+
+
+def test_mirror_is_an_involution():
+    for state, _ in random_positions(seed=21, games=5):
+        assert state.mirrored().mirrored().freeze() == state.freeze()
+
+
+def test_position_key_is_mirror_invariant():
+    for state, team in random_positions(seed=22, games=10):
+        other = "B" if team == "A" else "A"
+        assert position_key(state, team) == position_key(state.mirrored(), other)
+        assert position_key(state, team, ["E1"]) == position_key(state.mirrored(), other, ["E1"])
+
+
+def test_sowing_commutes_with_the_mirror():
+    apply_e1, apply_e2 = rule_flags(None)
+    for state, team in random_positions(seed=23, games=5):
+        for idx in SIDE_PITS[team]:
+            if not state.counts[idx]:
+                continue
+            child = state.copy()
+            sow(child, idx, 1, apply_e1, apply_e2)
+            mirror = state.mirrored()
+            sow(mirror, MIRROR_PIT[idx], 1, apply_e1, apply_e2)
+            assert mirror.mirrored().freeze() == child.freeze()
+
+
+def test_position_key_separates_positions():
+    keys = {}
+    for state, team in random_positions(seed=24, games=30):
+        canonical = (state.mirrored() if team == "B" else state).freeze()
+        key = position_key(state, team)
+        assert keys.setdefault(key, canonical) == canonical
+    assert len(keys) > 500
+
+
+def test_position_key_covers_score_round_and_rules():
+    state = CompactState.initial()
+    key = position_key(state, "A")
+    scored = state.copy()
+    scored.score[0] += 1
+    later = state.copy()
+    later.round += 1
+    assert position_key(scored, "A") != key
+    assert position_key(scored, "A", include_score=False) == position_key(state, "A", include_score=False)
+    assert position_key(later, "A") != key
+    assert position_key(state, "A", ["E1"]) != key
+    # No rule list means every rule is on.
+    assert position_key(state, "A", ["E1", "E2", "E3", "E4", "E5"]) == key
+
+
+def test_table_evicts_least_recently_used():
+    table = TranspositionTable(max_entries=2)
+    table.put("a", 1)
+    table.put("b", 2)
+    assert table.get("a") == 1
+    table.put("c", 3)
+    assert "b" not in table and "a" in table and "c" in table
+    assert table.get("b") is None
+    assert table.stats() == {"entries": 2, "hits": 1, "misses": 1, "evictions": 1}
+    with pytest.raises(ValueError):
+        TranspositionTable(max_entries=0)
+
+
+def test_outcome_matches_sow_for_both_teams():
+    table = TranspositionTable()
+    apply_e1, apply_e2 = rule_flags(None)
+    for state, team in random_positions(seed=25, games=5):
+        before = state.freeze()
+        for idx in SIDE_PITS[team]:
+            if not state.counts[idx]:
+                continue
+            for direction in (1, -1):
+                expected = state.copy()
+                stats = sow(expected, idx, direction, apply_e1, apply_e2)
+                child, cached_stats = table.outcome(state, team, idx, direction)
+                assert child.freeze() == expected.freeze()
+                assert cached_stats == stats
+        assert state.freeze() == before
+    assert table.hits > 0
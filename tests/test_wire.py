@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from helpers import WAYS, random_positions, reference_move
+from core.board import ORDER, CompactState
+from core.environment import Enviroment
+from core.wire import compact_game_state, dumps, encode_response, expand_events
+
+RULE_SETS = (None, ["E1", "E2"], ["E1"], ["E2"], ["E3"])
+
+
+@pytest.mark.parametrize("extended_rules", RULE_SETS)
+def test_expanded_events_match_the_original_engine(extended_rules):
+    checked = 0
+    for state, team in random_positions(seed=31, games=8):
+        before = state.to_game_state()
+        for idx in state.available(team):
+            if not state.counts[idx]:
+                continue
+            for way in WAYS:
+                env = Enviroment()
+                env.game_state = before
+                _, events, _ = env.commit_action({"pos": ORDER[idx], "way": way}, extended_rules)
+                _, _, expected = reference_move(before, ORDER[idx], way, extended_rules)
+                assert expand_events(events) == expected
+                response = {"animation_events": events, "game_state": env.get_game_state()}
+                assert encode_response(response)["animation_events"] == expected
+                assert response["animation_events"] is events
+                checked += 1
+    assert checked > 200
+
+
+def test_compact_game_state_round_trip():
+    for state, _ in random_positions(seed=32, games=5):
+        game_state = state.to_game_state()
+        compact = json.loads(dumps(encode_response({"game_state": game_state}, "compact")))["game_state"]
+        assert compact == compact_game_state(game_state)
+        board = [compact["board"][pos] for pos in ORDER]
+        rebuilt = CompactState([sq[0] for sq in board], [sq[1] for sq in board], [sq[2] for sq in board],
+                               [compact["score"]["A"], compact["score"]["B"]], compact["round"])
+        assert rebuilt.to_game_state() == game_state
+
+
+def test_rejects_unknown_encoding():
+    with pytest.raises(ValueError):
+        encode_response({}, "msgpack")